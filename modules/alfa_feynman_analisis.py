@@ -2,6 +2,7 @@
 
 import numpy as np
 from scipy.stats import norm
+from scipy.linalg import cholesky, solve_triangular, LinAlgError
 import matplotlib.pyplot as plt
 import os
 from lmfit import Minimizer, Parameters, report_fit, conf_interval, \
@@ -10,6 +11,7 @@ import uncertainties
 from uncertainties import ufloat
 
 from modules.io_modules import lee_historias_completas, lee_fey, read_val_teo
+from modules.ejecutor import usa_ejecutor
 from modules.funciones import alfa_feynman_lin_dead_time, \
                               alfa_feynman_lin_dead_time_Nk, \
                               alfa_feynman_dos_exp, alfa_feynman_tres_exp, \
@@ -91,9 +93,62 @@ def grafica_afey(nombres):
     return fig
 
 
-def _plot_fit(tau, Y, std_Y, result):
+def matriz_blanqueo(cov_Y, contraccion=0.0):
+    """
+    Matriz W que blanquea los residuos de Y(T_i) correlacionados
+
+    Si cov_Y = L L^T (Cholesky), W = L^-1 y W (modelo - Y) son residuos
+    independientes y de varianza unitaria. Minimizar su suma de cuadrados es
+    el ajuste por cuadrados mínimos generalizados. W se calcula una única vez
+    y en cada evaluación del residuo sólo se hace un producto matriz-vector.
+
+    Con pocas historias (menos que T_i) la covarianza estimada no es
+    definida positiva. En ese caso se puede contraer hacia su diagonal:
+        cov = (1 - contraccion) * cov_Y + contraccion * diag(cov_Y)
+
+    Parametros
+    ----------
+        cov_Y : numpy array (T_i x T_i)
+            Covarianza del promedio de Y (ver `covarianza_Y`)
+        contraccion : float (entre 0 y 1)
+
+    Resultados
+    ----------
+        W : numpy array (T_i x T_i)
+
+    Si cov_Y no es definida positiva se levanta scipy.linalg.LinAlgError.
+
+    >>> W = matriz_blanqueo(np.diag([4.0, 9.0]))
+    >>> np.allclose(W, np.diag([1 / 2, 1 / 3]))
+    True
+    """
+
+    cov_Y = (1 - contraccion) * np.asarray(cov_Y) + \
+        contraccion * np.diag(np.diag(cov_Y))
+    try:
+        L = cholesky(cov_Y, lower=True)
+    except LinAlgError:
+        raise LinAlgError('La matriz de covarianza de Y no es definida '
+                          "positiva. Puede usarse el argumento 'contraccion' "
+                          '(entre 0 y 1)')
+    return solve_triangular(L, np.eye(len(L)), lower=True)
+
+
+def _pondera_residuo(diferencia, sigma=None, blanqueo=None):
+    """ Residuo pesado por sigma o blanqueado con `matriz_blanqueo` """
+
+    if blanqueo is not None:
+        return blanqueo @ diferencia
+    if sigma is None:
+        return diferencia
+    return diferencia / sigma
+
 
-    best_fit = Y + result.residual * std_Y
+def _plot_fit(tau, Y, std_Y, result, best_fit=None):
+
+    # Con residuos blanqueados no vale Y + residuo * std_Y
+    if best_fit is None:
+        best_fit = Y + result.residual * std_Y
 
     fig, (ax0, ax1) = plt.subplots(2, sharex=True,
                                    gridspec_kw={'height_ratios': [3, 1]},
@@ -236,15 +291,20 @@ def ajuste_afey_delayed(tau, Y, std_Y, Y_ini=[300, 1, 1, 100], vary=4*[1],
 
     Se ajustan los datos de  Y vs tau con incerteza de stt_Y
     Se utiliza el paquete lmfit para realizar el ajuste
+    Con kwargs['cov_Y'] se ajusta por cuadrados mínimos generalizados (ver
+    `ajuste_afey`)
 
     """
     verbose = kwargs.get('verbose', True)
     plot = kwargs.get('plot', True)
     conf_int = kwargs.get('conf_int', True)
     Nk = kwargs.get('Nk', None)
+    cov_Y = kwargs.get('cov_Y', None)
+    blanqueo = None if cov_Y is None else \
+        matriz_blanqueo(cov_Y, kwargs.get('contraccion', 0.0))
 
 
-    def residual(params, tau, data=None, sigma=None):
+    def residual(params, tau, data=None, sigma=None, blanqueo=None):
         parvals = params.valuesdict()
         alfa = parvals['alfa']
         amplitud = parvals['amplitud']
@@ -256,9 +316,7 @@ def ajuste_afey_delayed(tau, Y, std_Y, Y_ini=[300, 1, 1, 100], vary=4*[1],
 
         if data is None:
             return model
-        if sigma is None:
-            return model - data
-        return (model - data) / sigma
+        return _pondera_residuo(model - data, sigma, blanqueo)
 
     # Se definen los parámetros del ajuste
     params = Parameters()
@@ -269,7 +327,8 @@ def ajuste_afey_delayed(tau, Y, std_Y, Y_ini=[300, 1, 1, 100], vary=4*[1],
     # Se define la minimización
     minner = Minimizer(residual, params,
                        fcn_args=(tau,),
-                       fcn_kws={'data': Y, 'sigma': std_Y}
+                       fcn_kws={'data': Y, 'sigma': std_Y,
+                                'blanqueo': blanqueo}
                        )
     # Se realiza la minimización
     # Se puede usar directamente la función minimize como wrapper de Minimizer
@@ -277,7 +336,7 @@ def ajuste_afey_delayed(tau, Y, std_Y, Y_ini=[300, 1, 1, 100], vary=4*[1],
     result = minner.minimize(method='bfgs')
 
     if verbose: report_fit(result)
-    if plot: _plot_fit(tau, Y, std_Y, result)
+    if plot: _plot_fit(tau, Y, std_Y, result, residual(result.params, tau))
 
     if conf_int:
         ci = conf_interval(minner, result)
@@ -381,6 +440,10 @@ def ajuste_afey_new(tau, Y, std_Y, Y_ini=[300, 1, 1], vary=3*[1], **kwargs):
             'plot' : grafica el ajuste
             'conf_int' : calcula intervalos de confianza
             'Nk? : vector con cantidad de puntus para cada T_i
+            'cov_Y' : matriz de covarianza (T_i x T_i) de Y. Si se da, se
+                ajusta por cuadrados mínimos generalizados con los residuos
+                blanqueados (ver `matriz_blanqueo`) en lugar de usar std_Y
+            'contraccion' : contracción de cov_Y hacia su diagonal
 
     Resultados
     ----------
@@ -397,8 +460,11 @@ def ajuste_afey_new(tau, Y, std_Y, Y_ini=[300, 1, 1], vary=3*[1], **kwargs):
     conf_int = kwargs.get('conf_int', True)
     Nk = kwargs.get('Nk', None)
     title = kwargs.get('title', None)
+    cov_Y = kwargs.get('cov_Y', None)
+    blanqueo = None if cov_Y is None else \
+        matriz_blanqueo(cov_Y, kwargs.get('contraccion', 0.0))
 
-    def residual(params, tau, data=None, sigma=None, Nk=None):
+    def residual(params, tau, data=None, sigma=None, Nk=None, blanqueo=None):
         parvals = params.valuesdict()
         alfa = parvals['alfa']
         amplitud = parvals['amplitud']
@@ -411,9 +477,7 @@ def ajuste_afey_new(tau, Y, std_Y, Y_ini=[300, 1, 1], vary=3*[1], **kwargs):
 
         if data is None:
             return model
-        if sigma is None:
-            return model - data
-        return (model - data) / sigma
+        return _pondera_residuo(model - data, sigma, blanqueo)
 
     # Se definen los parámetros del ajuste
     params = Parameters()
@@ -423,7 +487,8 @@ def ajuste_afey_new(tau, Y, std_Y, Y_ini=[300, 1, 1], vary=3*[1], **kwargs):
     # Se define la minimización
     minner = Minimizer(residual, params,
                        fcn_args=(tau,),
-                       fcn_kws={'data': Y, 'sigma': std_Y, 'Nk': Nk}
+                       fcn_kws={'data': Y, 'sigma': std_Y, 'Nk': Nk,
+                                'blanqueo': blanqueo}
                        )
     # Se realiza la minimización
     # Se puede usar directamente la función minimize como wrapper de Minimizer
@@ -431,7 +496,8 @@ def ajuste_afey_new(tau, Y, std_Y, Y_ini=[300, 1, 1], vary=3*[1], **kwargs):
 
     if verbose: report_fit(result)
     if plot:
-        ax0 = _plot_fit(tau, Y, std_Y, result)
+        ax0 = _plot_fit(tau, Y, std_Y, result,
+                        residual(result.params, tau, Nk=Nk))
         ax0.set_title(title)
 
     if conf_int:
@@ -517,6 +583,25 @@ def calcula_parametros_cineticos(result, reactor, **kwargs):
     return parametros
 
 
+def _lee_val_teoricos(val_teoricos):
+    """
+    Valores teóricos de la simulación (dict) o {} si no se pueden leer
+
+    `val_teoricos` puede ser el diccionario ya leído o el nombre del archivo
+    (ver `read_val_teo`).
+    """
+
+    if isinstance(val_teoricos, dict):
+        return val_teoricos
+    try:
+        return read_val_teo(val_teoricos)
+    except (IOError, OSError):
+        print('No se pudo leer el archivo de valores teóricos: ' +
+              val_teoricos)
+        print('No se calculan la eficiencia ni la tasa de fisiones')
+        return {}
+
+
 def ajuste_afey(tau, Y, std_Y, Y_ini=[300, 1, 1], vary=3*[1], **kwargs):
     """
     ES UN BORRADOR ESTÁ PENSADA PARA ANALIZAR RESULTADOS DE SIMULLACIONES
@@ -543,6 +628,14 @@ def ajuste_afey(tau, Y, std_Y, Y_ini=[300, 1, 1], vary=3*[1], **kwargs):
             'plot' : grafica el ajuste
             'conf_int' : calcula intervalos de confianza
             'Nk? : vector con cantidad de puntus para cada T_i
+            'cov_Y' : matriz de covarianza (T_i x T_i) de Y. Si se da, se
+                ajusta por cuadrados mínimos generalizados con los residuos
+                blanqueados (ver `matriz_blanqueo`) en lugar de usar std_Y
+            'contraccion' : contracción de cov_Y hacia su diagonal
+            'val_teoricos' : diccionario con los valores teóricos de la
+                simulación o nombre del archivo (por defecto
+                "./simulacion/val_teoricos.dat"). Si no se puede leer, la
+                eficiencia, la tasa de fisiones y teo_val son None.
 
     Resultados
     ----------
@@ -559,8 +652,13 @@ def ajuste_afey(tau, Y, std_Y, Y_ini=[300, 1, 1], vary=3*[1], **kwargs):
     conf_int = kwargs.get('conf_int', True)
     Nk = kwargs.get('Nk', None)
     tasa = kwargs.get("tasa", None)
+    teo = _lee_val_teoricos(kwargs.get('val_teoricos',
+                                       './simulacion/val_teoricos.dat'))
+    cov_Y = kwargs.get('cov_Y', None)
+    blanqueo = None if cov_Y is None else \
+        matriz_blanqueo(cov_Y, kwargs.get('contraccion', 0.0))
 
-    def residual(params, tau, data=None, sigma=None, Nk=None):
+    def residual(params, tau, data=None, sigma=None, Nk=None, blanqueo=None):
         parvals = params.valuesdict()
         alfa = parvals['alfa']
         amplitud = parvals['amplitud']
@@ -573,9 +671,7 @@ def ajuste_afey(tau, Y, std_Y, Y_ini=[300, 1, 1], vary=3*[1], **kwargs):
 
         if data is None:
             return model
-        if sigma is None:
-            return model - data
-        return (model - data) / sigma
+        return _pondera_residuo(model - data, sigma, blanqueo)
 
     # Se definen los parámetros del ajuste
     params = Parameters()
@@ -585,7 +681,8 @@ def ajuste_afey(tau, Y, std_Y, Y_ini=[300, 1, 1], vary=3*[1], **kwargs):
     # Se define la minimización
     minner = Minimizer(residual, params,
                        fcn_args=(tau,),
-                       fcn_kws={'data': Y, 'sigma': std_Y, 'Nk': Nk}
+                       fcn_kws={'data': Y, 'sigma': std_Y, 'Nk': Nk,
+                                'blanqueo': blanqueo}
                        )
     # Se realiza la minimización
     # Se puede usar directamente la función minimize como wrapper de Minimizer
@@ -596,7 +693,8 @@ def ajuste_afey(tau, Y, std_Y, Y_ini=[300, 1, 1], vary=3*[1], **kwargs):
 
     if verbose: report_fit(result)
     if plot:
-        ax0 = _plot_fit(tau, Y, std_Y, result)
+        ax0 = _plot_fit(tau, Y, std_Y, result,
+                        residual(result.params, tau, Nk=Nk))
 
     if conf_int:
         ci, _trace = conf_interval(minner, result, trace=True, verbose=False)
@@ -617,7 +715,8 @@ def ajuste_afey(tau, Y, std_Y, Y_ini=[300, 1, 1], vary=3*[1], **kwargs):
     alfa, ampl = uncertainties.correlated_values(params_val, result.covar,
             tags=result.var_names)
 
-    teo = read_val_teo("./simulacion/val_teoricos.dat")
+    if not teo:
+        return result, [alfa, None, None], None
     # TODO: falta considerar cuando se ajusta con offset
     DIVEN = teo['D_p']
     LAMBDA = teo['Lambda']
@@ -691,6 +790,122 @@ def ajuste_afey_nldtime(tau, Y, std_Y):
     return None
 
 
+def remuestrea_historias(historias, N_bs, semilla=None):
+    """
+    Curvas promedio de N_bs remuestreos (bootstrap) de las historias
+
+    Cada remuestreo toma N historias con reposición. En lugar de copiar las
+    historias elegidas se arma la matriz de pesos W (N_bs x N) con la cantidad
+    de veces que se eligió cada historia, y todos los promedios se obtienen
+    con un producto de matrices.
+
+    Parametros
+    ----------
+        historias : numpy array
+            Array de (T_i x N), cada columna es una historia (como lo devuelve
+            `lee_historias_completas`)
+        N_bs : entero
+            Cantidad de remuestreos
+        semilla : entero, opcional
+            Semilla del generador de números aleatorios
+
+    Resultados
+    ----------
+        Y_bs, std_Y_bs : numpy array
+            Arrays de (N_bs x T_i) con el valor medio y el desvío del valor
+            medio de cada remuestreo
+    """
+
+    N = historias.shape[1]
+    rng = np.random.default_rng(semilla)
+    _elegidas = rng.integers(0, N, size=(N_bs, N))
+    W = np.zeros((N_bs, N))
+    np.add.at(W, (np.repeat(np.arange(N_bs), N), _elegidas.ravel()), 1)
+    Y_bs = W @ historias.T / N
+    _var = (W @ (historias.T)**2 / N - Y_bs**2) * N / (N - 1)
+    std_Y_bs = np.sqrt(np.maximum(_var, 0) / N)
+    return Y_bs, std_Y_bs
+
+
+def _ajuste_bootstrap(arg_tupla):
+    """
+    Ajuste de un remuestreo con `ajuste_afey` (para paralelizar)
+
+    Devuelve [alfa, eficiencia] o nan si el ajuste no converge.
+    """
+
+    tau, Y, std_Y, Y_ini, vary, Nk, tasa, teo = arg_tupla
+    try:
+        _, val, _ = ajuste_afey(tau, Y, std_Y, Y_ini, vary=vary,
+                                verbose=False, plot=False, conf_int=False,
+                                Nk=Nk, tasa=tasa, val_teoricos=teo)
+    except (ValueError, TypeError, np.linalg.LinAlgError):
+        return [np.nan, np.nan]
+    return [val[0].n, np.nan if val[1] is None else val[1].n]
+
+
+def bootstrap_afey(nombre, N_bs, Y_ini=[500, 1, 0], vary=[1, 1, 0],
+                   **kwargs):
+    """
+    Distribución de alfa y eficiencia remuestreando historias (bootstrap)
+
+    Las historias se leen una única vez del archivo .dat, las curvas promedio
+    de todos los remuestreos se calculan juntas (`remuestrea_historias`) y los
+    ajustes (`ajuste_afey`) se reparten en un pool de procesos.
+
+    Parametros
+    ----------
+        nombre : string
+            Archivo con todas las historias (.dat o .h5)
+        N_bs : entero
+            Cantidad de remuestreos
+        Y_ini, vary : list
+            Igual que en `ajuste_afey`
+        kwargs : dict
+            'semilla' : semilla para elegir las historias
+            'Nk' : cantidad de intervalos de cada T_i. Por defecto se lee el
+                archivo .Nk, si existe.
+            'val_teoricos' : igual que en `ajuste_afey`. Se lee una única
+                vez; si no existe las eficiencias son nan.
+            'executor' : Ejecutor (ver `ejecutor.py`)
+
+    Resultados
+    ----------
+        alfas, eficiencias : numpy array
+            Valores ajustados en cada remuestreo (nan si no convergió)
+        covarianza : numpy array
+            Matriz de covarianza (2 x 2) de alfa y eficiencia (sólo la
+            varianza de alfa si no hay eficiencias)
+    """
+
+    tau, historias, _, tasas = lee_historias_completas(nombre)
+    Nk = kwargs.get('Nk')
+    _nombre_Nk = nombre.rsplit('.', 1)[0] + '.Nk'
+    if Nk is None and os.path.exists(_nombre_Nk):
+        Nk = lee_Nk(_nombre_Nk)
+
+    Y_bs, std_Y_bs = remuestrea_historias(historias, N_bs,
+                                          kwargs.get('semilla'))
+    teo = _lee_val_teoricos(kwargs.get('val_teoricos',
+                                       './simulacion/val_teoricos.dat'))
+    argumentos = [(tau, Y, std_Y, Y_ini, vary, Nk, tasas[0:2], teo)
+                  for Y, std_Y in zip(Y_bs, std_Y_bs)]
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        _res = np.asarray(pool.map(_ajuste_bootstrap, argumentos))
+
+    alfas, eficiencias = _res[:, 0], _res[:, 1]
+    _validos = np.isfinite(alfas)
+    if teo:
+        _validos &= np.isfinite(eficiencias)
+    if not np.all(_validos):
+        print('{} ajustes no convergieron'.format(np.sum(~_validos)))
+    if teo:
+        covarianza = np.cov(alfas[_validos], eficiencias[_validos])
+    else:
+        covarianza = np.cov(alfas[_validos])
+    return alfas, eficiencias, covarianza
+
+
 def teo_variance_berglof(Y, Nk):
     """ Varianza teórica """
     return 2*(Y+1)**2 / (Nk-1)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+"""
+Método de alfa-Feynman leyendo los archivos .bin de a bloques
+
+A diferencia de `metodo_alfa_feynman`, que necesita todos los datos en memoria
+(ver `wrapper_lectura`), aquí los archivos se leen de a bloques de tamaño fijo
+y para cada historia se van acumulando, para cada T_i, la cantidad de
+intervalos, su valor medio y la suma de los cuadrados de las desviaciones
+(algoritmo de Welford/Chan). De esta forma la memoria utilizada no depende de
+la duración de la adquisición.
+
+Los archivos de salida (.fey, .dat y .Nk) son los mismos que los escritos por
+`metodo_alfa_feynman`.
+"""
+
+import numpy as np
+
+import sys
+sys.path.append('../')
+
+from modules.io_modules import cantidad_datos_bin, lee_bin_dt_por_bloques, \
+                               lee_dt_encabezado
+from modules.alfa_feynman_procesamiento import acumula_historia, \
+    intervalos_agrupados, datos_promedio_Ti_agrupamiento, \
+    genera_indices_agrupamiento, lista_indices, escribe_resultados_afey
+
+
+def combina_estadistica(n_a, media_a, M2_a, n_b, media_b, M2_b):
+    """
+    Combina la estadística de dos conjuntos de datos (Chan et al.)
+
+    Parametros
+    ----------
+        n_a, media_a, M2_a : float o numpy array
+            Cantidad de datos, valor medio y suma de los cuadrados de las
+            desviaciones respecto del valor medio del primer conjunto
+        n_b, media_b, M2_b : float o numpy array
+            Ídem para el segundo conjunto
+
+    Resultados
+    ----------
+        n, media, M2 : float o numpy array
+            Estadística del conjunto combinado
+
+    >>> combina_estadistica(2, 1.5, 0.5, 1, 3.0, 0.0)
+    (3, 2.0, 2.0)
+    """
+
+    n = n_a + n_b
+    delta = media_b - media_a
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.where(n > 0, media_a + delta * n_b / n, 0.0)
+        M2 = np.where(n > 0, M2_a + M2_b + delta**2 * n_a * n_b / n, 0.0)
+    if np.ndim(media) == 0:
+        media, M2 = media.item(), M2.item()
+    return n, media, M2
+
+
+def lee_agrupado_por_bloques(nombre, int_agrupar, datos_por_bloque, n_datos):
+    """
+    Lee un archivo .bin de a bloques agrupando cada "int_agrupar" intervalos
+
+    A diferencia de `agrupa_datos`, el resultado son siempre cuentas (no se
+    normaliza por dt). Se leen sólo los primeros "n_datos" datos agrupados.
+
+    Parametros
+    ----------
+        nombre : string
+            Camino y nombre del archivo a leer
+        int_agrupar : entero
+            Cantidad de intervalos consecutivos que se suman
+        datos_por_bloque : entero
+            Cantidad aproximada de datos (sin agrupar) de cada bloque leido
+        n_datos : entero
+            Cantidad de datos agrupados que se quieren leer
+
+    Resultados
+    ----------
+        bloque : numpy array (uint64)
+            Generador con los datos agrupados de cada bloque
+    """
+
+    _por_bloque = max(datos_por_bloque // int_agrupar, 1) * int_agrupar
+    for bloque in lee_bin_dt_por_bloques(nombre, _por_bloque,
+                                         n_datos * int_agrupar):
+        _partes = len(bloque) // int_agrupar
+        yield bloque.reshape(_partes, int_agrupar).sum(axis=1,
+                                                       dtype='uint64')
+
+
+def acumula_bloque_historia(estadistica, cola, bloque, posicion, maximos,
+                            datos_x_hist):
+    """
+    Actualiza la estadística de una historia con un nuevo bloque de datos
+
+    Los intervalos de cada T_i comienzan en múltiplos de i desde el comienzo
+    de la historia. Los intervalos que quedaron incompletos al final del bloque
+    anterior se completan con "cola", que contiene los últimos (i_max - 1)
+    datos ya procesados de la historia.
+
+    Parametros
+    ----------
+        estadistica : tupla de numpy array
+            (n, media, M2) para cada T_i de la historia. Se modifica.
+        cola : numpy array
+            Últimos datos del bloque anterior de la misma historia
+        bloque : numpy array
+            Nuevos datos de la historia
+        posicion : entero
+            Posición (dentro de la historia) del primer dato de "bloque"
+        maximos : entero o lista de enteros
+            Cantidad máxima de intervalos que se agrupan (o lista de valores
+            de i, ver `genera_indices_agrupamiento`)
+        datos_x_hist : entero
+            Cantidad de datos de cada historia
+
+    Resultados
+    ----------
+        cola : numpy array
+            Datos que se necesitan para el próximo bloque de la historia
+    """
+
+    n, media, M2 = estadistica
+    _datos = np.concatenate((cola, bloque))
+    acumulada = acumula_historia(_datos)
+    # Posición (en la historia) del primer elemento de _datos
+    _base = posicion - len(cola)
+    _final = posicion + len(bloque)
+    indices = lista_indices(maximos)
+    for k, i in enumerate(indices):
+        _inicio = (posicion // i) * i
+        _partes = (min(_final, (datos_x_hist // i) * i) - _inicio) // i
+        if _partes <= 0:
+            continue
+        _intervalos = intervalos_agrupados(acumulada, i, _partes,
+                                           _inicio - _base)
+        _media = np.mean(_intervalos)
+        _M2 = np.sum((_intervalos - _media)**2)
+        n[k], media[k], M2[k] = \
+            combina_estadistica(n[k], media[k], M2[k], _partes, _media, _M2)
+    return _datos[max(len(_datos) - (max(indices) - 1), 0):]
+
+
+def metodo_alfa_feynman_bloques(nombres, numero_de_historias, dt_maximo,
+                                calculo='var_bloques', int_agrupar=1,
+                                datos_por_bloque=2**22, **kwargs):
+    """
+    Método de alfa-Feynman sin cargar en memoria toda la adquisición
+
+    Los archivos se leen en simultáneo de a bloques (`lee_bin_dt_por_bloques`)
+    y la estadística de cada historia se actualiza con cada bloque. Se usa la
+    misma cantidad de datos para todos los archivos (la del más corto), igual
+    que en `wrapper_lectura`.
+
+    Parametros
+    ----------
+    nombres : list of strings
+        Archivos .bin que se quieren procesar
+    numero_de_historias : entero
+        Cantidad de historias en que se dividirán los datos
+    dt_maximo: float
+        dt máximo que se quiere alcanzar
+    calculo : string
+        'var_bloques' : Método variance to mean a cada archivo
+        'sum_bloques' : Método variance to mean a la suma de los archivos
+    int_agrupar : entero
+        Cantidad de intervalos que se agrupan antes del procesamiento. A
+        diferencia de `wrapper_lectura`, los datos agrupados son cuentas.
+    datos_por_bloque : entero
+        Cantidad de datos que se leen de cada archivo en cada bloque. Define
+        la memoria utilizada.
+    kwargs : dictionary
+        kwargs['intervalos'], kwargs['puntos_por_decada']
+            Grilla de T_i, igual que en `metodo_alfa_feynman`
+        kwargs['carpeta_resultados'] : str ("resultados_afey" default)
+            Nombre de la carpeta donde se guardarán los resultados
+        kwargs['formato_salida'] : str ('texto' default, 'hdf5', 'ambos')
+            Igual que en `metodo_alfa_feynman`
+        kwargs['covarianza_Y'] : bool
+            Igual que en `metodo_alfa_feynman`
+
+    Resultados
+    ----------
+    Y_historias : numpy array
+        Array de (detectores x numero_de_historias x T_i). Para
+        'sum_bloques' hay un único elemento.
+    """
+
+    if calculo not in ['var_bloques', 'sum_bloques']:
+        print('El calculo "{}" solicitado no está implementado'.format(calculo))
+        print('Se sale del programa')
+        quit()
+
+    # Sólo se leen los encabezados
+    tamanos = []
+    dts = []
+    for nombre in nombres:
+        _n_datos, header, _ = cantidad_datos_bin(nombre)
+        tamanos.append(_n_datos)
+        dts.append(lee_dt_encabezado(header))
+    dt_base = dts[0] * int_agrupar
+    datos_totales = np.min(tamanos) // int_agrupar
+    datos_x_hist = datos_totales // numero_de_historias
+    maximos = genera_indices_agrupamiento(int(dt_maximo / dt_base),
+                                          kwargs.get('intervalos'),
+                                          kwargs.get('puntos_por_decada'))
+    n_T = len(lista_indices(maximos))
+
+    print('='*50)
+    print('    Parámetros del método alfa-Feynman (por bloques)')
+    print('='*50)
+    print('\tNúmero de historias: {}'.format(numero_de_historias))
+    print('\tInervalo temporal de los datos: {} s'.format(dt_base))
+    print('\tDatos totales: {}'.format(datos_totales))
+    print('\tDatos por historia: {}'.format(datos_x_hist))
+    print('\tCantidad de T_i: {}'.format(n_T))
+    print('\tDatos por bloque: {}'.format(datos_por_bloque))
+    print('='*50)
+
+    n_series = 1 if calculo == 'sum_bloques' else len(nombres)
+    Y_historias = np.empty((n_series, numero_de_historias, n_T))
+    # Estadística de la historia actual para cada serie
+    estadisticas = [(np.zeros(n_T), np.zeros(n_T), np.zeros(n_T))
+                    for _ in range(n_series)]
+    colas = [np.zeros(0, dtype='uint64') for _ in range(n_series)]
+    # Estadística de todos los datos de cada archivo (tasa de cuentas)
+    totales = [(0, 0.0, 0.0) for _ in nombres]
+
+    lectores = [lee_agrupado_por_bloques(nombre, int_agrupar,
+                                         datos_por_bloque, datos_totales)
+                for nombre in nombres]
+    # Posición global (en datos agrupados) del comienzo de cada bloque
+    posicion = 0
+    for bloques in zip(*lectores):
+        for k, bloque in enumerate(bloques):
+            _media = np.mean(bloque)
+            totales[k] = combina_estadistica(*totales[k], len(bloque), _media,
+                                             np.sum((bloque - _media)**2))
+        if calculo == 'sum_bloques':
+            bloques = [np.sum(bloques, axis=0)]
+
+        # Se recorren las historias que abarca el bloque
+        _inicio = 0
+        _largo = len(bloques[0])
+        while _inicio < _largo:
+            _global = posicion + _inicio
+            j = _global // datos_x_hist
+            if j >= numero_de_historias:
+                break
+            _pos_hist = _global - j * datos_x_hist
+            _fin = min(_largo, _inicio + datos_x_hist - _pos_hist)
+            for k in range(n_series):
+                colas[k] = acumula_bloque_historia(
+                    estadisticas[k], colas[k], bloques[k][_inicio:_fin],
+                    _pos_hist, maximos, datos_x_hist)
+                if _pos_hist + _fin - _inicio == datos_x_hist:
+                    # Terminó la historia
+                    n, media, M2 = estadisticas[k]
+                    Y_historias[k, j] = M2 / (n - 1) / media - 1
+                    for _array in estadisticas[k]:
+                        _array[:] = 0
+                    colas[k] = np.zeros(0, dtype='uint64')
+            if _pos_hist + _fin - _inicio == datos_x_hist:
+                print('Historia: {}'.format(j+1))
+            _inicio = _fin
+        posicion += _largo
+
+    # Tasa de cuentas promedio y desvío del promedio para cada archivo
+    tasas = []
+    for n, media, M2 in totales:
+        tasas.append([media / dt_base,
+                      np.sqrt(M2 / (n - 1)) / dt_base / np.sqrt(n)])
+
+    M_points = datos_promedio_Ti_agrupamiento(datos_x_hist, maximos)
+    carpeta = kwargs.get('carpeta_resultados', 'resultados_afey')
+    escribe_resultados_afey(Y_historias, dt_base, M_points, maximos, calculo,
+                            numero_de_historias, tasas, nombres, carpeta,
+                            kwargs.get('formato_salida', 'texto'),
+                            kwargs.get('covarianza_Y', False))
+
+    return Y_historias
+
+
+if __name__ == '__main__':
+
+    # Archivos a leer
+    nombres = [
+              '../datos/nucleo_01.D1.bin',
+              '../datos/nucleo_01.D2.bin',
+              ]
+    numero_de_historias = 100
+    dt_maximo = 50e-3
+
+    Y_historias = metodo_alfa_feynman_bloques(nombres, numero_de_historias,
+                                              dt_maximo, 'var_bloques',
+                                              int_agrupar=5,
+                                              datos_por_bloque=2**20)
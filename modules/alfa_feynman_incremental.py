@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+
+"""
+Método de alfa-Feynman incremental
+
+Junto con los archivos de resultados (.dat, .fey y .Nk) se guarda, en un
+archivo '.est.npz', la estadística suficiente de cada historia para cada T_i:
+cantidad de intervalos, valor medio y suma de los cuadrados de las
+desviaciones (n, media, M2). Cuando llegan nuevos archivos de la misma
+medición (otros segmentos de la adquisición) sólo se procesan los datos
+nuevos, que forman nuevas historias del mismo largo, y se agregan a las
+guardadas con `agrega_alfa_feynman`. Luego se vuelven a escribir los
+archivos de resultados con todas las historias:
+
+    metodo_alfa_feynman_incremental(leidos, 100, 50e-3, 'var_paralelo',
+                                    nombres)
+    ...
+    agrega_alfa_feynman(leidos_nuevos,
+                        'resultados_afey/medicion.D1D2_var_paralelo.est.npz')
+"""
+
+import numpy as np
+import os
+
+import sys
+sys.path.append('../')
+
+from modules.ejecutor import usa_ejecutor
+from modules.memoria_compartida import mapea_historias_compartidas
+from modules.alfa_feynman_bloques import combina_estadistica
+from modules.alfa_feynman_procesamiento import acumula_historia, \
+    intervalos_agrupados, calcula_alfa_feynman_input, lista_indices, \
+    indices_de_kwargs, escribe_resultados_afey
+
+
+def estadistica_historia(arg_tupla):
+    """
+    Estadística suficiente de una historia para cada T_i
+
+    Resultados
+    ----------
+        est : numpy array
+            Array de (3 x T_i) con n, media y M2 de los intervalos de cada T_i
+    """
+
+    historia, maximos, datos_x_hist = arg_tupla
+    acumulada = acumula_historia(historia[0:datos_x_hist])
+    indices = lista_indices(maximos)
+    est = np.empty((3, len(indices)))
+    for k, i in enumerate(indices):
+        _intervalos = intervalos_agrupados(acumulada, i, datos_x_hist // i)
+        est[0, k] = len(_intervalos)
+        est[1, k] = np.mean(_intervalos)
+        est[2, k] = np.sum((_intervalos - est[1, k])**2)
+    return est
+
+
+def calcula_estadistica(leidos, calculo, numero_de_historias, datos_x_hist,
+                        maximos, pool):
+    """
+    Estadística de las historias de cada serie y de los datos de cada archivo
+
+    Parametros
+    ----------
+        leidos : lista de tuplas
+            (datos, dt_base) de cada archivo
+        calculo : string ('var_paralelo' o 'sum_paralelo')
+        numero_de_historias, datos_x_hist : entero
+        maximos : lista de enteros
+            Valores de i de los T_i
+        pool : Ejecutor
+
+    Resultados
+    ----------
+        est : numpy array
+            Array de (series x historias x 3 x T_i)
+        totales : numpy array
+            Array de (archivos x 3) con n, media y M2 de los datos de cada
+            archivo (para la tasa de cuentas)
+    """
+
+    _datos = [leido[0][0:numero_de_historias * datos_x_hist]
+              for leido in leidos]
+    totales = np.array([[len(dato), np.mean(dato),
+                         np.sum((dato - np.mean(dato))**2)]
+                        for dato in _datos])
+    if calculo == 'sum_paralelo':
+        _datos = [np.sum(_datos, axis=0)]
+    est = []
+    for dato in _datos:
+        historias = np.split(dato, numero_de_historias)
+        _est = mapea_historias_compartidas(pool, estadistica_historia,
+                                           historias, (maximos, datos_x_hist),
+                                           3 * len(maximos))
+        est.append(_est.reshape(numero_de_historias, 3, len(maximos)))
+    return np.array(est), totales
+
+
+def escribe_incremental(nombre_est, est, totales, resultados):
+    """
+    Guarda la estadística y vuelve a escribir los archivos de resultados
+
+    Parametros
+    ----------
+        nombre_est : string
+            Archivo .est.npz
+        est, totales : numpy array
+            Ver `calcula_estadistica`
+        resultados : dict
+            Parámetros del procesamiento (calculo, dt_base, maximos, grilla,
+            datos_x_hist, nombres, carpeta, formato)
+    """
+
+    n, media, M2 = est[:, :, 0, :], est[:, :, 1, :], est[:, :, 2, :]
+    Y_historias = M2 / (n - 1) / media - 1
+    dt_base = float(resultados['dt_base'])
+    tasas = [[_media / dt_base, np.sqrt(_M2 / (_n - 1)) / dt_base / np.sqrt(_n)]
+             for _n, _media, _M2 in totales]
+    maximos = [int(i) for i in resultados['maximos']]
+    if not resultados['grilla']:
+        maximos = maximos[-1]
+    M_points = n[0, 0].astype(int)
+    escribe_resultados_afey(Y_historias, dt_base, M_points, maximos,
+                            str(resultados['calculo']), Y_historias.shape[1],
+                            tasas, list(resultados['nombres']),
+                            str(resultados['carpeta']),
+                            str(resultados['formato']))
+    np.savez(nombre_est, est=est, totales=totales, **resultados)
+    return Y_historias
+
+
+def metodo_alfa_feynman_incremental(leidos, numero_de_historias, dt_maximo,
+                                    calculo, nombres, **kwargs):
+    """
+    `metodo_alfa_feynman` guardando la estadística para agregar datos luego
+
+    Parametros
+    ----------
+    leidos, numero_de_historias, dt_maximo, nombres :
+        Igual que en `metodo_alfa_feynman`
+    calculo : string
+        'var_paralelo' o 'sum_paralelo'
+    kwargs : dictionary
+        kwargs['intervalos'], kwargs['puntos_por_decada'],
+        kwargs['carpeta_resultados'], kwargs['formato_salida'],
+        kwargs['executor'] : igual que en `metodo_alfa_feynman`
+
+    Resultados
+    ----------
+    Y_historias : numpy array
+        Array de (series x numero_de_historias x T_i)
+    nombre_est : string
+        Archivo .est.npz con la estadística, que se le pasa a
+        `agrega_alfa_feynman`
+    """
+
+    if calculo not in ['var_paralelo', 'sum_paralelo']:
+        print('El calculo "{}" solicitado no está implementado'.format(calculo))
+        print('Se sale del programa')
+        quit()
+
+    dt_base = leidos[0][1]
+    _, max_int, datos_x_hist = \
+        calcula_alfa_feynman_input(leidos[0][0], numero_de_historias, dt_base,
+                                   dt_maximo)
+    maximos = indices_de_kwargs(max_int, kwargs)
+    carpeta = kwargs.get('carpeta_resultados', 'resultados_afey')
+    resultados = {'calculo': calculo,
+                  'dt_base': dt_base,
+                  'maximos': lista_indices(maximos),
+                  'grilla': np.ndim(maximos) != 0,
+                  'datos_x_hist': datos_x_hist,
+                  'nombres': nombres,
+                  'carpeta': carpeta,
+                  'formato': kwargs.get('formato_salida', 'texto'),
+                  }
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        est, totales = calcula_estadistica(leidos, calculo,
+                                           numero_de_historias, datos_x_hist,
+                                           resultados['maximos'], pool)
+
+    if not os.path.exists(carpeta): os.makedirs(carpeta)
+    _ids = [nombre.split('/')[-1].rsplit('.')[-2] for nombre in nombres]
+    _base = nombres[0].split('/')[-1].rsplit('.')[-3]
+    nombre_est = os.path.join(carpeta, '{}.{}_{}.est.npz'.format(
+                              _base, ''.join(_ids), calculo))
+    Y_historias = escribe_incremental(nombre_est, est, totales, resultados)
+    return Y_historias, nombre_est
+
+
+def agrega_alfa_feynman(leidos, nombre_est, **kwargs):
+    """
+    Agrega nuevos datos a un resultado de `metodo_alfa_feynman_incremental`
+
+    Los nuevos datos se dividen en historias del mismo largo que las
+    guardadas (los datos sobrantes se descartan), se calcula sólo su
+    estadística y se agrega a la guardada. Se vuelven a escribir los
+    archivos de resultados (con los mismos nombres) y el archivo .est.npz.
+
+    Parametros
+    ----------
+    leidos : lista de tuplas
+        (datos, dt_base) de los nuevos archivos, en el mismo orden que los
+        originales y con el mismo dt_base
+    nombre_est : string
+        Archivo .est.npz generado por `metodo_alfa_feynman_incremental`
+    kwargs : dictionary
+        kwargs['executor'] : Ejecutor (ver `ejecutor.py`)
+
+    Resultados
+    ----------
+    Y_historias : numpy array
+        Array de (series x historias totales x T_i)
+    """
+
+    with np.load(nombre_est) as f:
+        est = f['est']
+        totales = f['totales']
+        resultados = {clave: f[clave] for clave in f.files
+                      if clave not in ['est', 'totales']}
+
+    if not np.isclose(leidos[0][1], resultados['dt_base']):
+        print('Los nuevos datos tienen distinto dt que los guardados')
+        print('Se sale del programa')
+        quit()
+    datos_x_hist = int(resultados['datos_x_hist'])
+    numero_de_historias = np.min([len(leido[0]) for leido in leidos]) \
+        // datos_x_hist
+    if numero_de_historias == 0:
+        print('No alcanzan los datos para formar una nueva historia')
+        return None
+    print('Se agregan {} historias a las {} guardadas'.format(
+          numero_de_historias, est.shape[1]))
+
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        est_nueva, totales_nuevos = calcula_estadistica(
+            leidos, str(resultados['calculo']), numero_de_historias,
+            datos_x_hist, [int(i) for i in resultados['maximos']], pool)
+
+    # Las historias nuevas se agregan a las anteriores
+    est = np.concatenate((est, est_nueva), axis=1)
+    # La estadística de los datos de cada archivo se combina
+    for k, (_total, _nuevo) in enumerate(zip(totales, totales_nuevos)):
+        totales[k] = combina_estadistica(*_total, *_nuevo)
+    return escribe_incremental(nombre_est, est, totales, resultados)
+
+
+if __name__ == '__main__':
+
+    from modules.alfa_feynman_procesamiento import wrapper_lectura
+
+    nombres = [
+              '../datos/nucleo_01.D1.bin',
+              '../datos/nucleo_01.D2.bin',
+              ]
+    leidos = wrapper_lectura(nombres, 5)
+    Y_historias, nombre_est = metodo_alfa_feynman_incremental(
+        leidos, 100, 50e-3, 'var_paralelo', nombres)
+
+    # Nuevo segmento de la misma adquisición
+    nombres_nuevos = [
+                     '../datos/nucleo_02.D1.bin',
+                     '../datos/nucleo_02.D2.bin',
+                     ]
+    leidos_nuevos = wrapper_lectura(nombres_nuevos, 5)
+    Y_historias = agrega_alfa_feynman(leidos_nuevos, nombre_est)
@@ -4,13 +4,15 @@ import numpy as np
 import itertools
 import datetime
 import os
-import multiprocessing as mp
 
 import sys
 sys.path.append('../')
 
-from modules.io_modules import lee_bin_datos_dt
+from modules.io_modules import lee_bin_datos_dt, importa_h5py
 from modules.estadistica import agrupa_datos
+from modules.memoria_compartida import mapea_historias_compartidas
+from modules.ejecutor import usa_ejecutor
+from modules.piramide_cuentas import agrupa_datos_piramide
 
 
 def calcula_alfa_feynman_input(datos, numero_de_historias, dt_base, dt_maximo):
@@ -40,22 +42,191 @@ def calcula_alfa_feynman_input(datos, numero_de_historias, dt_base, dt_maximo):
     return historias, maximos_int_para_agrupar, datos_por_historia
 
 
+def acumula_historia(historia):
+    """
+    Suma acumulada de los datos de una historia para la técnica de agrupamiento
+
+    Se agrega un cero al comienzo, de manera que la suma de los datos entre los
+    índices [j, k) se obtiene como acumulada[k] - acumulada[j]. La acumulación
+    se hace con enteros de 64 bits sin signo para que sea exacta.
+
+    Se trabaja sobre el último eje, por lo que también se pueden pasar varias
+    historias (o detectores) apiladas en un array de 2D.
+
+    Parametros
+    ----------
+        historia : numpy array
+            Cuentas en cada intervalo dt_base de la historia
+
+    Resultados
+    ----------
+        acumulada : numpy array (uint64)
+            Suma acumulada con un elemento más que `historia` en el último eje
+
+    >>> acumula_historia(np.array([3, 6, 7, 9, 1]))
+    array([ 0,  3,  9, 16, 25, 26], dtype=uint64)
+    """
+
+    historia = np.asarray(historia)
+    forma = historia.shape[:-1] + (historia.shape[-1] + 1,)
+    acumulada = np.zeros(forma, dtype='uint64')
+    np.cumsum(historia, axis=-1, dtype='uint64', out=acumulada[..., 1:])
+    return acumulada
+
+
+def intervalos_agrupados(acumulada, i, partes, inicio=0):
+    """
+    Intervalos sintetizados de ancho i a partir de la suma acumulada
+
+    Es equivalente a tomar historia[inicio:inicio + partes*i], hacer un reshape
+    de (partes, i) y sumar sobre el eje 1, pero sin copiar ni recorrer todos
+    los datos: sólo se restan dos vistas con paso i de `acumulada`.
+
+    Parametros
+    ----------
+        acumulada : numpy array
+            Suma acumulada obtenida con `acumula_historia`
+        i : entero
+            Cantidad de intervalos dt_base que se agrupan
+        partes : entero
+            Cantidad de intervalos sintetizados que se quieren obtener
+        inicio : entero, opcional
+            Índice (en unidades de dt_base) del primer dato utilizado
+
+    Resultados
+    ----------
+        intervalos : numpy array (uint64)
+            Cuentas en cada intervalo de ancho i
+
+    >>> acumulada = acumula_historia(np.array([3, 6, 7, 9, 1]))
+    >>> intervalos_agrupados(acumulada, 2, 2)
+    array([ 9, 16], dtype=uint64)
+    """
+
+    fin = inicio + partes * i
+    return acumulada[..., inicio + i:fin + 1:i] - acumulada[..., inicio:fin:i]
+
+
+def Y_por_segmentos(intervalos, largos):
+    """
+    Y = var/mean - 1 de segmentos consecutivos de intervalos, sin iterar
+
+    Los intervalos de todos los T_i se concatenan en el último eje y la
+    estadística de cada segmento se obtiene con `np.add.reduceat` (en dos
+    pasadas: primero el valor medio y luego la suma de los cuadrados de las
+    desviaciones, igual que `np.var`). También funciona con varias historias
+    apiladas en un array de 2D.
+
+    Parametros
+    ----------
+        intervalos : numpy array
+            Cuentas de los intervalos de todos los segmentos, uno a
+            continuación del otro en el último eje
+        largos : lista de enteros
+            Cantidad de intervalos de cada segmento (mayor que cero)
+
+    Resultados
+    ----------
+        Y, media : numpy array
+            Y y valor medio de cada segmento (último eje)
+
+    >>> Y, media = Y_por_segmentos(np.array([1, 3, 2, 2, 8]), [2, 3])
+    >>> Y, media
+    (array([0., 2.]), array([2., 4.]))
+    """
+
+    largos = np.asarray(largos)
+    bordes = np.concatenate(([0], np.cumsum(largos)[:-1]))
+    intervalos = intervalos.astype('float64')
+    media = np.add.reduceat(intervalos, bordes, axis=-1) / largos
+    _dif = intervalos - np.repeat(media, largos, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        varianza = np.add.reduceat(_dif**2, bordes, axis=-1) / (largos - 1)
+        return varianza / media - 1, media
+
+
+def genera_indices_agrupamiento(max_int, intervalos=None,
+                                puntos_por_decada=None):
+    """
+    Cantidad de intervalos dt_base que se agrupan para cada T_i
+
+    Por defecto se usan todos los enteros 1..max_int. Se puede pasar una lista
+    explícita o pedir puntos equiespaciados en escala logarítmica.
+
+    Parametros
+    ----------
+        max_int : entero
+            Cantidad máxima de intervalos que se agrupan (dt_maximo / dt_base)
+        intervalos : lista de enteros, opcional
+            Valores de i que se quieren utilizar (T_i = i * dt_base). Se
+            descartan los repetidos y los mayores a max_int.
+        puntos_por_decada : entero, opcional
+            Cantidad de puntos por década entre 1 y max_int. Como i es entero
+            se descartan los repetidos, por lo que para T_i chicos puede haber
+            menos puntos.
+
+    Resultados
+    ----------
+        maximos : entero o lista de enteros
+            Si no se especificó ninguna opción se devuelve max_int (como
+            hasta ahora). En otro caso, la lista ordenada de valores de i.
+            Las funciones de agrupamiento aceptan ambos (ver `lista_indices`).
+
+    >>> genera_indices_agrupamiento(100, puntos_por_decada=5)
+    [1, 2, 3, 4, 6, 10, 16, 25, 40, 63, 100]
+    >>> genera_indices_agrupamiento(10, intervalos=[8, 2, 2, 20])
+    [2, 8]
+    """
+
+    if intervalos is not None:
+        indices = np.unique(np.asarray(intervalos, dtype=int))
+        indices = indices[(indices >= 1) & (indices <= max_int)]
+    elif puntos_por_decada is not None:
+        _puntos = int(np.ceil(puntos_por_decada * np.log10(max_int))) + 1
+        indices = np.unique(np.rint(np.logspace(0, np.log10(max_int),
+                                                _puntos)).astype(int))
+    else:
+        return max_int
+    if len(indices) == 0:
+        print('No quedó ningún intervalo T_i para agrupar')
+        print('Se sale del programa')
+        quit()
+    return [int(i) for i in indices]
+
+
+def lista_indices(maximos):
+    """
+    Lista de i para la técnica de agrupamiento
+
+    `maximos` puede ser un entero (se usan 1..maximos) o directamente la
+    lista obtenida con `genera_indices_agrupamiento`.
+    """
+
+    if np.ndim(maximos) == 0:
+        return list(range(1, maximos + 1))
+    return list(maximos)
+
+
+def indices_de_kwargs(max_int, kwargs):
+    """ `genera_indices_agrupamiento` con las opciones de kwargs """
+
+    return genera_indices_agrupamiento(max_int, kwargs.get('intervalos'),
+                                       kwargs.get('puntos_por_decada'))
+
+
 def agrupamiento_historia_cov(arg_tupla):
     """ Técnica de agrupamientto para el método de la covarianza """
 
     historia, maximos, datos_x_hist = arg_tupla
-    det1 = historia[0]
-    det2 = historia[1]
+    acumulada1 = acumula_historia(historia[0][0:datos_x_hist])
+    acumulada2 = acumula_historia(historia[1][0:datos_x_hist])
     Y_k1 = []
     Y_k2 = []
     Y_k12 = []
-    for i in range(1, maximos+1):
+    for i in lista_indices(maximos):
         _partes = datos_x_hist // i
-        _indice_exacto = _partes * i
-        _matriz1 = det1[0:_indice_exacto].reshape(_partes, i)
-        _matriz2 = det2[0:_indice_exacto].reshape(_partes, i)
-        _intervalos1 = _matriz1.sum(axis=1, dtype='uint32')
-        _intervalos2 = _matriz2.sum(axis=1, dtype='uint32')
+        _intervalos1 = intervalos_agrupados(acumulada1, i, _partes)
+        _intervalos2 = intervalos_agrupados(acumulada2, i, _partes)
         _cov = np.cov(_intervalos1, _intervalos2)
         Y_k1.append(_cov[0, 0] / np.mean(_intervalos1) - 1)
         Y_k2.append(_cov[1, 1] / np.mean(_intervalos2) - 1)
@@ -65,28 +236,82 @@ def agrupamiento_historia_cov(arg_tupla):
 
 
 def agrupamiento_historia(arg_tupla):
-    """ Técnica de agrupamiento para una historia """
+    """
+    Técnica de agrupamiento para una historia
+
+    Los intervalos de cada T_i se obtienen de la suma acumulada de la historia
+    (ver `acumula_historia` e `intervalos_agrupados`), por lo que cada T_i
+    cuesta O(datos_x_hist / i) en lugar de recorrer toda la historia.
+    """
 
     historia, maximos, datos_x_hist = arg_tupla
+    acumulada = acumula_historia(historia[0:datos_x_hist])
     Y_k = []
-    for i in range(1, maximos+1):
-        _partes = datos_x_hist // i
-        _indice_exacto = _partes * i
-        _matriz = historia[0:_indice_exacto].reshape(_partes, i)
-        _intervalos = _matriz.sum(axis=1, dtype='uint32')
+    for i in lista_indices(maximos):
+        _intervalos = intervalos_agrupados(acumulada, i, datos_x_hist // i)
         Y_k.append(np.var(_intervalos, ddof=1) / np.mean(_intervalos) - 1)
     return Y_k
 
 
-def calcula_alfa_feynman(datos, numero_de_historias, dt_base, dt_maximo):
+def momentos_intervalos(intervalos):
+    """
+    Y y Y2 (momento de Feynman de segundo orden) de los intervalos de un T_i
+
+    Se usan los estimadores insesgados de los cumulantes (k-estadísticos)
+        k2 = n / (n - 1) * m2
+        k3 = n**2 / ((n - 1) * (n - 2)) * m3
+    con m2 y m3 los momentos centrados de las cuentas, y
+        Y = k2 / k1 - 1
+        Y2 = (k3 - 3 * k2 + 2 * k1) / k1
+    Y2 es el tercer cumulante factorial normalizado por el valor medio (es
+    nulo para un proceso de Poisson).
+
+    >>> Y, Y2 = momentos_intervalos(np.array([1, 2, 2, 3, 7]))
+    >>> print(round(Y, 6), round(Y2, 6))
+    0.833333 4.0
+    """
+
+    n = len(intervalos)
+    media = np.mean(intervalos)
+    k2 = np.var(intervalos, ddof=1)
+    if n < 3:
+        return k2 / media - 1, np.nan
+    k3 = np.sum((intervalos - media)**3) * n / ((n - 1) * (n - 2))
+    return k2 / media - 1, (k3 - 3 * k2 + 2 * media) / media
+
+
+def agrupamiento_historia_momentos(arg_tupla):
+    """
+    Técnica de agrupamiento para una historia calculando Y y Y2
+
+    Igual que `agrupamiento_historia`, pero con una sola pasada por los
+    intervalos de cada T_i se obtienen los dos momentos (ver
+    `momentos_intervalos`). El resultado tiene dos filas: Y y Y2.
+    """
+
+    historia, maximos, datos_x_hist = arg_tupla
+    acumulada = acumula_historia(historia[0:datos_x_hist])
+    Y_k = []
+    for i in lista_indices(maximos):
+        _intervalos = intervalos_agrupados(acumulada, i, datos_x_hist // i)
+        Y_k.append(momentos_intervalos(_intervalos))
+    return np.transpose(Y_k)
+
+
+def calcula_alfa_feynman(datos, numero_de_historias, dt_base, dt_maximo,
+                         **kwargs):
     """
     Método de alfa-Feynman con la técnica de agrupamiento. En serie.
 
+    En kwargs se pueden pasar 'intervalos' o 'puntos_por_decada' (ver
+    `genera_indices_agrupamiento`).
     """
     # Se generan historias y datos para la técnia de agrupamiento
     historias, maximos_int_para_agrupar, datos_por_historia =  \
         calcula_alfa_feynman_input(datos, numero_de_historias, dt_base,
                                    dt_maximo)
+    maximos_int_para_agrupar = indices_de_kwargs(maximos_int_para_agrupar,
+                                                 kwargs)
     # Se aplica la técnica de agrupamiento
     Y_historias = []
     for j, historia in enumerate(historias):
@@ -97,7 +322,7 @@ def calcula_alfa_feynman(datos, numero_de_historias, dt_base, dt_maximo):
     return Y_historias
 
 
-def wrapper_lectura(nombres, int_agrupar):
+def wrapper_lectura(nombres, int_agrupar, piramide=False):
     """
     Función para leer los datos y agrupar intervalos
 
@@ -107,6 +332,10 @@ def wrapper_lectura(nombres, int_agrupar):
         El camino y nombre de los archivos para leer
     int_agrupar : entero
         Cantidad de datos que se quieren agrupar antes del procesamiento
+    piramide : bool
+        Si es True los datos agrupados se leen de la pirámide de cuentas de
+        cada archivo, que se construye la primera vez (ver
+        `piramide_cuentas.py`)
 
     Resultados
     ----------
@@ -121,6 +350,13 @@ def wrapper_lectura(nombres, int_agrupar):
             dt_agrupado = (dt_base * int_agrupar )
 
     """
+    if piramide:
+        agrupado_y_dt = [agrupa_datos_piramide(nombre, int_agrupar)
+                         for nombre in nombres]
+        # Todos tendrán el mismo tamaño (obligatorio para calcular cov)
+        tamano_minimo = np.min([len(dato) for dato, _ in agrupado_y_dt])
+        return [(dato[0:tamano_minimo], dt) for dato, dt in agrupado_y_dt]
+
     _results = lee_bin_datos_dt(nombres)
 
     # Tamaños de los datos adquiridos
@@ -139,7 +375,7 @@ def wrapper_lectura(nombres, int_agrupar):
 
 
 def datos_promedio_Ti_agrupamiento(datos_x_hist, max_int):
-    return [datos_x_hist // i for i in range(1, max_int + 1)]
+    return [datos_x_hist // i for i in lista_indices(max_int)]
 
 
 def afey_varianza_serie(leidos, numero_de_historias, dt_maximo, **kwargs):
@@ -154,11 +390,11 @@ def afey_varianza_serie(leidos, numero_de_historias, dt_maximo, **kwargs):
     for leido in leidos:
         a, dt_base = leido
         Y_historias.append(calcula_alfa_feynman(a, numero_de_historias,
-                                                dt_base, dt_maximo))
+                                                dt_base, dt_maximo, **kwargs))
 
     datos_totales = len(a)
     datos_x_hist = datos_totales // numero_de_historias
-    max_int = int(dt_maximo / dt_base)
+    max_int = indices_de_kwargs(int(dt_maximo / dt_base), kwargs)
 
     M_points = datos_promedio_Ti_agrupamiento(datos_x_hist, max_int)
 
@@ -179,19 +415,259 @@ def afey_varianza_paralelo(leidos, numero_de_historias, dt_maximo, **kwargs):
 
     """
 
+    Y_historias = []
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        for leido in leidos:
+            a, dt_base = leido
+            historias, max_int, datos_x_hist = \
+                calcula_alfa_feynman_input(a, numero_de_historias, dt_base,
+                                           dt_maximo)
+            max_int = indices_de_kwargs(max_int, kwargs)
+            # Las historias se envían a los procesos por memoria compartida
+            Y_historias.append(
+                mapea_historias_compartidas(pool, agrupamiento_historia,
+                                            historias,
+                                            (max_int, datos_x_hist),
+                                            len(lista_indices(max_int)),
+                                            punto_control=kwargs.get(
+                                                'punto_control')))
+
+    M_points = datos_promedio_Ti_agrupamiento(datos_x_hist, max_int)
+
+    return Y_historias, dt_base, M_points
+
+
+def afey_momentos_paralelo(leidos, numero_de_historias, dt_maximo,
+                           **kwargs):
+    """
+    Metodo de alfa-Feynman calculando Y y Y2 en una misma pasada, en paralelo.
+
+    Y_historias tiene primero los Y de cada elemento de leidos y luego los Y2
+    de cada elemento, en el mismo orden.
+
+    Ver el DocString de "metodo_alfa_feynman" para parametros y resultados.
+
+    """
+
+    Y_historias = []
+    Y2_historias = []
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        for leido in leidos:
+            a, dt_base = leido
+            historias, max_int, datos_x_hist = \
+                calcula_alfa_feynman_input(a, numero_de_historias, dt_base,
+                                           dt_maximo)
+            max_int = indices_de_kwargs(max_int, kwargs)
+            _n_T = len(lista_indices(max_int))
+            _res = mapea_historias_compartidas(pool,
+                                               agrupamiento_historia_momentos,
+                                               historias,
+                                               (max_int, datos_x_hist),
+                                               2 * _n_T,
+                                               punto_control=kwargs.get(
+                                                   'punto_control'))
+            _res = _res.reshape(len(historias), 2, _n_T)
+            Y_historias.append(_res[:, 0, :])
+            Y2_historias.append(_res[:, 1, :])
+
+    M_points = datos_promedio_Ti_agrupamiento(datos_x_hist, max_int)
+
+    return Y_historias + Y2_historias, dt_base, M_points
+
+
+def factores_solapados(datos_x_hist, i):
+    """
+    Factores para la estadística con intervalos solapados de ancho i
+
+    Se toman las M = datos_x_hist - i + 1 ventanas deslizantes de ancho i.
+    Suponiendo que las cuentas en cada dt_base no están correlacionadas, la
+    correlación entre dos ventanas separadas l intervalos es
+    rho(l) = max(0, 1 - l/i). Con esto:
+
+        var(media) = c * var(x),  c = [M + 2 sum_l (M - l) rho(l)] / M^2
+
+    de manera que sum((x - media)^2) / (M * (1 - c)) es un estimador
+    insesgado de var(x) (para i = 1 es el clásico con M - 1). Además, la
+    cantidad efectiva de muestras independientes para la varianza es
+
+        N_eff = M / [1 + 2 sum_l (1 - l/M) rho(l)^2]
+
+    OJO: las cuentas de un reactor sí están correlacionadas (es lo que mide
+    alfa-Feynman), por lo que rho(l) es mayor y c está subestimado. El sesgo
+    resultante es del orden de Y(T_i) * c, despreciable mientras T_i sea
+    mucho menor que la duración de la historia. Sólo es exacto para datos de
+    Poisson.
+
+    Parametros
+    ----------
+        datos_x_hist : entero
+            Cantidad de datos de cada historia
+        i : entero
+            Cantidad de intervalos dt_base que se agrupan
+
+    Resultados
+    ----------
+        c : float
+            Factor de corrección del sesgo de la varianza
+        N_eff : float
+            Cantidad efectiva de muestras independientes
+
+    >>> factores_solapados(10, 1)
+    (0.1, 10.0)
+    """
+
+    M = datos_x_hist - i + 1
+    l = np.arange(1, min(i, M))
+    rho = 1 - l / i
+    c = (M + 2 * np.sum((M - l) * rho)) / M**2
+    N_eff = M / (1 + 2 * np.sum((1 - l / M) * rho**2))
+    return float(c), float(N_eff)
+
+
+def agrupamiento_historia_solapado(arg_tupla):
+    """
+    Técnica de agrupamiento con intervalos solapados (ventana deslizante)
+
+    Para cada T_i se toman todas las ventanas de ancho i a partir de la suma
+    acumulada (O(datos_x_hist) por T_i) y la varianza se corrige por la
+    correlación entre ventanas (ver `factores_solapados`).
+    """
+
+    historia, maximos, datos_x_hist = arg_tupla
+    acumulada = acumula_historia(historia[0:datos_x_hist])
+    Y_k = []
+    for i in lista_indices(maximos):
+        _ventanas = acumulada[i:] - acumulada[:-i]
+        _media = np.mean(_ventanas)
+        _c, _ = factores_solapados(datos_x_hist, i)
+        _var = np.sum((_ventanas - _media)**2) / (len(_ventanas) * (1 - _c))
+        Y_k.append(_var / _media - 1)
+    return Y_k
+
+
+def afey_varianza_paralelo_solapado(leidos, numero_de_historias, dt_maximo,
+                                    **kwargs):
+    """
+    Metodo de alfa-Feynman aplicado variance to mean con intervalos
+    solapados, en paralelo.
+
+    M_points tiene la cantidad de intervalos contiguos de cada T_i, igual que
+    'var_paralelo', ya que es lo que usan los ajustes para corregir por el
+    largo finito de la historia. La cantidad efectiva de muestras
+    independientes se obtiene con `muestras_efectivas_solapadas`.
+
+    Ver el DocString de "metodo_alfa_feynman" para parametros y resultados.
+
+    """
+
+    Y_historias = []
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        for leido in leidos:
+            a, dt_base = leido
+            historias, max_int, datos_x_hist = \
+                calcula_alfa_feynman_input(a, numero_de_historias, dt_base,
+                                           dt_maximo)
+            max_int = indices_de_kwargs(max_int, kwargs)
+            Y_historias.append(
+                mapea_historias_compartidas(pool,
+                                            agrupamiento_historia_solapado,
+                                            historias,
+                                            (max_int, datos_x_hist),
+                                            len(lista_indices(max_int)),
+                                            punto_control=kwargs.get(
+                                                'punto_control')))
+
+    # Para la corrección por largo finito en el ajuste se necesita la
+    # cantidad de intervalos contiguos (T_i * Nk = duración de la historia),
+    # no N_eff (ver `muestras_efectivas_solapadas`)
+    M_points = datos_promedio_Ti_agrupamiento(datos_x_hist, max_int)
+    N_eff = muestras_efectivas_solapadas(datos_x_hist, max_int)
+
+    return Y_historias, dt_base, M_points, N_eff
+
+
+def muestras_efectivas_solapadas(datos_x_hist, max_int):
+    """
+    Cantidad efectiva de muestras independientes con intervalos solapados
+
+    Es N_eff de `factores_solapados` para cada T_i. No debe usarse como Nk en
+    los ajustes (ver `afey_varianza_paralelo_solapado`).
+    """
+    return [factores_solapados(datos_x_hist, i)[1]
+            for i in lista_indices(max_int)]
+
+
+def historias_como_matriz(datos, numero_de_historias, datos_x_hist):
+    """
+    Vista de 2D (numero_de_historias x datos_x_hist) de los datos
+
+    No se copian los datos, por lo que es equivalente a las historias que se
+    obtienen con `np.split` en `calcula_alfa_feynman_input`, pero con todas
+    ellas en un mismo array.
+    """
+    return datos[0:datos_x_hist*numero_de_historias].reshape(
+        numero_de_historias, datos_x_hist)
+
+
+def agrupamiento_historias_2d(historias, maximos, datos_x_hist):
+    """
+    Técnica de agrupamiento aplicada a todas las historias a la vez
+
+    Parametros
+    ----------
+        historias : numpy ndarray
+            Array de (numero_de_historias x datos_x_hist), ver
+            `historias_como_matriz`
+        maximos : entero o lista de enteros
+            Cantidad máxima de intervalos que se agrupan (o lista con los
+            valores de i, ver `genera_indices_agrupamiento`)
+        datos_x_hist : entero
+            Cantidad de datos de cada historia
+
+    Resultados
+    ----------
+        Y_k : numpy ndarray
+            Array de (numero_de_historias x len(T_i)) con el mismo contenido
+            que la lista de historias obtenida con `agrupamiento_historia`
+    """
+
+    acumulada = acumula_historia(historias)
+    indices = lista_indices(maximos)
+    Y_k = np.empty((historias.shape[0], len(indices)))
+    for k, i in enumerate(indices):
+        _intervalos = intervalos_agrupados(acumulada, i, datos_x_hist // i)
+        Y_k[:, k] = np.var(_intervalos, axis=1, ddof=1) / \
+            np.mean(_intervalos, axis=1) - 1
+    return Y_k
+
+
+def afey_varianza_vectorizado(leidos, numero_de_historias, dt_maximo,
+                              **kwargs):
+    """
+    Metodo de alfa-Feynman aplicado variance to mean, vectorizado.
+
+    Todas las historias de un detector se procesan a la vez como un array de
+    2D, sin repartirlas entre procesos. Para acotar la memoria utilizada por
+    la suma acumulada se puede procesar de a bloques de historias con
+    kwargs['historias_por_bloque'] (por defecto todas juntas).
+
+    Ver el DocString de "metodo_alfa_feynman" para parametros y resultados.
+
+    """
+
     Y_historias = []
     for leido in leidos:
         a, dt_base = leido
-        historias, max_int, datos_x_hist = \
+        _, max_int, datos_x_hist = \
             calcula_alfa_feynman_input(a, numero_de_historias, dt_base,
                                        dt_maximo)
-        # Se corre con todos los procesadores disponibles
-        num_proc = mp.cpu_count()
-        pool = mp.Pool(processes=num_proc)
-        print('Se utilizan {} procesos'.format(num_proc))
-        # Argumento de 'agrupamiento_historia' como tupla
-        arg_tupla = agrupa_argumentos(historias, max_int, datos_x_hist)
-        Y_historias.append(pool.map(agrupamiento_historia, arg_tupla))
+        max_int = indices_de_kwargs(max_int, kwargs)
+        historias = historias_como_matriz(a, numero_de_historias, datos_x_hist)
+        bloque = kwargs.get('historias_por_bloque', numero_de_historias)
+        _Y = [agrupamiento_historias_2d(historias[j:j + bloque], max_int,
+                                        datos_x_hist)
+              for j in range(0, numero_de_historias, bloque)]
+        Y_historias.append(np.concatenate(_Y))
 
     M_points = datos_promedio_Ti_agrupamiento(datos_x_hist, max_int)
 
@@ -203,33 +679,49 @@ def afey_varianza_paralelo_choice(leidos, numero_de_historias, dt_maximo,
     """
     Metodo de alfa-Feynman aplicado variance to mean, en paralelo.
 
+    Cada historia usa su propio generador de números aleatorios, derivado de
+    kwargs['semilla'] con `np.random.SeedSequence.spawn`. Con la misma
+    semilla el resultado es el mismo, sin importar la cantidad de procesos.
+
     Ver el DocString de "metodo_alfa_feynman" para parametros y resultados.
 
     """
     # Fracción de puntos que se van a tomar para el promedio
     frac = kwargs.get('fraction')
+    # Una secuencia de semillas independiente para cada elemento de leidos
+    semillas = np.random.SeedSequence(kwargs.get('semilla')).spawn(len(leidos))
+    punto_control = kwargs.get('punto_control')
+    if punto_control is not None and kwargs.get('semilla') is None:
+        # Sin semilla cada corrida usa otros números aleatorios: el punto de
+        # control nunca se podría retomar y sólo se acumularían archivos
+        print('*** Sin kwargs["semilla"] no se puede retomar un punto de '
+              'control con el método _choice. Se procesa sin punto de '
+              'control')
+        punto_control = None
 
     Y_historias = []
-    for leido in leidos:
-        a, dt_base = leido
-        historias, max_int, datos_x_hist = \
-            calcula_alfa_feynman_input(a, numero_de_historias, dt_base,
-                                       dt_maximo)
-        # Se corre con todos los procesadores disponibles
-        num_proc = mp.cpu_count()
-        pool = mp.Pool(processes=num_proc)
-        print('Se utilizan {} procesos'.format(num_proc))
-
-        # Construyo de ante-mano cuántos puntos se elijirán para cada
-        # agrupamiento, basado en la fracción especificada
-        M_points = []
-        for i in range(1, max_int + 1):
-            M_points.append(int((datos_x_hist // i) // (1. / frac )))
-
-        # Argumento de 'agrupamiento_historia_choice' como tupla
-        arg_tupla = agrupa_argumentos(historias, max_int, datos_x_hist,
-                                      M_points)
-        Y_historias.append(pool.map(agrupamiento_historia_choice, arg_tupla))
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        for leido, semilla in zip(leidos, semillas):
+            a, dt_base = leido
+            historias, max_int, datos_x_hist = \
+                calcula_alfa_feynman_input(a, numero_de_historias, dt_base,
+                                           dt_maximo)
+            max_int = indices_de_kwargs(max_int, kwargs)
+
+            # Construyo de ante-mano cuántos puntos se elijirán para cada
+            # agrupamiento, basado en la fracción especificada
+            M_points = []
+            for i in lista_indices(max_int):
+                M_points.append(int((datos_x_hist // i) // (1. / frac )))
+
+            # Argumentos de 'agrupamiento_historia_choice'
+            Y_historias.append(
+                mapea_historias_compartidas(
+                    pool, agrupamiento_historia_choice, historias,
+                    (max_int, datos_x_hist, M_points), len(M_points),
+                    [(_semilla,) for _semilla in
+                     semilla.spawn(len(historias))],
+                    punto_control=punto_control))
     return Y_historias, dt_base, M_points
 
 
@@ -241,16 +733,21 @@ def agrupamiento_historia_choice(arg_tupla):
     se toma una muestra aleatoria. Se toma una fracción `frac` de la cantidad
     total de intervalos para cada dt_i.
 
+    Sólo se eligen los índices de los intervalos (`Generator.choice` sin
+    reposición mezcla parcialmente, sin generar una permutación completa) y
+    se calculan únicamente los intervalos elegidos a partir de la suma
+    acumulada. `semilla` es la SeedSequence de la historia.
+
     """
 
-    historia, maximos, datos_x_hist, M_points = arg_tupla
+    historia, maximos, datos_x_hist, M_points, semilla = arg_tupla
+    rng = np.random.default_rng(semilla)
+    acumulada = acumula_historia(historia[0:datos_x_hist])
     Y_k = []
-    for i, M in zip(range(1, maximos+1), M_points):
-        _partes = datos_x_hist // i
-        _indice_exacto = _partes * i
-        _matriz = historia[0:_indice_exacto].reshape(_partes, i)
-        _intervalos = _matriz.sum(axis=1, dtype='uint32')
-        _intervalos = np.random.choice(_intervalos, M, replace=False)
+    for i, M in zip(lista_indices(maximos), M_points):
+        _elegidos = rng.choice(datos_x_hist // i, M, replace=False,
+                               shuffle=False)
+        _intervalos = acumulada[(_elegidos + 1) * i] - acumulada[_elegidos * i]
         Y_k.append(np.var(_intervalos, ddof=1) / np.mean(_intervalos) - 1)
     return Y_k
 
@@ -267,29 +764,29 @@ def afey_varianza_paralelo_skip(leidos, numero_de_historias, dt_maximo,
     corr_time = kwargs.get('corr_time')
 
     Y_historias = []
-    for leido in leidos:
-        a, dt_base = leido
-        historias, max_int, datos_x_hist = \
-            calcula_alfa_feynman_input(a, numero_de_historias, dt_base,
-                                       dt_maximo)
-        # Se corre con todos los procesadores disponibles
-        num_proc = mp.cpu_count()
-        pool = mp.Pool(processes=num_proc)
-        print('Se utilizan {} procesos'.format(num_proc))
-
-        # Construyo de ante-mano cuántos puntos se elijirán para cada
-        # agrupamiento, basado en la fracción especificada
-        skip_points = [] # Cantidad de intervalos que salteo
-        M_points = []    # Puntos promediados por cada T_i
-        for i in range(1, max_int + 1):
-            _skipped  = int(np.ceil(corr_time / dt_base / i))
-            skip_points.append(_skipped)
-            M_points.append(int((datos_x_hist // i) /( _skipped + 1)))
-
-        # Argumento de 'agrupamiento_historia_choice' como tupla
-        arg_tupla = agrupa_argumentos(historias, max_int, datos_x_hist,
-                                      skip_points)
-        Y_historias.append(pool.map(agrupamiento_historia_skip, arg_tupla))
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        for leido in leidos:
+            a, dt_base = leido
+            historias, max_int, datos_x_hist = \
+                calcula_alfa_feynman_input(a, numero_de_historias, dt_base,
+                                           dt_maximo)
+            max_int = indices_de_kwargs(max_int, kwargs)
+
+            # Construyo de ante-mano cuántos puntos se elijirán para cada
+            # agrupamiento, basado en la fracción especificada
+            skip_points = [] # Cantidad de intervalos que salteo
+            M_points = []    # Puntos promediados por cada T_i
+            for i in lista_indices(max_int):
+                _skipped  = int(np.ceil(corr_time / dt_base / i))
+                skip_points.append(_skipped)
+                M_points.append(int((datos_x_hist // i) /( _skipped + 1)))
+
+            # Argumentos de 'agrupamiento_historia_skip'
+            Y_historias.append(
+                mapea_historias_compartidas(
+                    pool, agrupamiento_historia_skip, historias,
+                    (max_int, datos_x_hist, skip_points), len(M_points),
+                    punto_control=kwargs.get('punto_control')))
     return Y_historias, dt_base, M_points
 
 
@@ -297,18 +794,24 @@ def agrupamiento_historia_skip(arg_tupla):
     """
     Técnica de agrupamiento modificada para una historia
 
-    Se saltean intervalos al calcular el promedio para cada T_i
+    Se saltean intervalos al calcular el promedio para cada T_i: para cada
+    i se toma un intervalo de cada (S + 1). Los intervalos de todos los T_i
+    se obtienen juntos de la suma acumulada (sus comienzos están separados
+    (S + 1) * i) y la estadística se hace con `Y_por_segmentos`.
     """
 
     historia, maximos, datos_x_hist, skipped = arg_tupla
-    Y_k = []
-    for i, S in zip(range(1, maximos+1), skipped):
-        _partes = datos_x_hist // i
-        _indice_exacto = _partes * i
-        _matriz = historia[0:_indice_exacto].reshape(_partes, i)
-        _intervalos = _matriz.sum(axis=1, dtype='uint32')
-        _intervalos = [_intervalos[k] for k in range(0, len(_intervalos), S + 1)]
-        Y_k.append(np.var(_intervalos, ddof=1) / np.mean(_intervalos) - 1)
+    acumulada = acumula_historia(historia[..., 0:datos_x_hist])
+    _comienzos = []
+    _anchos = []
+    for i, S in zip(lista_indices(maximos), skipped):
+        _comienzos.append(np.arange(0, datos_x_hist // i, S + 1) * i)
+        _anchos.append(np.full(len(_comienzos[-1]), i))
+    _largos = [len(_comienzo) for _comienzo in _comienzos]
+    _comienzos = np.concatenate(_comienzos)
+    _finales = _comienzos + np.concatenate(_anchos)
+    _intervalos = acumulada[..., _finales] - acumulada[..., _comienzos]
+    Y_k, _ = Y_por_segmentos(_intervalos, _largos)
     return Y_k
 
 
@@ -327,43 +830,61 @@ def afey_varianza_paralelo_mca(leidos, numero_de_historias, dt_maximo,
 
     Y_historias = []
     M_list = []
-    for leido in leidos:
-        a, dt_base = leido
-        historias, max_int, datos_x_hist = \
-            calcula_alfa_feynman_input(a, numero_de_historias, dt_base,
-                                       dt_maximo)
-        # Se corre con todos los procesadores disponibles
-        num_proc = mp.cpu_count()
-        pool = mp.Pool(processes=num_proc)
-        print('Se utilizan {} procesos'.format(num_proc))
-
-        if method_mca=='constant':
-            M = datos_x_hist * 2 * (1 + k) / (max_int + 1) / (max_int + k)
-            M = int(np.floor(M))
-            # Se asume cantidad constante de datos por T_i
-            M_points = [M for _ in range(1, max_int + 1, k+1)]
-        elif method_mca=='A_over_k':
-            # Se asume que la cantidad de puntos para cada T_i tiene la forma
-            # funcional A/k. Se calcula el valor de A para utilizar todos los
-            # intervalos temporales de cada historia
-            A = datos_x_hist * (1 + k) / (max_int + k)
-            M_points = [int(A/s) for s in range(1, max_int + 1, k+1)]
-            # No pueden haber intervalos con un sólo dato
-            if M_points[-1] == 1:
-                msg = "El tiempo de cada historia es pequeño para aplicar"
-                msg += " este método. Reducir la cantidad de historias"
-                msg += " o reducir el dt_max (apenas) \n"
-                msg += "Se sale."
-                print(msg)
-                quit()
-
-        # Argumento de 'agrupamiento_historia_mca' como tupla
-        arg_tupla = agrupa_argumentos(historias, max_int, datos_x_hist, k,
-                M_points)
-        Y_historias.append(pool.map(agrupamiento_historia_mca, arg_tupla))
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        for leido in leidos:
+            a, dt_base = leido
+            historias, max_int, datos_x_hist = \
+                calcula_alfa_feynman_input(a, numero_de_historias, dt_base,
+                                           dt_maximo)
+            max_int = indices_de_kwargs(max_int, kwargs)
+            # Con una grilla de T_i definida por el usuario no se saltean
+            # intervalos con k, se usan los T_i pedidos
+            indx = indices_mca(max_int, k)
+
+            if method_mca=='constant':
+                if np.ndim(max_int) == 0:
+                    M = datos_x_hist * 2 * (1 + k) / (max_int + 1) / \
+                        (max_int + k)
+                else:
+                    M = datos_x_hist / np.sum(indx)
+                M = int(np.floor(M))
+                # Se asume cantidad constante de datos por T_i
+                M_points = [M for _ in indx]
+            elif method_mca=='A_over_k':
+                # Se asume que la cantidad de puntos para cada T_i tiene la
+                # forma funcional A/k. Se calcula el valor de A para utilizar
+                # todos los intervalos temporales de cada historia
+                if np.ndim(max_int) == 0:
+                    A = datos_x_hist * (1 + k) / (max_int + k)
+                else:
+                    A = datos_x_hist / len(indx)
+                M_points = [int(A/s) for s in indx]
+                # No pueden haber intervalos con un sólo dato
+                if M_points[-1] == 1:
+                    msg = "El tiempo de cada historia es pequeño para aplicar"
+                    msg += " este método. Reducir la cantidad de historias"
+                    msg += " o reducir el dt_max (apenas) \n"
+                    msg += "Se sale."
+                    print(msg)
+                    quit()
+
+            # Argumentos de 'agrupamiento_historia_mca'
+            Y_historias.append(
+                mapea_historias_compartidas(
+                    pool, agrupamiento_historia_mca, historias,
+                    (max_int, datos_x_hist, k, M_points), len(M_points),
+                    punto_control=kwargs.get('punto_control')))
     return Y_historias, dt_base, M_points
 
 
+def indices_mca(maximos, k):
+    """ Valores de i utilizados en el método mca (ver `lista_indices`) """
+
+    if np.ndim(maximos) == 0:
+        return [i for i in range(1, maximos + 1, k+1)]
+    return list(maximos)
+
+
 def agrupamiento_historia_mca(arg_tupla):
     """
     Método para calcular una historia sin reutilizar intervalos base, con el
@@ -372,24 +893,27 @@ def agrupamiento_historia_mca(arg_tupla):
 
     Para mejorar la estdística sólo se analizan de a k intervalos dt_i
 
+    Los M intervalos de cada T_i ocupan un bloque de la historia, a
+    continuación del bloque del T_i anterior.
+
     """
 
     historia, maximos, datos_x_hist, k, M_points = arg_tupla
 
-    indx = [i for i in range(1, maximos + 1, k+1)]
-    start = 0
-    Y_k = []
-    for i, M in zip(indx, M_points):
-        _matriz = historia[start:start + M*i].reshape(M, i)
-        _intervalos = _matriz.sum(axis=1, dtype='uint32')
-        start += i*M
-        # Si quedan pocos puntos para promediar, puede que se obtenga  un valor
-        # medio nulo (generalmente sólo para el primer dt)
-        if np.mean(_intervalos)!=0:
-            Y_k.append(np.var(_intervalos, ddof=1) / np.mean(_intervalos) - 1)
-        else:
-            print('Se fijó un punto con Y(tau) = 0')
-            Y_k.append(0.0)
+    indx = indices_mca(maximos, k)
+    acumulada = acumula_historia(historia[..., 0:datos_x_hist])
+    # Los bloques de cada T_i son consecutivos: el borde final de uno es el
+    # inicial del siguiente, por lo que todos los intervalos se obtienen con
+    # una única diferencia de la suma acumulada
+    _bordes = np.concatenate([[0]] + [np.full(M, i) for i, M in
+                                      zip(indx, M_points)])
+    _intervalos = np.diff(acumulada[..., np.cumsum(_bordes)], axis=-1)
+    Y_k, media = Y_por_segmentos(_intervalos, M_points)
+    # Si quedan pocos puntos para promediar, puede que se obtenga  un valor
+    # medio nulo (generalmente sólo para el primer dt)
+    if np.any(media == 0):
+        print('Se fijó un punto con Y(tau) = 0')
+        Y_k[media == 0] = 0.0
     return Y_k
 
 
@@ -424,25 +948,122 @@ def afey_covarianza_paralelo(leidos, numero_de_historias, dt_maximo, **kwargs):
     hist2, max_int, datos_x_hist = \
         calcula_alfa_feynman_input(datos[1], numero_de_historias, dt_base,
                                    dt_maximo)
-    historias = zip(hist1, hist2)
-
-    arg_tupla = agrupa_argumentos(historias, max_int, datos_x_hist)
-    # Se corre con todos los procesadores disponibles
-    num_proc = mp.cpu_count()
-    pool = mp.Pool(processes=num_proc)
-    print('Se utilizan {} procesos'.format(num_proc))
-    _Y_det = pool.map(agrupamiento_historia_cov, arg_tupla)
+    historias = list(zip(hist1, hist2))
+    max_int = indices_de_kwargs(max_int, kwargs)
+    _n_T = len(lista_indices(max_int))
+
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        _Y_det = mapea_historias_compartidas(pool, agrupamiento_historia_cov,
+                                             historias,
+                                             (max_int, datos_x_hist),
+                                             3 * _n_T,
+                                             punto_control=kwargs.get(
+                                                 'punto_control'))
+    _Y_det = _Y_det.reshape(numero_de_historias, 3, _n_T)
     # Ordeno salida para obtener una lista de Y similar a los otros casos
     # [Y_var1, Y_var2, Y_cov12]
     Y_historias = []
     for i in range(3):
-        Y_historias.append(np.array(_Y_det)[:, i, :])
+        Y_historias.append(_Y_det[:, i, :])
 
     M_points = datos_promedio_Ti_agrupamiento(datos_x_hist, max_int)
 
     return Y_historias, dt_base, M_points
 
 
+def agrupamiento_historia_matriz(arg_tupla):
+    """
+    Técnica de agrupamiento para N detectores y su suma en una sola pasada
+
+    Se apilan las historias de todos los detectores junto con su suma y se
+    calcula la matriz de covarianza de los intervalos agrupados para cada T_i.
+    La normalización es la misma que en `agrupamiento_historia_cov`:
+        Y_jk = cov_jk / sqrt(mean_j * mean_k) - delta_jk
+    por lo que en la diagonal queda Y(var) de cada detector (y de la suma) y
+    fuera de ella Y(cov) entre pares.
+
+    Resultados
+    ----------
+        Y_k : numpy ndarray
+            Array de (T_i x (N+1) x (N+1)). El último índice es la suma.
+    """
+
+    historia, maximos, datos_x_hist = arg_tupla
+    _apiladas = np.vstack([_hist[0:datos_x_hist] for _hist in historia])
+    _apiladas = np.vstack((_apiladas,
+                           np.sum(_apiladas, axis=0, dtype='uint64')))
+    acumulada = acumula_historia(_apiladas)
+    indices = lista_indices(maximos)
+    _n = _apiladas.shape[0]
+    Y_k = np.empty((len(indices), _n, _n))
+    for k, i in enumerate(indices):
+        _intervalos = intervalos_agrupados(acumulada, i, datos_x_hist // i)
+        _cov = np.cov(_intervalos.astype(float))
+        _media = np.mean(_intervalos, axis=1)
+        Y_k[k] = _cov / np.sqrt(np.outer(_media, _media)) - np.eye(_n)
+    return Y_k
+
+
+def afey_covarianza_matriz(leidos, numero_de_historias, dt_maximo, **kwargs):
+    """
+    Metodo de alfa-Feynman con la matriz de covarianza de N detectores.
+
+    Se usan todos los elementos de leidos, y se agrega la suma de todos ellos.
+    Ver `agrupamiento_historia_matriz`.
+
+    Ver el DocString de "metodo_alfa_feynman" para parametros y resultados.
+
+    """
+
+    dt_base = leidos[0][1]
+    _hist_det = []
+    for leido in leidos:
+        _hist, max_int, datos_x_hist = \
+            calcula_alfa_feynman_input(leido[0], numero_de_historias,
+                                       dt_base, dt_maximo)
+        _hist_det.append(_hist)
+    historias = list(zip(*_hist_det))
+    max_int = indices_de_kwargs(max_int, kwargs)
+    _n_T = len(lista_indices(max_int))
+    _n = len(leidos) + 1
+
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        _Y = mapea_historias_compartidas(pool, agrupamiento_historia_matriz,
+                                         historias, (max_int, datos_x_hist),
+                                         _n_T * _n * _n,
+                                         punto_control=kwargs.get(
+                                             'punto_control'))
+    # Un único elemento de (numero_de_historias x T_i x (N+1) x (N+1))
+    Y_historias = [_Y.reshape(numero_de_historias, _n_T, _n, _n)]
+
+    M_points = datos_promedio_Ti_agrupamiento(datos_x_hist, max_int)
+
+    return Y_historias, dt_base, M_points
+
+
+def escribe_archivo_matriz(Y_historias, dt_base, tau, num_hist, tasas,
+                           M_points, nombres, nombre_archivo):
+    """
+    Escribe el resultado de 'cov_matrix' en un único archivo .npz
+
+    Contiene las historias completas, el promedio y desvío del promedio para
+    cada T_i, los T_i, la cantidad de intervalos promediados, las tasas de
+    cuentas y los nombres de los detectores (el último es la suma).
+    """
+
+    promedio = np.mean(Y_historias, axis=0)
+    desvio = np.std(Y_historias, axis=0, ddof=1) / np.sqrt(num_hist)
+    _detectores = [nombre.split('/')[-1].rsplit('.')[-2] for nombre in nombres]
+    _detectores.append(''.join(_detectores))
+    now = datetime.datetime.now()
+    np.savez(nombre_archivo, Y_historias=Y_historias, Y_promedio=promedio,
+             Y_desvio=desvio, tau=tau, M_points=M_points,
+             tasas=np.asarray(tasas), detectores=np.asarray(_detectores),
+             dt_base=dt_base, numero_de_historias=num_hist,
+             fecha=now.strftime("%d-%m-%Y %H:%M"))
+    return nombre_archivo
+
+
 def afey_suma_paralelo(leidos, numero_de_historias, dt_maximo, **kwargs):
     """
     Metodo de alfa-Feynman aplicado a la suma de detectores, en paralelo.
@@ -464,13 +1085,17 @@ def afey_suma_paralelo(leidos, numero_de_historias, dt_maximo, **kwargs):
     historias = np.array(historias)
     # Se suman las historias de los detectores
     historias_sumadas = np.sum(historias, axis=0)
-    num_proc = mp.cpu_count()
-    pool = mp.Pool(processes=num_proc)
-    print('Se utilizan {} procesos'.format(num_proc))
-    arg_tupla = agrupa_argumentos(historias_sumadas, max_int, datos_x_hist)
+    max_int = indices_de_kwargs(max_int, kwargs)
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        _Y = mapea_historias_compartidas(pool, agrupamiento_historia,
+                                         list(historias_sumadas),
+                                         (max_int, datos_x_hist),
+                                         len(lista_indices(max_int)),
+                                         punto_control=kwargs.get(
+                                             'punto_control'))
     # Lo pongo comom lista de un elemento para homogenizar el formato
     M_points = datos_promedio_Ti_agrupamiento(datos_x_hist, max_int)
-    return [pool.map(agrupamiento_historia, arg_tupla)], dt_base, M_points
+    return [_Y], dt_base, M_points
 
 
 def promedia_historias(Y_historias):
@@ -500,6 +1125,63 @@ def promedia_historias(Y_historias):
     return mean_Y_historias, std_mean_Y_historias
 
 
+def covarianza_Y(Y_historias, historias_por_bloque=256):
+    """
+    Matriz de covarianza (T_i x T_i) del promedio de Y sobre las historias
+
+    Se recorren las historias de a bloques y la suma de productos de las
+    desviaciones se combina con la de los bloques anteriores (Chan et al.),
+    por lo que la memoria utilizada es (T_i x T_i) más un bloque de
+    historias, sin importar la cantidad de historias. La diagonal es el
+    cuadrado del desvío de `promedia_historias`.
+
+    Parametros
+    ----------
+        Y_historias : numpy array (historias x T_i)
+            Y(T_i) de cada historia de una serie
+        historias_por_bloque : entero
+            Cantidad de historias que se procesan juntas
+
+    Resultados
+    ----------
+        cov_Y : numpy array (T_i x T_i)
+            Covarianza del valor medio de Y(T_i)
+
+    >>> Y = np.array([[1., 2.], [3., 5.], [2., 2.]])
+    >>> np.allclose(covarianza_Y(Y, 2), np.cov(Y, rowvar=False) / 3)
+    True
+    """
+
+    n = 0
+    media = np.zeros(np.shape(Y_historias)[1])
+    C = np.zeros((len(media), len(media)))
+    for inicio in range(0, len(Y_historias), historias_por_bloque):
+        bloque = np.asarray(Y_historias[inicio:inicio + historias_por_bloque],
+                            dtype=float)
+        n_b = len(bloque)
+        media_b = np.mean(bloque, axis=0)
+        _desvios = bloque - media_b
+        delta = media_b - media
+        C += _desvios.T @ _desvios + np.outer(delta, delta) * n * n_b / (n + n_b)
+        media += delta * n_b / (n + n_b)
+        n += n_b
+    return C / (n - 1) / n
+
+
+def escribe_covarianza_Y(Y_historias, nombres_archivos):
+    """
+    Graba la covarianza del promedio de cada serie (ver `covarianza_Y`)
+
+    Se graba un archivo .covY.npy por cada archivo .fey, con el mismo nombre.
+    Se lee con `lee_covarianza_Y`.
+    """
+
+    for Y, nombre in zip(Y_historias, nombres_archivos):
+        _nombre = os.path.splitext(nombre)[0] + '.covY.npy'
+        np.save(_nombre, covarianza_Y(Y))
+        print('Se grabó la covarianza de Y en: ' + _nombre)
+
+
 def ordena_tasas_encabezado(tasas, calculo):
     """
     Ordena las tasas de cuenta para ser escritas en el encabezado
@@ -533,6 +1215,9 @@ def ordena_tasas_encabezado(tasas, calculo):
         _tasas = tasas[0:2]
         _juntas = [item for sublist in _tasas for item in sublist]
         tasas_ordenadas = _tasas + [_juntas]
+    elif 'momentos' in calculo:
+        # Los archivos de Y y luego los de Y2 [D1 D2 ... D1 D2 ...]
+        tasas_ordenadas = tasas + tasas
     else:
         # Tantos elementos como detectores [D1 D2 ....]
         tasas_ordenadas = tasas
@@ -540,7 +1225,7 @@ def ordena_tasas_encabezado(tasas, calculo):
 
 
 def escribe_archivos_promedios(mean_Y, std_mean_Y, dt_base, calculo, num_hist,
-                               tasas, nombres_archivos):
+                               tasas, nombres_archivos, tau=None):
     """
     Escribe los archivos que contienen el promedio y desvio de las historias
     """
@@ -551,7 +1236,7 @@ def escribe_archivos_promedios(mean_Y, std_mean_Y, dt_base, calculo, num_hist,
     # Para diferencia
     for j, nombre in enumerate(nombres_archivos):
         header = genera_encabezados(dt_base, calculo,
-                                    num_hist, tasas_ordenadas[j])
+                                    num_hist, tasas_ordenadas[j], tau)
         with open(nombre, 'w') as f:
             for line in header:
                 f.write(line + '\n')
@@ -564,7 +1249,7 @@ def escribe_archivos_promedios(mean_Y, std_mean_Y, dt_base, calculo, num_hist,
 
 
 def escribe_archivos_completos(Y_historias, dt_base, calculo, num_hist, tasas,
-                               nombres_archivos):
+                               nombres_archivos, tau=None):
     """
     Escribe los archivos que contienen a todas las historias
     """
@@ -572,7 +1257,7 @@ def escribe_archivos_completos(Y_historias, dt_base, calculo, num_hist, tasas,
     tasas_ordenadas = ordena_tasas_encabezado(tasas, calculo)
     for j, nombre in enumerate(nombres_archivos):
         header = genera_encabezados(dt_base, calculo,
-                                    num_hist, tasas_ordenadas[j])
+                                    num_hist, tasas_ordenadas[j], tau)
         # Cambio la extensión para diferenciarlo del promedio
         nombre = nombre.rsplit('.', 1)[0] + '.dat'
         # nombre = nombre+'.gz'
@@ -585,10 +1270,12 @@ def escribe_archivos_completos(Y_historias, dt_base, calculo, num_hist, tasas,
         # np.savetxt(_nombre, np.array(Y_historia).T)
 
 
-def escribe_archivos_Mpoints(nombres, Mpoints):
+def escribe_archivos_Mpoints(nombres, Mpoints, tau=None):
     """
     Escribe los archivos con la cantida de daatos utilizados para el promedio
     del Ti en cada historia
+
+    Si se especifica `tau` (T_i no equiespaciados) se agrega al encabezado.
     """
 
     for nombre in nombres:
@@ -598,11 +1285,131 @@ def escribe_archivos_Mpoints(nombres, Mpoints):
         header = 'Cantidad de datos utilizados para hacer estadistica ' + \
                  'con cada intervalo Ti. Se usa para corregir la ' + \
                  'funcion teorica durante el ajuste'
+        if tau is not None:
+            header += '\nIntervalos temporales T_i [s]: ' + \
+                      ' '.join(str(_t) for _t in tau)
         np.savetxt(nombre, Mpoints, fmt='%.i', header=header)
 
 
-def genera_encabezados(dt_base, calculo, num_hist, tasas):
-    """ Genera el enabezado + info con el intervalo dt + cantidad de hist."""
+def escribe_archivos_Neff(nombres, N_eff, tau=None):
+    """
+    Escribe los archivos con la cantidad efectiva de muestras independientes
+    de cada T_i ('var_paralelo_solapado', ver `muestras_efectivas_solapadas`)
+
+    Tienen el mismo formato que los archivos .Nk (ver
+    `escribe_archivos_Mpoints`).
+    """
+
+    for nombre in nombres:
+        nombre = nombre.rsplit('.', 1)[0] + '.Neff'
+
+        header = 'Cantidad efectiva de muestras independientes con ' + \
+                 'intervalos solapados para cada intervalo Ti. No se ' + \
+                 'usa en el ajuste (para eso esta el archivo .Nk)'
+        if tau is not None:
+            header += '\nIntervalos temporales T_i [s]: ' + \
+                      ' '.join(str(_t) for _t in tau)
+        np.savetxt(nombre, N_eff, fmt='%.6f', header=header)
+
+
+def escribe_archivos_hdf5(Y_historias, dt_base, calculo, num_hist, tasas,
+                          nombres_archivos, M_points, tau=None, N_eff=None):
+    """
+    Escribe todos los resultados de cada archivo en un único archivo .h5
+
+    Reemplaza a los archivos .dat, .fey y .Nk. Las historias se guardan
+    comprimidas (gzip) en bloques que contienen todos los T_i de un grupo de
+    historias, para poder leer sólo algunas historias sin descomprimir todo
+    el archivo (ver `lee_historias_hdf5`). También se guardan el promedio, el
+    desvío, los T_i, la cantidad de intervalos promediados, las tasas de
+    cuentas y, como atributos, dt, el cálculo y el encabezado de texto.
+
+    Parametros
+    ----------
+        M_points : lista
+            Cantidad de intervalos promediados para cada T_i. Si es una lista
+            de listas se usa un elemento para cada archivo.
+        N_eff : lista o None
+            Cantidad efectiva de muestras de cada T_i ('var_paralelo_solapado')
+            Se guarda como 'N_eff' (reemplaza al archivo .Neff).
+        Resto : igual que `escribe_archivos_completos`
+    """
+
+    h5py = importa_h5py()
+    tasas_ordenadas = ordena_tasas_encabezado(tasas, calculo)
+    promedio, desvio = promedia_historias(Y_historias)
+    for j, nombre in enumerate(nombres_archivos):
+        header = genera_encabezados(dt_base, calculo,
+                                    num_hist, tasas_ordenadas[j], tau)
+        nombre = nombre.rsplit('.', 1)[0] + '.h5'
+        # Igual que en el archivo .dat, cada columna es una historia
+        _Y = np.asarray(Y_historias[j], dtype=float).T
+        _n_T = _Y.shape[0]
+        if tau is None:
+            _tau = dt_base * np.arange(1, _n_T + 1)
+        else:
+            _tau = np.asarray(tau, dtype=float)
+        _M = M_points[j] if np.ndim(M_points) == 2 else M_points
+        # Bloques de ~1 MB
+        _por_bloque = int(max(1, min(_Y.shape[1], 2**17 // max(_n_T, 1))))
+        with h5py.File(nombre, 'w') as f:
+            f.create_dataset('Y_historias', data=_Y,
+                             chunks=(_n_T, _por_bloque), compression='gzip',
+                             compression_opts=4, shuffle=True)
+            f.create_dataset('Y_promedio', data=promedio[j])
+            f.create_dataset('Y_desvio', data=desvio[j])
+            f.create_dataset('tau', data=_tau)
+            f.create_dataset('M_points', data=np.asarray(_M))
+            if N_eff is not None:
+                f.create_dataset('N_eff', data=np.asarray(N_eff, dtype=float))
+            f.create_dataset('tasas',
+                             data=np.asarray(tasas_ordenadas[j], dtype=float))
+            f.attrs['dt'] = dt_base
+            f.attrs['calculo'] = calculo
+            f.attrs['numero_de_historias'] = num_hist
+            f.attrs['encabezado'] = '\n'.join(header)
+    return nombres_archivos
+
+
+def exporta_hdf5_a_texto(nombre):
+    """
+    Escribe los archivos de texto (.dat, .fey, .Nk y .Neff si corresponde)
+    a partir de un .h5
+
+    Los archivos se escriben en la misma carpeta y con el mismo nombre que el
+    archivo .h5, con el encabezado original.
+    """
+
+    h5py = importa_h5py()
+    base = nombre.rsplit('.', 1)[0]
+    with h5py.File(nombre, 'r') as f:
+        encabezado = f.attrs['encabezado']
+        Y_historias = f['Y_historias'][:]
+        ordenado = np.vstack([f['Y_promedio'][:], f['Y_desvio'][:]])
+        M_points = f['M_points'][:]
+        N_eff = f['N_eff'][:] if 'N_eff' in f else None
+        tau = f['tau'][:]
+    for extension, datos in [('.dat', Y_historias), ('.fey', ordenado.T)]:
+        with open(base + extension, 'w') as f:
+            f.write(encabezado + '\n')
+        with open(base + extension, 'ab') as f:
+            np.savetxt(f, datos)
+    # Los T_i se escriben sólo si estaban en el encabezado
+    if '# Intervalos temporales T_i' not in encabezado:
+        tau = None
+    escribe_archivos_Mpoints([base + '.h5'], M_points, tau)
+    if N_eff is not None:
+        escribe_archivos_Neff([base + '.h5'], N_eff, tau)
+    return base
+
+
+def genera_encabezados(dt_base, calculo, num_hist, tasas, tau=None):
+    """
+    Genera el enabezado + info con el intervalo dt + cantidad de hist.
+
+    Si se especifica `tau` (T_i no equiespaciados) se agregan dos líneas con
+    los T_i utilizados antes de los datos.
+    """
 
     header_str = []
     line_1 = '# Historias completas obtenidas con el método de alfa-Feynman'
@@ -612,14 +1419,26 @@ def genera_encabezados(dt_base, calculo, num_hist, tasas):
     diccionario_calculo = {
             'var_serie': '# Cáclulo de (var/mean - 1) en serie',
             'var_paralelo': '# Cálculo de (var_i/mean_i - 1) en paralelo',
+            'var_vectorizado': '# Cálculo de (var_i/mean_i - 1) vectorizado ' +
+                                              'sobre todas las historias',
             'var_paralelo_choice': '# Cálculo de (var_i/mean_i - 1) en ' +
                                               'paralelo usando metodo choice',
             'var_paralelo_mca': '# Cálculo de (var_i/mean_i - 1) en ' +
                                               'paralelo usando metodo mca',
             'var_paralelo_skip': '# Cálculo de (var_i/mean_i -1 en ' +
                                               'paralelo usando método skip',
+            'var_paralelo_solapado': '# Cálculo de (var_i/mean_i - 1) en ' +
+                                     'paralelo con intervalos solapados',
+            'var_momentos': '# Cálculo de Y = (var/mean - 1) y Y2 = ' +
+                            '(k3 - 3*k2 + 2*mean)/mean en paralelo',
+            'var_timestamp': '# Cálculo de (var_i/mean_i - 1) a partir de ' +
+                             'los datos de timestamping',
             'cov_paralelo': '# Cálculo de [cov_12/sqrt(mean_1*mean_2)] en paralelo',
             'sum_paralelo': '# Cálculo de (var/mean - 1) sumando detectores en paralelo',
+            'var_bloques': '# Cálculo de (var_i/mean_i - 1) leyendo ' +
+                                              'los datos por bloques',
+            'sum_bloques': '# Cálculo de (var/mean - 1) sumando detectores ' +
+                                              'leyendo los datos por bloques',
                       }
     header_str.append(diccionario_calculo.get(calculo))
     header_str.append('#')
@@ -636,6 +1455,9 @@ def genera_encabezados(dt_base, calculo, num_hist, tasas):
     header_str.append('# Tasa de cuentas [cps]:')
     header_str.append('# [promedio desvio_promedio ...]')
     header_str.append('{}'.format(tasas))
+    if tau is not None:
+        header_str.append('# Intervalos temporales T_i [s]:')
+        header_str.append(' '.join(str(_t) for _t in tau))
     header_str.append('# Cada columna es una historia')
     header_str.append('#')
 
@@ -687,9 +1509,24 @@ def genera_nombre_archivos(nombres_in, lenYdt, calculo, carpeta):
             elif id_method == 'skip':
                 _final.append(nombres_archivos[j] + '.' + id_det[j]
                               + '_var_skip.fey')
+            elif id_method == 'solapado':
+                _final.append(nombres_archivos[j] + '.' + id_det[j]
+                              + '_var_solapado.fey')
+            elif id_method == 'momentos':
+                # Primero los archivos de Y y luego los de Y2
+                _k = j % len(id_det)
+                _momento = '_var' if j < len(id_det) else '_Y2'
+                _final.append(nombres_archivos[_k] + '.' + id_det[_k]
+                              + _momento + '_momentos.fey')
+            elif id_method == 'timestamp':
+                _final.append(nombres_archivos[j] + '.' + id_det[j]
+                              + '_var_timestamp.fey')
             else:
                 _final.append(nombres_archivos[j] + '.' + id_det[j]
                               + '_var.fey')
+        elif id_calculo == 'cov' and id_method == 'matrix':
+            _final.append(nombres_archivos[0] + '.' + ''.join(id_det)
+                          + '_cov_matrix.npz')
         elif id_calculo == 'cov':
             if j != 2:
                 _final.append(nombres_archivos[j] + '.' + id_det[j]
@@ -705,6 +1542,158 @@ def genera_nombre_archivos(nombres_in, lenYdt, calculo, carpeta):
     return _final
 
 
+def selecciona_calculo_afey(calculo, kwargs):
+    """
+    Función de `metodo_alfa_feynman` que corresponde a "calculo"
+
+    Verifica también que estén en kwargs los parámetros que necesita cada
+    cálculo. Si algo falta se sale del programa.
+    """
+
+    diccionario_afey = {
+            'var_serie': afey_varianza_serie,
+            'var_paralelo': afey_varianza_paralelo,
+            'var_vectorizado': afey_varianza_vectorizado,
+            'var_paralelo_choice': afey_varianza_paralelo_choice,
+            'var_paralelo_mca': afey_varianza_paralelo_mca,
+            'var_paralelo_skip': afey_varianza_paralelo_skip,
+            'var_paralelo_solapado': afey_varianza_paralelo_solapado,
+            'var_momentos': afey_momentos_paralelo,
+            'cov_paralelo': afey_covarianza_paralelo,
+            'cov_matrix': afey_covarianza_matriz,
+            'sum_paralelo': afey_suma_paralelo,
+                      }
+    fun_seleccionada = diccionario_afey.get(calculo)
+    if fun_seleccionada is None:
+        print('El calculo "{}" solicitado no está implementado'.format(calculo))
+        print('Se sale del programa')
+        quit()
+    if calculo == 'var_paralelo_choice':
+        if kwargs.get('fraction') is None:
+            _msg = "Para calcular con el método {} es necesario "
+            _msg += "incluir el argumento 'fraction' como diccionario \n"
+            _msg += "Se sale del programa"
+            print(_msg.format(calculo))
+            quit()
+    elif calculo == 'var_paralelo_mca':
+        if kwargs.get('skip_mca') is None:
+            _msg = "Para calcular con el método {} es necesario "
+            _msg += "incluir el argumento 'skip' como diccionario \n"
+            _msg += "Se sale del programa"
+            print(_msg.format(calculo))
+            quit()
+        if kwargs.get('method_mca') is None:
+            _msg = "Para calcular con el método {} es necesario "
+            _msg += "incluir el argumento 'method_mca' como diccionario \n"
+            _msg += "Los  valores posibles son 'constant' ó 'A_over_k' \n"
+            _msg += "Se sale del programa"
+            print(_msg.format(calculo))
+            quit()
+
+    elif calculo == 'var_paralelo_skip':
+        if kwargs.get('corr_time') is None:
+            _msg = "Para calcular con el método {} es necesario "
+            _msg += "incluir el argumento 'corr_time' como diccionario \n"
+            _msg += "Se sale del programa"
+            print(_msg.format(calculo))
+            quit()
+    return fun_seleccionada
+
+
+def tasa_de_cuentas(leidos):
+    """
+    Calcula la tasa de cuentas promedio de cada medición
+
+    Servirá para hacer correcciones en los parámetros estimados (por ejemplo
+    en el tiempo muerto). Se graba en el encabezado de los archivos.
+    """
+
+    _tasas = []
+    for leido in leidos:
+        # Tasa promedio
+        _prom = np.mean(leido[0]) / leido[1]
+        # Desvío del promedio
+        _desvio = np.std(leido[0], ddof=1) / leido[1] \
+            / np.sqrt(len(leido[0]))
+        _tasas.append([_prom, _desvio])
+    return _tasas
+
+
+def escribe_resultados_afey(Y_historias, dt_base, M_points, maximos, calculo,
+                            numero_de_historias, tasas, nombres, carpeta,
+                            formato='texto', covarianza=False, N_eff=None):
+    """
+    Escribe los archivos con los resultados de `metodo_alfa_feynman`
+
+    Parametros
+    ----------
+        Y_historias, dt_base, M_points :
+            Resultados de la función de cada cálculo
+        maximos : entero o lista de enteros
+            Valores de i utilizados (ver `genera_indices_agrupamiento`)
+        calculo : string
+        numero_de_historias : entero
+        tasas : lista
+            Tasa de cuentas de cada medición (ver `tasa_de_cuentas`)
+        nombres : lista de strings
+            Archivos leidos
+        carpeta : string
+            Carpeta donde se graban los resultados
+        formato : string ('texto', 'hdf5', 'ambos')
+            'texto' : archivos .dat, .fey y .Nk
+            'hdf5' : un archivo .h5 (ver `escribe_archivos_hdf5`)
+        covarianza : bool
+            Graba también la covarianza entre los T_i del promedio de Y (ver
+            `escribe_covarianza_Y`)
+        N_eff : lista o None
+            Cantidad efectiva de muestras de cada T_i, que devuelve
+            'var_paralelo_solapado'. Se graba en el archivo .Neff.
+    """
+
+    # Intervalos T_i utilizados (sólo si no son todos los múltiplos de
+    # dt_base, para mantener el formato de los archivos)
+    if np.ndim(maximos) == 0:
+        tau = None
+    else:
+        tau = dt_base * np.asarray(lista_indices(maximos))
+
+    if not os.path.exists(carpeta): os.makedirs(carpeta)
+    # Se generan los nombres de los archivos para guardar los datos
+    nom_archivos = genera_nombre_archivos(nombres, len(Y_historias),
+                                          calculo, carpeta)
+
+    if calculo == 'cov_matrix':
+        # Todos los resultados van a un único archivo
+        _tau = dt_base * np.asarray(lista_indices(maximos))
+        escribe_archivo_matriz(Y_historias[0], dt_base, _tau,
+                               numero_de_historias, tasas, M_points,
+                               nombres, nom_archivos[0])
+        return
+
+    if covarianza:
+        escribe_covarianza_Y(Y_historias, nom_archivos)
+
+    if formato in ['hdf5', 'ambos']:
+        escribe_archivos_hdf5(Y_historias, dt_base, calculo,
+                              numero_de_historias, tasas, nom_archivos,
+                              M_points, tau, N_eff)
+        if formato == 'hdf5':
+            return
+
+    # Escribe todas las historias
+    escribe_archivos_completos(Y_historias, dt_base, calculo,
+                               numero_de_historias, tasas, nom_archivos, tau)
+    # Calcula estadistica sobre historias
+    promedio, desvio = promedia_historias(Y_historias)
+    # Escribe promedios y desvios
+    escribe_archivos_promedios(promedio, desvio, dt_base, calculo,
+                               numero_de_historias, tasas, nom_archivos, tau)
+    # Escribe la cantidad de puntos utilizados para el promedio de cada Ti
+    escribe_archivos_Mpoints(nom_archivos, M_points, tau)
+    if N_eff is not None:
+        escribe_archivos_Neff(nom_archivos, N_eff, tau)
+
+
 def metodo_alfa_feynman(leidos, numero_de_historias, dt_maximo, calculo,
                         nombres, **kwargs):
     """
@@ -739,6 +1728,9 @@ def metodo_alfa_feynman(leidos, numero_de_historias, dt_maximo, calculo,
             A cada elemento de leidos.
         'var_paralelo' : Método variance to mean paralelo
             A cada elemento de leídos
+        'var_vectorizado' : Método variance to mean sobre todas las historias
+            a la vez (array de 2D), sin multiprocessing. Opcionalmente se
+            puede pasar 'historias_por_bloque' en kwargs.
         'var_paralelo_mca' : similar a 'var_paralelo' pero sin reutilizar datos
             Ti para sintetizar nuevos intervalos. Reduce la correlación. Es
             necesario pasarle el dato 'skip' para dict en kwargs.
@@ -746,8 +1738,21 @@ def metodo_alfa_feynman(leidos, numero_de_historias, dt_maximo, calculo,
             cantidad aleatoria de intervalos Ti para calcular el promedio.
             Reduce la correlación. Es necesario pasarle el dato 'fraction' como
             dict en kwargs.
+        'var_paralelo_solapado' : similar a 'var_paralelo' pero usando todas
+            las ventanas deslizantes de ancho T_i (intervalos solapados). La
+            varianza se corrige por la correlación entre ventanas (ver
+            `factores_solapados`). El archivo .Nk tiene, como siempre, la
+            cantidad de intervalos contiguos, y el archivo .Neff (o 'N_eff'
+            en el .h5) la cantidad efectiva de muestras independientes.
+        'var_momentos' : similar a 'var_paralelo' pero en la misma pasada
+            se calcula también el momento de segundo orden Y2 (ver
+            `momentos_intervalos`). Se graban archivos '_var_momentos' con Y
+            y '_Y2_momentos' con Y2 para cada elemento de leidos.
         'cov_paralelo' : Método de la covarianza en paralelo
             Sólo toma los dos primeros elementos de leidos
+        'cov_matrix' : Matriz de covarianza de todos los elementos de leidos
+            y de su suma, en una sola pasada por historia. El resultado se
+            graba en un único archivo .npz (ver `escribe_archivo_matriz`)
         'sum_paralelo' : Suma los datos de todos los detectores
             Sumo todos los datos de leidos
 
@@ -772,9 +1777,43 @@ def metodo_alfa_feynman(leidos, numero_de_historias, dt_maximo, calculo,
             para cada Ti al utilizar el método _choice.
             Cuanto más chico menor correlación en los datos a expensas de
             empeorar la estadística.
+        kwargs['semilla'] : entero
+            Semilla para el método _choice. Con la misma semilla se obtiene
+            el mismo resultado, sin importar la cantidad de procesos. Es
+            necesaria para usar kwargs['punto_control'] con _choice.
         kwargs['corr_time'] : float
+        kwargs['historias_por_bloque'] : int
+            Cantidad de historias que se procesan juntas con 'var_vectorizado'
         kwargs['carpeta_resultados'] : str ("resultados_afey" default)
             Nombre de la carpeta donde se guardarán los resultados
+        kwargs['intervalos'] : lista de enteros
+            Valores de i (T_i = i * dt_base) que se quieren calcular en lugar
+            de todos los múltiplos de dt_base hasta dt_maximo.
+        kwargs['puntos_por_decada'] : entero
+            Se calculan T_i equiespaciados en escala logarítmica con esta
+            cantidad de puntos por década (ver `genera_indices_agrupamiento`).
+            En ambos casos los T_i utilizados se graban en los encabezados y
+            'var_paralelo_mca' no saltea intervalos con 'skip_mca'.
+        kwargs['executor'] : Ejecutor (ver `ejecutor.py`)
+            Pool de procesos (o hilos) que se reutiliza entre llamadas. Si no
+            se especifica se crea uno con todos los procesadores disponibles
+            y se cierra al terminar.
+        kwargs['formato_salida'] : str ('texto' default, 'hdf5', 'ambos')
+            'hdf5' escribe un único archivo .h5 comprimido por cada serie en
+            lugar de los archivos .dat, .fey y .Nk (ver
+            `escribe_archivos_hdf5`). Se lee con las mismas funciones
+            (`lee_fey`, `lee_historias_completas`) y se puede exportar a
+            texto con `exporta_hdf5_a_texto`. No aplica a 'cov_matrix'.
+        kwargs['covarianza_Y'] : bool (False default)
+            Graba además, para cada serie, la matriz de covarianza entre los
+            T_i del promedio de Y en un archivo .covY.npy (ver
+            `covarianza_Y`). Se utiliza en los ajustes con 'cov_Y'.
+        kwargs['punto_control'] : str
+            Carpeta donde se van guardando los resultados de las historias ya
+            procesadas (ver `punto_control.py`). Si el procesamiento se corta,
+            al volver a correrlo con los mismos datos y parámetros sólo se
+            procesan las historias que faltan. No aplica a 'var_serie' ni a
+            'var_vectorizado'.
 
    Resultados
    ----------
@@ -784,97 +1823,191 @@ def metodo_alfa_feynman(leidos, numero_de_historias, dt_maximo, calculo,
         La cantidad de elementos depederá del calculo realizado:
         'var_serie' : Un elemento por cada detector
         'var_paralelo' : Un elemento por cada detector
+        'var_vectorizado' : Un elemento por cada detector
+        'var_momentos' : Dos elementos por cada detector [Y(D1) ... Y2(D1) ...]
         'cov_paralelo' : Tres elementos [Y(var1) Y(var2) Y(cov12)]
+        'cov_matrix' : Un elemento de (historias x T_i x (N+1) x (N+1))
         'sum_paralelo' : Un elemento
     """
 
-    diccionario_afey = {
-            'var_serie': afey_varianza_serie,
-            'var_paralelo': afey_varianza_paralelo,
-            'var_paralelo_choice': afey_varianza_paralelo_choice,
-            'var_paralelo_mca': afey_varianza_paralelo_mca,
-            'var_paralelo_skip': afey_varianza_paralelo_skip,
-            'cov_paralelo': afey_covarianza_paralelo,
-            'sum_paralelo': afey_suma_paralelo,
-                      }
-    fun_seleccionada = diccionario_afey.get(calculo)
-    if fun_seleccionada is None:
-        print('El calculo "{}" solicitado no está implementado'.format(calculo))
-        print('Se sale del programa')
-        quit()
-    else:
-        if calculo == 'var_paralelo_choice':
-            if kwargs.get('fraction') is None:
-                _msg = "Para calcular con el método {} es necesario "
-                _msg += "incluir el argumento 'fraction' como diccionario \n"
-                _msg += "Se sale del programa"
-                print(_msg.format(calculo))
-                quit()
-        elif calculo == 'var_paralelo_mca':
-            if kwargs.get('skip_mca') is None:
-                _msg = "Para calcular con el método {} es necesario "
-                _msg += "incluir el argumento 'skip' como diccionario \n"
-                _msg += "Se sale del programa"
-                print(_msg.format(calculo))
-                quit()
-            if kwargs.get('method_mca') is None:
-                _msg = "Para calcular con el método {} es necesario "
-                _msg += "incluir el argumento 'method_mca' como diccionario \n"
-                _msg += "Los  valores posibles son 'constant' ó 'A_over_k' \n"
-                _msg += "Se sale del programa"
-                print(_msg.format(calculo))
-                quit()
+    fun_seleccionada = selecciona_calculo_afey(calculo, kwargs)
 
-        elif calculo == 'var_paralelo_skip':
-            if kwargs.get('corr_time') is None:
-                _msg = "Para calcular con el método {} es necesario "
-                _msg += "incluir el argumento 'corr_time' como diccionario \n"
-                _msg += "Se sale del programa"
-                print(_msg.format(calculo))
-                quit()
-
-        Y_historias, dt_base, M_points = \
-                fun_seleccionada(leidos, numero_de_historias, dt_maximo,
+    resultado = fun_seleccionada(leidos, numero_de_historias, dt_maximo,
                                  **kwargs)
+    Y_historias, dt_base, M_points = resultado[0:3]
+    # Sólo 'var_paralelo_solapado' devuelve también N_eff
+    N_eff = resultado[3] if len(resultado) > 3 else None
+
+    # Agrego la info de tasa de cuentas para ser grabada en el encabezado
+    tasas = tasa_de_cuentas(leidos)
+
+    _maximos = indices_de_kwargs(int(dt_maximo / dt_base), kwargs)
+    carpeta = kwargs.get('carpeta_resultados', 'resultados_afey')
+    escribe_resultados_afey(Y_historias, dt_base, M_points, _maximos, calculo,
+                            numero_de_historias, tasas, nombres, carpeta,
+                            kwargs.get('formato_salida', 'texto'),
+                            kwargs.get('covarianza_Y', False), N_eff)
+
+    return Y_historias
+
+
+def afey_varianza_skip_barrido(leidos, numero_de_historias, dt_maximos,
+                               indices, corr_times, **kwargs):
+    """
+    'var_paralelo_skip' para varios dt_maximo con una sola pasada
+
+    Cada par (i, S) distinto (intervalos agrupados y cantidad de intervalos
+    que se saltean) se calcula una única vez para todo el barrido.
+
+    Parametros
+    ----------
+        indices : lista de listas de enteros
+            Valores de i de cada punto del barrido
+        corr_times : lista de float
+            corr_time de cada punto del barrido
+        kwargs['executor'] : Ejecutor (ver `ejecutor.py`)
+        kwargs['punto_control'] : str (ver `metodo_alfa_feynman`)
+
+    Resultados
+    ----------
+        resultados : lista de tuplas
+            (Y_historias, dt_base, M_points) de cada punto del barrido
+    """
+
+    dt_base = leidos[0][1]
+    skips = [[int(np.ceil(corr_time / dt_base / i)) for i in _indices]
+             for _indices, corr_time in zip(indices, corr_times)]
+    pares = sorted(set((i, S) for _indices, _skips in zip(indices, skips)
+                       for i, S in zip(_indices, _skips)))
+    columna = {par: k for k, par in enumerate(pares)}
+
+    Y_pares = []
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        for leido in leidos:
+            a, dt_base = leido
+            historias, _, datos_x_hist = \
+                calcula_alfa_feynman_input(a, numero_de_historias, dt_base,
+                                           max(dt_maximos))
+            Y_pares.append(
+                mapea_historias_compartidas(
+                    pool, agrupamiento_historia_skip, historias,
+                    ([i for i, _ in pares], datos_x_hist,
+                     [S for _, S in pares]), len(pares),
+                    punto_control=kwargs.get('punto_control')))
+
+    resultados = []
+    for _indices, _skips in zip(indices, skips):
+        _cols = [columna[par] for par in zip(_indices, _skips)]
+        M_points = [int((datos_x_hist // i) / (S + 1))
+                    for i, S in zip(_indices, _skips)]
+        resultados.append(([Y[:, _cols] for Y in Y_pares], dt_base, M_points))
+    return resultados
+
+
+def barrido_alfa_feynman(leidos, numero_de_historias, dt_maximos, calculo,
+                         nombres, **kwargs):
+    """
+    `metodo_alfa_feynman` para varios dt_maximo calculando una sola vez
+
+    Para una misma cantidad de historias y dt_base, el resultado con un
+    dt_maximo menor es un subconjunto (de los T_i) del resultado con el
+    dt_maximo mayor. Se calcula entonces una única vez con el mayor dt_maximo
+    (o con la unión de las grillas de T_i de todos los puntos, si se pidió
+    'intervalos' o 'puntos_por_decada') y el resto se obtiene seleccionando
+    columnas. Se escriben los mismos archivos que con `metodo_alfa_feynman`
+    en una carpeta por cada dt_maximo.
+
+    Excepciones:
+        'var_paralelo_skip' : la cantidad de intervalos salteados depende de
+            corr_time, que puede depender de dt_maximo. Sólo se calculan los
+            pares (i, S) distintos (ver `afey_varianza_skip_barrido`).
+        'var_paralelo_mca' : los intervalos usados para cada T_i dependen de
+            dt_maximo, por lo que se recalcula cada punto.
 
-        # Agrego la info de tasa de cuentas para ser grabada en el encabezado
-        # Servirá para hacer correcciones en los parámetros estimados (por
-        # ejemplo en el tiempo muerto).
-        # Es un parche que se hizo a último momento. Se tendría que hacer
-        # más prolijo reescribiendo toda las funciones con esto en mente
-        def _tasa_de_cuentas(leidos):
-            """ Calcula la tasa de cuentas promedio de cada medición """
-
-            _tasas = []
-            for leido in leidos:
-                # Tasa promedio
-                _prom = np.mean(leido[0]) / leido[1]
-                # Desvío del promedio
-                _desvio = np.std(leido[0], ddof=1) / leido[1] \
-                    / np.sqrt(len(leido[0]))
-                _tasas.append([_prom, _desvio])
-            return _tasas
-
-        tasas = _tasa_de_cuentas(leidos)
-
-        carpeta = kwargs.get('carpeta_resultados', 'resultados_afey')
-        if not os.path.exists(carpeta): os.makedirs(carpeta)
-        # Se generan los nombres de los archivos para guardar los datos
-        nom_archivos = genera_nombre_archivos(nombres, len(Y_historias),
-                                              calculo, carpeta)
-
-        # Escribe todas las historias
-        escribe_archivos_completos(Y_historias, dt_base, calculo,
-                                   numero_de_historias, tasas, nom_archivos)
-        # Calcula estadistica sobre historias
-        promedio, desvio = promedia_historias(Y_historias)
-        # Escribe promedios y desvios
-        escribe_archivos_promedios(promedio, desvio, dt_base, calculo,
-                                   numero_de_historias, tasas, nom_archivos)
-        # Escribe la cantidad de puntos utilizados para el promedio de cada Ti
-        escribe_archivos_Mpoints(nom_archivos, M_points)
-
-        return Y_historias
+    Parametros
+    ----------
+    leidos, numero_de_historias, calculo, nombres :
+        Igual que en `metodo_alfa_feynman`
+    dt_maximos : lista de float
+        Valores de dt_maximo del barrido
+    kwargs : dictionary
+        Los mismos que `metodo_alfa_feynman`, salvo:
+        kwargs['carpeta_resultados'] : str ("barrido_afey/{:.2e}" default)
+            Se le da formato con cada dt_maximo. Si no tiene un campo de
+            formato se agrega una subcarpeta por cada dt_maximo.
+        kwargs['corr_time'] : float o función
+            Si es una función se evalúa en cada dt_maximo
+            (ej: lambda dt_maximo: 2 * dt_maximo)
+
+    Resultados
+    ----------
+    Y_barrido : lista
+        Y_historias (ver `metodo_alfa_feynman`) de cada dt_maximo
+    """
+
+    fun_seleccionada = selecciona_calculo_afey(calculo, kwargs)
+    kwargs = dict(kwargs)
+
+    dt_base = leidos[0][1]
+    tasas = tasa_de_cuentas(leidos)
+    carpeta = kwargs.get('carpeta_resultados', 'barrido_afey/{:.2e}')
+    if '{' not in carpeta:
+        carpeta = os.path.join(carpeta, '{:.2e}')
+    # Valores de i de cada punto del barrido
+    maximos = [indices_de_kwargs(int(dt_maximo / dt_base), kwargs)
+               for dt_maximo in dt_maximos]
+    indices = [lista_indices(_maximos) for _maximos in maximos]
+
+    with usa_ejecutor(kwargs.get('executor')) as ejecutor:
+        kwargs['executor'] = ejecutor
+        if calculo == 'var_paralelo_mca':
+            resultados = []
+            for dt_maximo in dt_maximos:
+                resultados.append(fun_seleccionada(
+                    leidos, numero_de_historias, dt_maximo, **kwargs))
+        elif calculo == 'var_paralelo_skip':
+            corr_time = kwargs.get('corr_time')
+            corr_times = [corr_time(dt_maximo) if callable(corr_time)
+                          else corr_time for dt_maximo in dt_maximos]
+            resultados = afey_varianza_skip_barrido(
+                leidos, numero_de_historias, dt_maximos, indices, corr_times,
+                **kwargs)
+        else:
+            if np.ndim(maximos[0]) == 0:
+                _total = max(maximos)
+            else:
+                # Se calcula la unión de todas las grillas de T_i
+                _total = sorted(set(i for _indices in indices
+                                    for i in _indices))
+                kwargs['intervalos'] = _total
+                kwargs.pop('puntos_por_decada', None)
+            total = fun_seleccionada(leidos, numero_de_historias,
+                                     max(dt_maximos), **kwargs)
+            Y_total, dt_base, M_total = total[0:3]
+            columna = {i: k for k, i in enumerate(lista_indices(_total))}
+            resultados = []
+            for _indices in indices:
+                _cols = [columna[i] for i in _indices]
+                _resultado = ([np.asarray(Y)[:, _cols] for Y in Y_total],
+                              dt_base, [M_total[k] for k in _cols])
+                if len(total) > 3:
+                    # N_eff de 'var_paralelo_solapado'
+                    _resultado += ([total[3][k] for k in _cols],)
+                resultados.append(_resultado)
+
+    Y_barrido = []
+    for dt_maximo, _maximos, resultado in zip(dt_maximos, maximos,
+                                              resultados):
+        Y_historias, dt_base, M_points = resultado[0:3]
+        escribe_resultados_afey(Y_historias, dt_base, M_points, _maximos,
+                                calculo, numero_de_historias, tasas, nombres,
+                                carpeta.format(dt_maximo),
+                                kwargs.get('formato_salida', 'texto'),
+                                kwargs.get('covarianza_Y', False),
+                                resultado[3] if len(resultado) > 3 else None)
+        Y_barrido.append(Y_historias)
+
+    return Y_barrido
 
 
 if __name__ == '__main__':
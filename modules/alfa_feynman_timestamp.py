@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+"""
+Método de alfa-Feynman a partir de los datos de timestamping
+
+En lugar de convertir la lista de tiempos en un vector de cuentas en cada
+dt_base (`timestamp_to_timewindow`), las cuentas en cada intervalo T_i se
+obtienen directamente de los tiempos de llegada ordenados. Los T_i pueden ser
+arbitrarios (no tienen que ser múltiplos de un dt_base) y la memoria utilizada
+escala con la cantidad de pulsos, no con la duración de la medición.
+
+Las historias son las generadas por `alfa_rossi_preprocesamiento`.
+"""
+
+import numpy as np
+import os
+
+import sys
+sys.path.append('../')
+
+from modules.estadistica import rate_from_timestamp
+from modules.ejecutor import usa_ejecutor
+from modules.memoria_compartida import mapea_historias_compartidas
+from modules.alfa_feynman_procesamiento import genera_nombre_archivos, \
+    escribe_archivos_completos, promedia_historias, \
+    escribe_archivos_promedios, escribe_archivos_Mpoints, \
+    escribe_archivos_hdf5
+
+
+def cuentas_en_intervalos(tiempos, T, n_intervalos):
+    """
+    Suma y suma de cuadrados de las cuentas en intervalos de ancho T
+
+    Los intervalos son [k*T, (k+1)*T) con k = 0 ... n_intervalos - 1. Si hay
+    menos intervalos que pulsos se buscan los bordes de cada intervalo con
+    `searchsorted`. Si no, se calcula a qué intervalo pertenece cada pulso
+    y sólo se cuentan los intervalos con pulsos (el resto tiene cero cuentas).
+
+    Parametros
+    ----------
+        tiempos : numpy array
+            Tiempos de llegada ordenados, con el comienzo en t=0
+        T : float
+            Ancho de cada intervalo (en las mismas unidades que `tiempos`)
+        n_intervalos : entero
+            Cantidad de intervalos
+
+    Resultados
+    ----------
+        suma, suma_cuadrados : float
+            Suma de las cuentas y de sus cuadrados sobre todos los intervalos
+
+    >>> t = np.array([0, 2, 3, 6, 7, 8, 14])
+    >>> cuentas_en_intervalos(t, 3, 4)
+    (6.0, 14.0)
+    >>> cuentas_en_intervalos(t, 0.5, 28)
+    (6.0, 6.0)
+    """
+
+    if n_intervalos <= len(tiempos):
+        bordes = T * np.arange(n_intervalos + 1)
+        _cuentas = np.diff(np.searchsorted(tiempos, bordes, side='left'))
+    else:
+        _indices = np.floor_divide(tiempos, T).astype('int64')
+        _indices = _indices[_indices < n_intervalos]
+        # Los índices están ordenados: se cuentan los repetidos consecutivos
+        _cambios = np.flatnonzero(np.diff(_indices)) + 1
+        _cuentas = np.diff(np.concatenate(([0], _cambios, [len(_indices)])))
+    _cuentas = _cuentas.astype(float)
+    return float(np.sum(_cuentas)), float(np.sum(_cuentas**2))
+
+
+def agrupamiento_historia_timestamp(arg_tupla):
+    """
+    Y(T_i) de una historia de timestamping
+
+    Para cada T_i se usan todos los intervalos completos de la historia. El
+    origen es el primer pulso, que no se cuenta: si se contara, el primer
+    intervalo tendría siempre al menos una cuenta y la media y la varianza
+    quedarían sesgadas en O(1/n), importante en los T_i grandes donde hay
+    pocos intervalos. Si hay menos de dos intervalos Y es NaN
+    (`metodo_alfa_feynman_timestamp` descarta esos T_i antes de procesar).
+
+    Parametros
+    ----------
+        arg_tupla : tupla
+            (historia, T_i) donde T_i son los anchos de los intervalos en las
+            mismas unidades que la historia
+
+    Resultados
+    ----------
+        Y_k : numpy array
+            Array de (2 x len(T_i)). La primera fila es Y(T_i) y la segunda la
+            cantidad de intervalos utilizados.
+    """
+
+    historia, T_i = arg_tupla
+    # El primer pulso define el origen y no se cuenta
+    tiempos = historia[1:] - historia[0]
+    duracion = tiempos[-1]
+    Y_k = np.empty((2, len(T_i)))
+    for k, T in enumerate(T_i):
+        _n = int(duracion // T)
+        Y_k[1, k] = _n
+        if _n < 2:
+            Y_k[0, k] = np.nan
+            continue
+        _suma, _suma2 = cuentas_en_intervalos(tiempos, T, _n)
+        _media = _suma / _n
+        _var = (_suma2 - _n * _media**2) / (_n - 1)
+        Y_k[0, k] = _var / _media - 1
+    return Y_k
+
+
+def metodo_alfa_feynman_timestamp(data_historias, tb, T_i, nombres,
+                                  **kwargs):
+    """
+    Función principal para alfa-Feynman con datos de timestamping
+
+    Parametros
+    ----------
+    data_historias : list of list of numpy array
+        Historias de cada archivo, tal como las devuelve
+        `alfa_rossi_preprocesamiento`
+    tb : float
+        Duración de cada pulso de reloj [s] (tb=1 si los tiempos están en s)
+    T_i : array de float
+        Anchos de los intervalos [s]. Pueden ser arbitrarios.
+    nombres : list of strings
+        Nombres de los archivos leidos. Se utiliza para generar los nombres de
+        los archivos con los resultados.
+    kwargs : dictionary
+        kwargs['carpeta_resultados'] : str ("resultados_afey" default)
+            Nombre de la carpeta donde se guardarán los resultados
+        kwargs['executor'] : Ejecutor (ver `ejecutor.py`)
+        kwargs['formato_salida'] : str ('texto' default, 'hdf5', 'ambos')
+            Igual que en `metodo_alfa_feynman`
+
+    Resultados
+    ----------
+    Y_historias : lista de numpy array
+        Un array de (numero_de_historias x len(T_i)) por archivo
+
+    Se escriben los mismos archivos que con `metodo_alfa_feynman`
+    ('_var_timestamp.fey', '.dat' y '.Nk'), con los T_i en el encabezado. En
+    el archivo .Nk se graba la menor cantidad de intervalos entre historias.
+
+    Los T_i en los que alguna historia no tiene al menos dos intervalos
+    completos se descartan (se avisa cuáles), por lo que Y_historias puede
+    tener menos columnas que T_i.
+    """
+
+    calculo = 'var_timestamp'
+    T_i = np.sort(np.asarray(T_i, dtype=float))
+    # Duración de la historia más corta (igual que en
+    # `agrupamiento_historia_timestamp`)
+    _duracion = min(historia[-1] - historia[0]
+                    for historias in data_historias for historia in historias)
+    _validos = _duracion // (T_i / tb) >= 2
+    if not np.all(_validos):
+        print('Se descartan los T_i con menos de dos intervalos en alguna '
+              'historia: {}'.format(T_i[~_validos]))
+        T_i = T_i[_validos]
+    if T_i.size == 0:
+        print('Ningún T_i tiene al menos dos intervalos por historia')
+        quit()
+    # Los T_i se pasan a las unidades de los datos
+    _T_pulsos = T_i / tb
+
+    Y_historias = []
+    M_points = []
+    tasas = []
+    with usa_ejecutor(kwargs.get('executor')) as pool:
+        for historias in data_historias:
+            print('Procesando {} historias'.format(len(historias)))
+            _res = mapea_historias_compartidas(
+                pool, agrupamiento_historia_timestamp, historias,
+                (_T_pulsos,), 2 * len(T_i))
+            _res = _res.reshape(len(historias), 2, len(T_i))
+            Y_historias.append(_res[:, 0, :])
+            M_points.append(np.min(_res[:, 1, :], axis=0).astype(int))
+            _dt = np.concatenate([np.diff(historia) for historia in historias])
+            tasas.append(list(rate_from_timestamp(_dt * tb)))
+
+    numero_de_historias = len(data_historias[0])
+    carpeta = kwargs.get('carpeta_resultados', 'resultados_afey')
+    if not os.path.exists(carpeta): os.makedirs(carpeta)
+    nom_archivos = genera_nombre_archivos(nombres, len(Y_historias), calculo,
+                                          carpeta)
+    formato = kwargs.get('formato_salida', 'texto')
+    if formato in ['hdf5', 'ambos']:
+        escribe_archivos_hdf5(Y_historias, T_i[0], calculo,
+                              numero_de_historias, tasas, nom_archivos,
+                              M_points, T_i)
+        if formato == 'hdf5':
+            return Y_historias
+    escribe_archivos_completos(Y_historias, T_i[0], calculo,
+                               numero_de_historias, tasas, nom_archivos, T_i)
+    promedio, desvio = promedia_historias(Y_historias)
+    escribe_archivos_promedios(promedio, desvio, T_i[0], calculo,
+                               numero_de_historias, tasas, nom_archivos, T_i)
+    for nombre, _M in zip(nom_archivos, M_points):
+        escribe_archivos_Mpoints([nombre], _M, T_i)
+
+    return Y_historias
+
+
+if __name__ == '__main__':
+
+    from modules.alfa_rossi_preprocesamiento import \
+        alfa_rossi_preprocesamiento
+
+    nombres = [
+               '../datos/medicion04.a.inter.D1.bin',
+              ]
+    tb = 12.5e-9
+    Nhist = 100
+    # 10 puntos por década entre 100 us y 50 ms
+    T_i = np.logspace(-4, np.log10(50e-3), 28)
+
+    data_historias, _, _ = alfa_rossi_preprocesamiento(nombres, Nhist, tb)
+    Y_historias = metodo_alfa_feynman_timestamp(data_historias, tb, T_i,
+                                                nombres)
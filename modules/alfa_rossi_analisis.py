@@ -23,7 +23,8 @@ sys.path.append('../../')
 
 from .alfa_rossi_lectura import arossi_lee_historias_completas, \
                                        arossi_lee_historias_promedio
-from .funciones import arossi_1exp, arossi_2exp
+from .funciones import arossi_1exp, arossi_2exp, arossi_1exp_multi_tau, \
+                       arossi_2exp_multi_tau
 
 sns.set()
 plt.style.use('paper')
@@ -126,9 +127,15 @@ def arossi_grafica_promedio(nombres):
     return fig
 
 
-def arossi_ajuste_1exp(tau, P, P_std, P_ini=[200, 1, 1]):
+def arossi_ajuste_1exp(tau, P, P_std, P_ini=[200, 1, 1], ancho=None):
     """
     Ajusta de P(tau) con una exponencial
+
+    Para los resultados del correlador multi-tau (`alfa_rossi_procesamiento`
+    con multi_tau) se debe dar `ancho`, el ancho de los bines del nivel de
+    cada punto (dt_s * 2**nivel, con los niveles de `lags_multi_tau`). En ese
+    caso se ajusta `arossi_1exp_multi_tau`, que tiene en cuenta el promedio
+    pesado con un triángulo de cada punto.
     """
     def residual(params, tau, data=None, sigma=None):
         parvals = params.valuesdict()
@@ -136,7 +143,10 @@ def arossi_ajuste_1exp(tau, P, P_std, P_ini=[200, 1, 1]):
         amplitud = parvals['amplitud']
         uno = parvals['uno']
 
-        model = arossi_1exp(tau, alfa, amplitud, uno)
+        if ancho is None:
+            model = arossi_1exp(tau, alfa, amplitud, uno)
+        else:
+            model = arossi_1exp_multi_tau(tau, alfa, amplitud, uno, ancho)
 
         if data is None:
             return model
@@ -192,9 +202,12 @@ def arossi_ajuste_1exp(tau, P, P_std, P_ini=[200, 1, 1]):
     return fig
 
 
-def arossi_ajuste_2exp(tau, P, P_std, P_ini=[200., 1, 800, 1, 0]):
+def arossi_ajuste_2exp(tau, P, P_std, P_ini=[200., 1, 800, 1, 0],
+                       ancho=None):
     """
     Ajusta de P(tau) con dos exponenciales
+
+    `ancho` como en `arossi_ajuste_1exp` (se ajusta `arossi_2exp_multi_tau`)
     """
     def residual(params, tau, data=None, sigma=None):
         parvals = params.valuesdict()
@@ -204,7 +217,12 @@ def arossi_ajuste_2exp(tau, P, P_std, P_ini=[200., 1, 800, 1, 0]):
         amplitud_2 = parvals['amplitud_2']
         uno = parvals['uno']
 
-        model = arossi_2exp(tau, alfa_1, amplitud_1, alfa_2, amplitud_2, uno)
+        if ancho is None:
+            model = arossi_2exp(tau, alfa_1, amplitud_1, alfa_2, amplitud_2,
+                                uno)
+        else:
+            model = arossi_2exp_multi_tau(tau, alfa_1, amplitud_1, alfa_2,
+                                          amplitud_2, uno, ancho)
 
         if data is None:
             return model
@@ -6,6 +6,9 @@ Escribe los resultados del procesamiento con el método de alfa-Rossi.
 Genera el archivo [nombre]_ros_dat con todas las historias.
 Genera el archivo [nombre].ros con el promedio entre historias.
 
+Para alfa-Rossi cruzado [nombre] lleva los dos detectores: el del trigger y
+el de las cuentas (por ejemplo medicion.D1D2.ros, ver `nombres_cruzados`).
+
 Toma os resultados provenientes de `alfa_rossi_procesamiento()` que está en el
 script `alfa_rossi_procesamiento.py`.
 
@@ -18,6 +21,7 @@ podrá utilizar fácilmente (ver función arossi_una_historia_I() en
 """
 
 import numpy as np
+import itertools
 import os
 import datetime
 
@@ -41,14 +45,18 @@ def genera_encabezado(nombre, Nhist, dt_s, dtmax_s, tb, *args, **kargs):
     encabezado.append('#')
     encabezado.append('# Fecha de procesamiento: {}'.format(now_str))
     encabezado.append('#')
-    encabezado.append('# Tipo de procesamiento: alfa-Rossi Tipo I')
+    encabezado.append('# Tipo de procesamiento: ' +
+                      kargs.get('tipo', 'alfa-Rossi Tipo I'))
     encabezado.append('#')
     encabezado.append('# Duración del bin (dt) [s]')
     encabezado.append('{:1.4E}'.format(dt_s))
     encabezado.append('# Máximo bin analizado (dt_max) [s]')
     encabezado.append('{:.4E}'.format(dtmax_s))
     encabezado.append('# Puntos analizados por trigger')
-    encabezado.append('{}'.format(int(dtmax_s / dt_s)))
+    if kargs.get('tau') is not None:
+        encabezado.append('{}'.format(len(kargs['tau'])))
+    else:
+        encabezado.append('{}'.format(int(dtmax_s / dt_s)))
     encabezado.append('# Tiempo base del contador [s]')
     encabezado.append('{:.4E}'.format(tb))
     encabezado.append('# Número de historias (N_hist)')
@@ -57,6 +65,40 @@ def genera_encabezado(nombre, Nhist, dt_s, dtmax_s, tb, *args, **kargs):
     return encabezado
 
 
+def nombres_cruzados(nombres, pares):
+    """
+    Nombres para los resultados de alfa-Rossi cruzado
+
+    Se sigue la misma convención que alfa-Feynman para las sumas entre
+    detectores: al nombre del archivo del trigger se le agrega el
+    identificador del detector en el que se cuentan los pulsos.
+
+    >>> nombres_cruzados(['../datos/med.a.D1.bin', '../datos/med.a.D2.bin'],
+    ...                  [(0, 1), (1, 0)])
+    ['../datos/med.a.D1D2.bin', '../datos/med.a.D2D1.bin']
+    """
+
+    nombres_pares = []
+    for i, j in pares:
+        _base, _det, _ext = nombres[i].rsplit('.', 2)
+        _det_cuentas = os.path.split(nombres[j])[-1].rsplit('.', 2)[-2]
+        nombres_pares.append('.'.join([_base, _det + _det_cuentas, _ext]))
+    return nombres_pares
+
+
+def vector_tau(dt_s, dtmax_s, tau=None):
+    """
+    Tau centrado en cada bin, o la grilla `tau` si se especifica (por
+    ejemplo la del correlador multi-tau, ver `lags_multi_tau`)
+    """
+    if tau is not None:
+        return np.asarray(tau)
+    _nbins = int(np.rint(dtmax_s / dt_s))
+    tau = np.linspace(0, dtmax_s, _nbins, endpoint=False)
+    tau += dt_s / 2  # Centrado en el bin
+    return tau
+
+
 def genera_camino_archivo(nombre, tipo, nom_carpeta):
     """ Genera camino del archivo de datos dado el nombre leído """
 
@@ -84,7 +126,8 @@ def escribe_datos_completos(resultados, nombres, Nhist, dt_s, dtmax_s, tb,
     basa en el parámetro de entrada `nombres` sin la extensión. El archivo se
     crea dentro de la carpeta `./nom_carpeta/`.
 
-    El tau está centrado en el bin.
+    El tau está centrado en el bin. Con el keyword argument 'tau' se escribe
+    esa grilla (no uniforme en el correlador multi-tau).
 
     El desvío estándar es del promedio de la tasa de cuentas (ya está dividido
     por raiz(N)).
@@ -94,7 +137,8 @@ def escribe_datos_completos(resultados, nombres, Nhist, dt_s, dtmax_s, tb,
     extras = ''  # Para agregar algo más en un futuro
     # Se escribe iterando en los archivos (detectores)
     for nombre, resultado in zip(nombres, resultados):
-        header = genera_encabezado(nombre, Nhist, dt_s, dtmax_s, tb, extras)
+        header = genera_encabezado(nombre, Nhist, dt_s, dtmax_s, tb, extras,
+                                   **kargs)
         camino = genera_camino_archivo(nombre, 'completo', nom_carpeta)
         with open(camino, 'w') as f:
             f.write('# Archivo con P(tau) de todas las historias\n')
@@ -123,9 +167,7 @@ def escribe_datos_completos(resultados, nombres, Nhist, dt_s, dtmax_s, tb,
                     'cada historia \n')
             f.write('# tau [s] P(tau)_#1   ...   P(tau)_#N_hist \n')
         # Vector temporal
-        _nbins = np.int(np.rint(dtmax_s / dt_s))
-        tau = np.linspace(0, dtmax_s, _nbins, endpoint=False)
-        tau += dt_s / 2  # Centrado en el bin
+        tau = vector_tau(dt_s, dtmax_s, kargs.get('tau'))
         _hist = np.transpose(list(np.asarray(resultado[:, 0])))
         _tod = np.column_stack((tau, _hist))
         with open(camino, 'ab') as f:
@@ -149,7 +191,8 @@ def escribe_datos_promedio(resultados, nombres, Nhist, dt_s, dtmax_s, tb,
     extras = ''  # Para agregar algo más en un futuro
     # Se escribe iterando en los archivos (detectores)
     for nombre, resultado in zip(nombres, resultados):
-        header = genera_encabezado(nombre, Nhist, dt_s, dtmax_s, tb, extras)
+        header = genera_encabezado(nombre, Nhist, dt_s, dtmax_s, tb, extras,
+                                   **kargs)
         camino = genera_camino_archivo(nombre, 'promedio', nom_carpeta)
         with open(camino, 'w') as f:
             f.write('# Archivo con P(tau) promediada entre las historias\n')
@@ -175,9 +218,7 @@ def escribe_datos_promedio(resultados, nombres, Nhist, dt_s, dtmax_s, tb,
             f.write('{:1.6}\n'.format(N_trig_std))
             f.write('# Tau centrado [s]    <P(tau)>    std(<P(tau)>) \n')
         # Vector temporal
-        _nbins = np.int(np.rint(dtmax_s / dt_s))
-        tau = np.linspace(0, dtmax_s, _nbins, endpoint=False)
-        tau += dt_s / 2  # Centrado en el bin
+        tau = vector_tau(dt_s, dtmax_s, kargs.get('tau'))
         # Todas las historias
         _historias = resultado[:, 0]
         P_mean = np.mean(_historias)
@@ -201,14 +242,27 @@ def escribe_ambos(resultados, nombres, Nhist, dt_s, dtmax_s, tb, *args,
         'carpeta' : nombre de la carpeta donde se escribirán los datos
                     (relativa al directorio de donde sea llamada). El valor
                     por default es 'resultados_arossi'.
+        'pares' : los mismos pares que se usaron en
+                  `alfa_rossi_procesamiento` para alfa-Rossi cruzado. Los
+                  archivos se nombran con ambos detectores.
+        'tau' : grilla de tau no uniforme (correlador multi-tau, obtenida
+                con `lags_multi_tau`)
     """
     if kargs is not None:
         nom_carpeta = kargs.get('carpeta', 'resultados_arossi')
-
+        pares = kargs.get('pares', None)
+
+    extras = {'tau': kargs.get('tau', None)}
+    if pares is not None:
+        if pares == 'todos':
+            pares = list(itertools.permutations(range(len(nombres)), 2))
+        nombres = nombres_cruzados(nombres, pares)
+        extras['tipo'] = 'alfa-Rossi Tipo I cruzado (trigger en el primer ' \
+                         'detector, cuentas en el segundo)'
     escribe_datos_completos(resultados, nombres, Nhist, dt_s, dtmax_s, tb,
-                            nom_carpeta)
+                            nom_carpeta, **extras)
     escribe_datos_promedio(resultados, nombres, Nhist, dt_s, dtmax_s, tb,
-                           nom_carpeta)
+                           nom_carpeta, **extras)
     return None
 
 
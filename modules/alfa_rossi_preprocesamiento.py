@@ -188,6 +188,59 @@ def separa_en_historias_lista(time_stamped_datas, N_historias):
     return historias_list
 
 
+def separa_en_historias_comun(time_stamped_datas, N_historias):
+    """
+    Separa los datos de todos los detectores en las mismas historias
+
+    A diferencia de `separa_en_historias`, los límites de cada historia son
+    los mismos para todos los detectores (se usa el origen temporal común que
+    deja `corrige_roll_over`) y a cada historia se le resta el tiempo en que
+    comienza, no el de su primer pulso. Así los tiempos de distintos
+    detectores dentro de una misma historia se pueden comparar entre sí, como
+    se necesita para alfa-Rossi cruzado.
+
+    Parámetros
+    ----------
+        time_stamped_datas : list of numpy.ndarray
+            Datos de cada detector con el roll-over corregido
+        N_historias : integer
+            Cantidad de historias en que se quiere separar los datos
+
+    Resultados
+    ----------
+        historias_list : list of list of numpy.ndarray
+            Para cada detector, la lista con sus N_historias historias
+
+    >>> d1 = np.array([0, 2, 5, 7, 11], dtype='uint64')
+    >>> d2 = np.array([1, 6, 12], dtype='uint64')
+    >>> h1, h2 = separa_en_historias_comun([d1, d2], 2)
+    >>> h1[1], h2[1]
+    (array([1, 5], dtype=uint64), array([0, 6], dtype=uint64))
+    """
+
+    # La última historia termina con el último pulso de todos los detectores
+    _t_maximo = max(data[-1] for data in time_stamped_datas)
+    # Tiempos en que comienza cada historia (el último es el final de todas)
+    _limites = np.linspace(0, _t_maximo, N_historias + 1)
+    # Con datos en pulsos de reloj los límites tienen que ser enteros
+    _dtype = time_stamped_datas[0].dtype
+    if np.issubdtype(_dtype, np.integer):
+        _limites = np.rint(_limites).astype(_dtype)
+    historias_list = []
+    for data in time_stamped_datas:
+        _index = np.searchsorted(data, _limites, side='left')
+        # El último pulso pertenece a la última historia
+        _index[-1] = data.size
+        if np.any(np.diff(_index) == 0):
+            print('Hay historias que no tienen pulsos. Revisar')
+            quit()
+        historias = []
+        for k in range(N_historias):
+            historias.append(data[_index[k]:_index[k + 1]] - _limites[k])
+        historias_list.append(historias)
+    return historias_list
+
+
 def convierte_dtype_historias(historias):
     """
     Convierte al tipo de dato de menor tamaño posible
@@ -291,7 +344,15 @@ def inspeccion_historias_list(list_historias, tb=12.5e-9):
     return lista_pulsos_historia, lista_tiempos_historia
 
 
-def alfa_rossi_preprocesamiento(nombres, Nhist, tb, formato_datos='binario'):
+def _separa(data_sin_rollover, Nhist, historias_comunes):
+    """ Separa en historias, por detector o con límites comunes """
+    if historias_comunes:
+        return separa_en_historias_comun(data_sin_rollover, Nhist)
+    return separa_en_historias_lista(data_sin_rollover, Nhist)
+
+
+def alfa_rossi_preprocesamiento(nombres, Nhist, tb, formato_datos='binario',
+                                historias_comunes=False):
     """
     Función que genera las historias para todos los archivos leídos
 
@@ -311,6 +372,11 @@ def alfa_rossi_preprocesamiento(nombres, Nhist, tb, formato_datos='binario'):
         formato_datos : string, opcional ('binario', 'ascii')
             Para distinguir si se leen archivos  en binario (mediciones) o
             en ascii (simulaciones)
+        historias_comunes : bool, opcional
+            Si es verdadero todos los detectores se separan en las mismas
+            historias, con un origen temporal común (ver
+            `separa_en_historias_comun`). Es necesario para alfa-Rossi
+            cruzado.
 
     Resultados
     ----------
@@ -332,7 +398,7 @@ def alfa_rossi_preprocesamiento(nombres, Nhist, tb, formato_datos='binario'):
         # Se corrige el roll-over
         data_sin_rollover = corrige_roll_over(data_con_rollover)
         # Separe el vector con los tiempos en historias
-        data_historias = separa_en_historias_lista(data_sin_rollover, Nhist)
+        data_historias = _separa(data_sin_rollover, Nhist, historias_comunes)
         # Busca el tipo de dato de menor tamaño
         data_historias = convierte_dtype_historias_lista(data_historias)
     elif formato_datos == 'ascii':
@@ -340,7 +406,7 @@ def alfa_rossi_preprocesamiento(nombres, Nhist, tb, formato_datos='binario'):
         # Se leen los datos del archivo en ascii
         data_sin_rollover = read_timestamp_list_ascii(nombres)
         # Separe el vector con los tiempos en historias
-        data_historias = separa_en_historias_lista(data_sin_rollover, Nhist)
+        data_historias = _separa(data_sin_rollover, Nhist, historias_comunes)
     else:
         print('Formato de dato especificado no disponible')
         quit()
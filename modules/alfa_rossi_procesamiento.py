@@ -10,7 +10,10 @@ el script `alfa_rossi_preprocesamiento.py`.
 
 TODO: Puede tene problemas de memoria para ciertos parámetros dt y dtmax. Para
 aplicaciones en reactores no sucede, quizá para otras aplicaciones haya que
-optimizar el manejo de memoria.
+optimizar el manejo de memoria. Con save_trigs="acumulado" no se guardan las
+cuentas de cada trigger, sólo sus sumas por bin. A tasas de cuentas altas se
+puede usar metodo="fft" (o "auto"), cuyo costo no depende de la cantidad de
+pulsos dentro de dtmax.
 
 OJO: La función numpy.bincount() parace tener un bug cuando trabaja con uint64.
 Trata de castear a in64 y no puede. Trabajando con un tb=12.5e-9s, el límite
@@ -21,7 +24,6 @@ molestar. Suena bastante improbable igual.
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-import multiprocessing as mp
 import itertools
 import time
 import os
@@ -30,14 +32,167 @@ import sys
 sys.path.append('../')
 
 from modules.alfa_rossi_preprocesamiento import alfa_rossi_preprocesamiento
-from modules.estadistica import rate_from_timestamp
+from modules.estadistica import rate_from_timestamp, timestamp_to_timewindow, \
+    autocorrelacion_fft
+from modules.ejecutor import usa_ejecutor
+from modules.memoria_compartida import comparte_historias, crea_salida, \
+    abre_compartido, abre_salida, cierra_memoria, copia_salida, libera_memoria
+from modules.punto_control import hash_argumentos, guarda_punto_control, \
+    carga_punto_control
 
 sns.set()
 plt.style.use('paper')
 
 
+def cuentas_por_lag(data, N_triggers, dt, dtmax, N_bin, save_trigs=True):
+    """
+    Histogramas de alfa-Rossi recorriendo los lags entre pulsos
+
+    En lugar de recorrer cada trigger, para cada lag k = 1, 2, ... se
+    calculan a la vez las diferencias data[i+k] - data[i] de todos los
+    triggers i y se acumula su histograma. Como los tiempos están ordenados,
+    se termina en el primer lag en que ningún par cae dentro de dtmax. La
+    cantidad de lags es del orden de la cantidad de pulsos en dtmax.
+
+    Se usan las mismas operaciones que en el recorrido por triggers de
+    `arossi_una_historia_I`, por lo que el resultado es idéntico.
+
+    Parámetros
+    ----------
+        data : numpy array
+            Tiempos de llegada de la historia [pulsos de reloj]
+        N_triggers : int
+            Se usan como triggers los primeros N_triggers pulsos
+        dt, dtmax : float
+            Ancho de cada bin y del histograma [pulsos de reloj]
+        N_bin : int
+            Cantidad de bines
+        save_trigs : bool
+            Indica si se devuelven los histogramas de cada trigger
+
+    Resultados
+    ----------
+        P_suma : numpy array (int64)
+            Suma de los histogramas de todos los triggers
+        P_trigger : numpy array (int64) o None
+            Array de (N_triggers x N_bin) con el histograma de cada trigger
+
+    >>> data = np.array([0, 3, 4, 9, 15, 16], dtype='uint64')
+    >>> P_suma, P_trigger = cuentas_por_lag(data, 3, 2.0, 10.0, 5)
+    >>> P_suma
+    array([1, 1, 2, 1, 1])
+    >>> P_trigger[1]
+    array([1, 0, 0, 1, 0])
+    """
+
+    # Misma comparación que `np.searchsorted(data, trigger + dtmax)`
+    limite = data[:N_triggers] + dtmax
+    P_suma = np.zeros(N_bin, dtype='int64')
+    indices_trigger = []
+    k = 1
+    while k < data.size:
+        _n = min(N_triggers, data.size - k)
+        # Triggers que todavía tienen pulsos a k lugares dentro de dtmax
+        _dentro = data[k:k + _n] < limite[:_n]
+        if not np.any(_dentro):
+            break
+        data_bin = (data[k:k + _n] - data[:_n]) // dt
+        _en_rango = _dentro & (data_bin < N_bin)
+        _bines = data_bin[_en_rango].astype('int64')
+        P_suma += np.bincount(_bines, minlength=N_bin)
+        if save_trigs:
+            indices_trigger.append(np.flatnonzero(_en_rango) * N_bin + _bines)
+        k += 1
+
+    if not save_trigs:
+        return P_suma, None
+    if indices_trigger:
+        indices_trigger = np.concatenate(indices_trigger)
+    P_trigger = np.bincount(np.asarray(indices_trigger, dtype='int64'),
+                            minlength=N_triggers * N_bin)
+    return P_suma, P_trigger.reshape(N_triggers, N_bin)
+
+
+def acumula_cuentas_por_lag(data, N_triggers, dt, dtmax, N_bin,
+                            muestra_trigs=0, semilla=None,
+                            triggers_por_bloque=4096):
+    """
+    Sumas por bin de las cuentas de los triggers, sin guardar cada trigger
+
+    Los triggers se procesan de a bloques con `cuentas_por_lag` y de cada
+    bloque sólo se acumulan, para cada bin, la suma de las cuentas y la suma
+    de sus cuadrados. La memoria utilizada es O(N_bin) (más un bloque) en
+    lugar de O(N_triggers x N_bin).
+
+    Parámetros
+    ----------
+        data, N_triggers, dt, dtmax, N_bin :
+            Igual que en `cuentas_por_lag`
+        muestra_trigs : int
+            Cantidad de triggers elegidos al azar (sin reposición) cuyos
+            histogramas se guardan completos, por ejemplo para debuggear
+        semilla : int, SeedSequence o None
+            Semilla para elegir la muestra de triggers
+        triggers_por_bloque : int
+            Cantidad de triggers que se procesan juntos
+
+    Resultados
+    ----------
+        acumulador : tupla (S1, S2, muestra)
+            S1, S2 : numpy array (int64) con la suma de las cuentas y de sus
+                cuadrados sobre los triggers, para cada bin
+            muestra : numpy array (int64) de (muestra_trigs x N_bin) con los
+                histogramas de los triggers elegidos (en orden)
+
+    >>> data = np.array([0, 3, 4, 9, 15, 16], dtype='uint64')
+    >>> S1, S2, _ = acumula_cuentas_por_lag(data, 3, 2.0, 10.0, 5,
+    ...                                     triggers_por_bloque=2)
+    >>> S1, S2
+    (array([1, 1, 2, 1, 1]), array([1, 1, 2, 1, 1]))
+    """
+
+    S1 = np.zeros(N_bin, dtype='int64')
+    S2 = np.zeros(N_bin, dtype='int64')
+    rng = np.random.default_rng(semilla)
+    elegidos = np.sort(rng.choice(N_triggers, min(muestra_trigs, N_triggers),
+                                  replace=False))
+    muestra = []
+    for inicio in range(0, N_triggers, triggers_por_bloque):
+        _n = min(triggers_por_bloque, N_triggers - inicio)
+        # Los triggers del bloque son los primeros de data[inicio:]
+        _, P_bloque = cuentas_por_lag(data[inicio:], _n, dt, dtmax, N_bin)
+        S1 += np.sum(P_bloque, axis=0)
+        S2 += np.sum(P_bloque**2, axis=0)
+        _en_bloque = elegidos[(elegidos >= inicio) & (elegidos < inicio + _n)]
+        muestra.append(P_bloque[_en_bloque - inicio])
+    muestra = np.concatenate(muestra) if muestra else \
+        np.zeros((0, N_bin), dtype='int64')
+    return S1, S2, muestra
+
+
+def estadistica_por_bin(acumulador, N_triggers, dt_s, R):
+    """
+    P(tau) y su desvío a partir de las sumas de `acumula_cuentas_por_lag`
+
+    Se usa la misma normalización que `arossi_una_historia_I`. El desvío es
+    el del promedio sobre los triggers (varianza por bin dividida por
+    N_triggers).
+
+    Resultados
+    ----------
+        P, std_P : numpy array
+    """
+
+    S1, S2 = acumulador[0], acumulador[1]
+    _media = S1 / N_triggers
+    _var = (S2 - N_triggers * _media**2) / (N_triggers - 1)
+    std_P = np.sqrt(np.maximum(_var, 0) / N_triggers) / dt_s / R
+    return _media / dt_s / R, std_P
+
+
 def arossi_una_historia_I(data, dt_s, dtmax_s, tb, trigs='compute',
-                          save_trigs=True):
+                          save_trigs=True, metodo='lags', muestra_trigs=0,
+                          semilla=None):
     """
     Aplica el método de a-Rossi (Tipo I) a una historia
 
@@ -72,9 +227,28 @@ def arossi_una_historia_I(data, dt_s, dtmax_s, tb, trigs='compute',
             comportamiento original).
             "all" : usa todos los triggers. Se agregó para procesar los datos
             de coincidencias sin accidentales a través de la PTRAC.
-        save_trigs: bool
+        save_trigs: bool o "acumulado"
             Indica si se devuelve P_trigger. Si la cantidad de datos es muy
             grande, P_trigger puede consumir mucha memoria.
+            "acumulado" : en lugar de P_trigger se devuelven sólo las sumas
+            por bin de las cuentas y de sus cuadrados, y una muestra de
+            triggers (ver `acumula_cuentas_por_lag`). Siempre usa "lags".
+        metodo : str ("lags", "triggers", "fft", "auto")
+            "lags" : recorre los lags entre pulsos (ver `cuentas_por_lag`)
+            "triggers" : recorre cada trigger (implementación original)
+            Ambos dan el mismo resultado, "lags" es mucho más rápido.
+            "fft" : autocorrelación de las cuentas en intervalos de ancho dt
+            (ver `cuentas_por_fft`). Para tasas de cuentas altas, donde hay
+            muchos pulsos dentro de dtmax. No calcula P_trigger (se devuelve
+            None). Es una aproximación: no coincide exactamente con "lags".
+            "auto" : elige entre "lags" y "fft" según el costo estimado (ver
+            `elige_metodo`). Con save_trigs=True o trigs="all" siempre usa
+            "lags".
+        muestra_trigs : int
+            Sólo con save_trigs="acumulado": cantidad de triggers elegidos al
+            azar que se devuelven completos
+        semilla : int, SeedSequence o None
+            Semilla para elegir la muestra de triggers
 
 
     Resultados
@@ -96,6 +270,8 @@ def arossi_una_historia_I(data, dt_s, dtmax_s, tb, trigs='compute',
             Son las cuentas directas obtenidas en cada trigger.
             Están sin normalizar. Se utiliza para debuggear.
             Quizá sirva para aplicar otros métodos de multiplicidad
+            Con save_trigs="acumulado" es la tupla (S1, S2, muestra) de
+            `acumula_cuentas_por_lag` (ver también `estadistica_por_bin`)
 
     """
     # Es más cómodo trabajar en unidades de pulso
@@ -128,6 +304,29 @@ def arossi_una_historia_I(data, dt_s, dtmax_s, tb, trigs='compute',
         R_historia = (1, 0)
     # Cantidad de triggers en data_ok
     N_triggers = data_ok.size
+    if save_trigs == 'acumulado':
+        acumulador = acumula_cuentas_por_lag(data, N_triggers, dt, dtmax,
+                                             N_bin, muestra_trigs, semilla)
+        P_historia = acumulador[0] / N_triggers / dt_s / R_historia[0]
+        return P_historia, R_historia, N_triggers, acumulador
+    if metodo == 'auto':
+        metodo = elige_metodo(data, dt, dtmax, trigs=trigs) \
+            if not save_trigs else 'lags'
+    if metodo == 'fft':
+        P_suma, N_triggers = cuentas_por_fft(data, dt, N_bin, trigs)
+        P_historia = P_suma / N_triggers / dt_s / R_historia[0]
+        if save_trigs:
+            return P_historia, R_historia, N_triggers, None
+        else:
+            return P_historia, R_historia, N_triggers
+    if metodo == 'lags':
+        P_suma, P_trigger = cuentas_por_lag(data, N_triggers, dt, dtmax,
+                                            N_bin, save_trigs)
+        P_historia = P_suma / N_triggers / dt_s / R_historia[0]
+        if save_trigs:
+            return P_historia, R_historia, N_triggers, P_trigger
+        else:
+            return P_historia, R_historia, N_triggers
     # Recorro todos los triggers
     P_trigger = []
     for i, trigger in enumerate(data_ok):
@@ -159,6 +358,423 @@ def arossi_una_historia_I(data, dt_s, dtmax_s, tb, trigs='compute',
         return P_historia, R_historia, N_triggers
 
 
+def intercala_ordenados(a, v):
+    """
+    Igual que np.searchsorted(a, v, side='left') con `a` y `v` ordenados
+
+    Se intercalan ambos vectores con np.argsort estable, que para dos tramos
+    ya ordenados (timsort) es una única pasada: el costo es lineal en
+    a.size + v.size en lugar de v.size x log(a.size). Ante valores iguales el
+    orden estable deja primero a los de `v`, por lo que no se cuentan los
+    elementos de `a` iguales (side='left').
+
+    >>> intercala_ordenados(np.array([1, 3, 3, 7]), np.array([0, 3, 4, 9]))
+    array([0, 1, 3, 4])
+    """
+
+    _orden = np.argsort(np.concatenate((v, a)), kind='stable')
+    return np.flatnonzero(_orden < v.size) - np.arange(v.size)
+
+
+def cuentas_cruzadas_por_lag(trig, N_triggers, cuentas, dt, dtmax, N_bin,
+                             save_trigs=True):
+    """
+    Histogramas de alfa-Rossi cruzado recorriendo los lags entre pulsos
+
+    Los triggers son los primeros N_triggers pulsos de `trig` y se cuentan
+    los pulsos de `cuentas` (otro detector, con el mismo origen temporal).
+    Primero se intercalan ambos vectores ordenados para obtener, para cada
+    trigger, el primer pulso de `cuentas` que llega a partir de él (ver
+    `intercala_ordenados`). Luego,
+    igual que en `cuentas_por_lag`, para cada lag k = 0, 1, ... se toman a la
+    vez los pulsos que están k lugares después de ese primero. El costo es
+    lineal en la cantidad total de pulsos (por la cantidad de pulsos en
+    dtmax).
+
+    Los pulsos simultáneos con el trigger se cuentan en el primer bin (al ser
+    otro detector no hay que restar al propio trigger).
+
+    Parámetros
+    ----------
+        trig : numpy array
+            Tiempos de llegada del detector usado como trigger
+        N_triggers : int
+            Se usan como triggers los primeros N_triggers pulsos de `trig`
+        cuentas : numpy array
+            Tiempos de llegada del detector en el que se cuentan los pulsos
+        dt, dtmax, N_bin, save_trigs :
+            Igual que en `cuentas_por_lag`
+
+    Resultados
+    ----------
+        P_suma : numpy array (int64)
+            Suma de los histogramas de todos los triggers
+        P_trigger : numpy array (int64) o None
+            Array de (N_triggers x N_bin) con el histograma de cada trigger
+
+    >>> trig = np.array([0, 3, 9], dtype='uint64')
+    >>> cuentas = np.array([1, 3, 4, 12, 20], dtype='uint64')
+    >>> P_suma, P_trigger = cuentas_cruzadas_por_lag(trig, 2, cuentas, 2.0,
+    ...                                              10.0, 5)
+    >>> P_suma
+    array([3, 1, 1, 0, 1])
+    >>> P_trigger[1]
+    array([2, 0, 0, 0, 1])
+    """
+
+    trig = trig[:N_triggers]
+    # Intercalado de ambos vectores: primer pulso de `cuentas` a partir de
+    # cada trigger y último dentro de dtmax (como side='left' en
+    # `arossi_una_historia_I`, un pulso en dtmax no se cuenta)
+    primero = intercala_ordenados(cuentas, trig)
+    limite = trig + dtmax
+    _fin = intercala_ordenados(cuentas, limite)
+    P_suma = np.zeros(N_bin, dtype='int64')
+    indices_trigger = []
+    k = 0
+    while True:
+        _indices = primero + k
+        _dentro = _indices < _fin
+        if not np.any(_dentro):
+            break
+        _indices = _indices[_dentro]
+        data_bin = (cuentas[_indices] - trig[_dentro]) // dt
+        _en_rango = data_bin < N_bin
+        _bines = data_bin[_en_rango].astype('int64')
+        P_suma += np.bincount(_bines, minlength=N_bin)
+        if save_trigs:
+            _triggers = np.flatnonzero(_dentro)[_en_rango]
+            indices_trigger.append(_triggers * N_bin + _bines)
+        k += 1
+
+    if not save_trigs:
+        return P_suma, None
+    if indices_trigger:
+        indices_trigger = np.concatenate(indices_trigger)
+    P_trigger = np.bincount(np.asarray(indices_trigger, dtype='int64'),
+                            minlength=N_triggers * N_bin)
+    return P_suma, P_trigger.reshape(N_triggers, N_bin)
+
+
+def arossi_cruzado_una_historia(trig, cuentas, dt_s, dtmax_s, tb,
+                                trigs='compute', save_trigs=True):
+    """
+    Aplica el método de a-Rossi cruzado (Tipo I) a una historia
+
+    Los triggers son los pulsos de un detector y se cuentan los pulsos de
+    otro. Al no contar los pulsos del propio trigger, se evita el efecto del
+    tiempo muerto en los primeros bines. Ambas historias tienen que tener el
+    mismo origen temporal (ver `separa_en_historias_comun`).
+
+    La normalización es la misma que en `arossi_una_historia_I` pero con la
+    tasa de cuentas del detector en el que se cuentan los pulsos, por lo que
+    la parte no correlacionada vale uno.
+
+    Parámetros
+    ----------
+        trig : numpy array
+            Tiempos de llegada de la historia del detector usado como trigger
+        cuentas : numpy array
+            Tiempos de llegada de la misma historia en el otro detector
+        dt_s, dtmax_s, tb, trigs :
+            Igual que en `arossi_una_historia_I`
+        save_trigs : bool
+            Indica si se devuelve P_trigger
+
+    Resultados
+    ----------
+        P_historia, R_historia, N_triggers, P_trigger :
+            Igual que en `arossi_una_historia_I`. R_historia es la tasa del
+            detector en el que se cuentan los pulsos.
+    """
+    dt = np.float64(dt_s / tb)
+    dtmax = np.float64(dtmax_s / tb)
+    N_bin = int(np.rint(dtmax / dt))
+    # Si son enteros se trabaja con int64 para poder restar entre detectores
+    # con distinto dtype
+    if np.issubdtype(trig.dtype, np.integer) and \
+       np.issubdtype(cuentas.dtype, np.integer):
+        trig = trig.astype('int64')
+        cuentas = cuentas.astype('int64')
+    if trigs == "compute":
+        # Sólo triggers con pulsos del otro detector en todo el barrido
+        N_triggers = np.searchsorted(trig, cuentas[-1] - dtmax, side='right')
+        R_historia = rate_from_timestamp(np.diff(cuentas) * tb)
+    elif trigs == "all":
+        N_triggers = trig.size
+        R_historia = (1, 0)
+    P_suma, P_trigger = cuentas_cruzadas_por_lag(trig, N_triggers, cuentas,
+                                                 dt, dtmax, N_bin, save_trigs)
+    P_historia = P_suma / N_triggers / dt_s / R_historia[0]
+    if save_trigs:
+        return P_historia, R_historia, N_triggers, P_trigger
+    else:
+        return P_historia, R_historia, N_triggers
+
+
+def lags_multi_tau(dt_s, dtmax_s, bines_por_nivel=16):
+    """
+    Grilla de tau del correlador multi-tau
+
+    En el nivel 0 los bines tienen ancho dt_s y se usan los lags
+    k = 1, ..., m-1 (m = bines_por_nivel). En cada nivel siguiente se
+    duplica el ancho y se usan los lags k = m/2, ..., m-1, de forma que la
+    grilla sigue donde terminó el nivel anterior. Se agregan niveles hasta
+    cubrir dtmax_s.
+
+    Resultados
+    ----------
+        niveles, lags : numpy array (int)
+            Nivel y lag (en unidades del ancho del nivel) de cada punto
+        tau : numpy array [segundos]
+            tau = lag * dt_s * 2**nivel
+
+    >>> niveles, lags, tau = lags_multi_tau(1.0, 20.0, 4)
+    >>> tau
+    array([ 1.,  2.,  3.,  4.,  6.,  8., 12., 16.])
+    >>> niveles
+    array([0, 0, 0, 1, 1, 2, 2, 3])
+    """
+
+    if bines_por_nivel < 2 or bines_por_nivel % 2:
+        print('La cantidad de bines por nivel tiene que ser par')
+        quit()
+    niveles = []
+    lags = []
+    nivel = 0
+    _k = np.arange(1, bines_por_nivel)
+    while _k[0] * dt_s * 2**nivel <= dtmax_s:
+        _k = _k[_k * dt_s * 2**nivel <= dtmax_s]
+        niveles.append(np.full(_k.size, nivel))
+        lags.append(_k)
+        nivel += 1
+        _k = np.arange(bines_por_nivel // 2, bines_por_nivel)
+    niveles = np.concatenate(niveles)
+    lags = np.concatenate(lags)
+    return niveles, lags, lags * dt_s * 2.0**niveles
+
+
+def correlacion_multi_tau(data, dt, niveles, lags):
+    """
+    Correlador multi-tau a partir de los tiempos de llegada
+
+    Los pulsos se cuentan en bines de ancho dt (sólo se guardan los bines con
+    cuentas) y en cada nivel se juntan de a dos los bines del nivel anterior.
+    Como `data` está ordenado, ambos pasos son una única pasada. Para cada
+    lag k de un nivel se calcula sum_i c_i c_{i+k} intercalando los bines
+    ocupados b con b + k: son dos tramos ordenados y np.argsort estable
+    (timsort) los intercala en una pasada, y los bines que coinciden quedan
+    juntos. El costo es O(N) por punto de la grilla, es decir O(N x niveles)
+    para una cantidad fija de bines por nivel, sin importar cuántos pulsos
+    haya dentro de dtmax.
+
+    Parámetros
+    ----------
+        data : numpy array
+            Tiempos de llegada de la historia [pulsos de reloj]
+        dt : float
+            Ancho de los bines del nivel 0 [pulsos de reloj]
+        niveles, lags : numpy array (int)
+            Grilla obtenida con `lags_multi_tau`
+
+    Resultados
+    ----------
+        G : numpy array (int64)
+            sum_i c_i c_{i+k} para cada punto de la grilla
+        N_triggers : numpy array (int64)
+            Cantidad de pulsos en los bines i que tienen al bin i+k dentro de
+            la historia (los que se usan como triggers en ese punto)
+
+    >>> data = np.array([0, 1, 3, 6, 7], dtype='uint64')
+    >>> G, N = correlacion_multi_tau(data, 2.0, np.array([0, 0, 1]),
+    ...                              np.array([1, 2, 1]))
+    >>> G, N
+    (array([2, 2, 6]), array([3, 3, 3]))
+    """
+
+    bines = (data // dt).astype('int64')
+    cuentas = np.ones(bines.size, dtype='int64')
+    G = np.zeros(lags.size, dtype='int64')
+    N_triggers = np.zeros(lags.size, dtype='int64')
+    for nivel in range(niveles.max() + 1):
+        if nivel > 0:
+            # Se juntan de a dos los bines del nivel anterior
+            bines = bines >> 1
+        # Se juntan los bines repetidos (están consecutivos)
+        _nuevos = np.flatnonzero(np.diff(bines, prepend=-1))
+        cuentas = np.add.reduceat(cuentas, _nuevos)
+        bines = bines[_nuevos]
+        _acumuladas = np.cumsum(cuentas)
+        for p in np.flatnonzero(niveles == nivel):
+            # Ante valores iguales, el orden estable deja primero al bin j
+            # (de `bines`) y después al bin i (de `bines + k`)
+            _unidos = np.concatenate((bines, bines + lags[p]))
+            _orden = np.argsort(_unidos, kind='stable')
+            _unidos = _unidos[_orden]
+            _pares = np.flatnonzero(_unidos[1:] == _unidos[:-1])
+            _j = _orden[_pares]
+            _i = _orden[_pares + 1] - bines.size
+            G[p] = np.sum(cuentas[_i] * cuentas[_j])
+            # Bines con el bin i+k antes del último bin de la historia
+            _n = np.searchsorted(bines, bines[-1] - lags[p], side='right')
+            N_triggers[p] = _acumuladas[_n - 1] if _n > 0 else 0
+    return G, N_triggers
+
+
+def arossi_multi_tau_una_historia(data, dt_s, dtmax_s, tb,
+                                  bines_por_nivel=16):
+    """
+    Aplica el método de a-Rossi con un correlador multi-tau a una historia
+
+    Como en los correladores de hardware, los bines son lineales a tiempos
+    cortos y se duplica su ancho en cada nivel (ver `lags_multi_tau`). Así se
+    pueden cubrir varias décadas de tau con un costo y una memoria que no
+    crecen como dtmax_s / dt_s. No se calcula P_trigger.
+
+    Cada punto es un promedio de P(tau) pesado con un triángulo de ancho
+    2 x (ancho del bin del nivel) centrado en tau. Se normaliza como en
+    `arossi_una_historia_I`, por lo que la parte no correlacionada vale uno.
+
+    OJO: por ese promedio, en los niveles gruesos (ancho w = dt_s * 2**nivel)
+    la parte correlacionada es exp(-alfa tau) * [sinh(alfa w/2)/(alfa w/2)]^2.
+    Ajustar `arossi_1exp` a estos puntos tiene un sesgo relativo en la
+    amplitud de ~(alfa w)^2 / 12, despreciable sólo si alfa w << 1. Por eso
+    los ajustes (`arossi_ajuste_1exp`, `arossi_ajuste_2exp`) se deben hacer
+    con ancho=w (w = dt_s * 2.0**niveles, con los niveles de
+    `lags_multi_tau`), que usan `arossi_1exp_multi_tau` y
+    `arossi_2exp_multi_tau`.
+
+    Parámetros
+    ----------
+        data, dt_s, tb :
+            Igual que en `arossi_una_historia_I`. dt_s es el ancho de los
+            bines del primer nivel.
+        dtmax_s : double [segundos]
+            Máximo tau de la grilla
+        bines_por_nivel : int (par)
+            Cantidad de bines del primer nivel
+
+    Resultados
+    ----------
+        P_historia : numpy array
+            P(tau) normalizada en la grilla de `lags_multi_tau`
+        R_historia : tupla (R_promedio, R_desvío)
+            Tasa de cuenta promedio y desvío del promedio en la historia
+        N_triggers : int
+            Cantidad de pulsos de la historia
+    """
+    niveles, lags, _ = lags_multi_tau(dt_s, dtmax_s, bines_por_nivel)
+    G, N_trig_lag = correlacion_multi_tau(data, np.float64(dt_s / tb), niveles,
+                                          lags)
+    R_historia = rate_from_timestamp(np.diff(data) * tb)
+    _ancho = dt_s * 2.0**niveles
+    P_historia = G / N_trig_lag / _ancho / R_historia[0]
+    return P_historia, R_historia, data.size
+
+
+def cuentas_por_fft(data, dt, N_bin, trigs='compute'):
+    """
+    Histograma de alfa-Rossi a partir de la autocorrelación de las cuentas
+
+    Se cuentan los pulsos en intervalos de ancho dt (`timestamp_to_timewindow`)
+    y se calcula su autocorrelación C(k) con FFT (`autocorrelacion_fft`). El
+    costo es O(M log M) con M la cantidad de intervalos, sin importar cuántos
+    pares de pulsos haya dentro de dtmax.
+
+    C(k) cuenta los pares de pulsos separados entre (k-1)dt y (k+1)dt pesados
+    con un triángulo centrado en k dt (T(k) por trigger). El valor de cada
+    bin [k dt, (k+1) dt) se estima con la regla del trapecio entre T(k) y
+    T(k+1). En T(0) se resta el pulso del propio trigger (n_i (n_i - 1)) y
+    el triángulo sólo tiene la mitad positiva.
+
+    OJO: el trapecio es una aproximación (exacta si T es lineal dentro de
+    cada bin). Con P(tau) suave la diferencia con "lags" queda dentro de la
+    estadística, pero no se obtiene el mismo resultado bin a bin (en
+    tests/test_arossi_fft.py la diferencia máxima es < 5e-3 con P ~ 1).
+
+    Parámetros
+    ----------
+        data : numpy array
+            Tiempos de llegada de la historia [pulsos de reloj]
+        dt : float
+            Ancho de cada bin [pulsos de reloj]
+        N_bin : int
+            Cantidad de bines
+        trigs : str ("compute", "all")
+            Igual que en `arossi_una_historia_I`. Con "all" todos los pulsos
+            (menos el último) son triggers y se suman todos los pares, aunque
+            el barrido termine fuera de la historia.
+
+    Resultados
+    ----------
+        P_suma : numpy array
+            Estimación de la suma de los histogramas de todos los triggers
+            (con "compute" los triggers con todo el barrido dentro de la
+            historia)
+        N_triggers : int
+            Cantidad de pulsos en los intervalos usados
+
+    >>> data = np.array([0, 2, 3, 6, 7, 8, 14], dtype='uint64')
+    >>> cuentas_por_fft(data, 3.0, 2)
+    (array([3.25, 4.25]), 3)
+    >>> cuentas_por_fft(data, 3.0, 2, 'all')
+    (array([6.5, 7. ]), 6)
+    """
+
+    if trigs == 'all':
+        # Se incluyen también los pulsos del último intervalo incompleto
+        cuentas = np.bincount((data // dt).astype('int64'))
+    else:
+        cuentas, _ = timestamp_to_timewindow(data, dt, 'pulsos', 'pulsos', 1)
+    C = autocorrelacion_fft(cuentas, N_bin + 1).astype('float64')
+    C[0] = (C[0] - np.sum(cuentas)) / 2
+    if trigs == 'all':
+        C[0] *= 2
+        return (C[:N_bin] + C[1:N_bin + 1]) / 2, data.size - 1
+    # Triggers de cada lag: pulsos en intervalos con el i+k dentro de la señal
+    _acumuladas = np.concatenate(([0], np.cumsum(cuentas)))
+    _N_lag = _acumuladas[np.maximum(cuentas.size - np.arange(N_bin + 2), 0)]
+    _N_lag[0] = _acumuladas[-1]
+    # Cuentas por trigger pesadas con el triángulo de cada lag
+    T = np.divide(C, _N_lag, out=np.zeros(N_bin + 2), where=_N_lag > 0)
+    T[0] *= 2
+    N_triggers = int(_N_lag[N_bin])
+    return (T[:N_bin] + T[1:N_bin + 1]) / 2 * N_triggers, N_triggers
+
+
+def elige_metodo(data, dt, dtmax, factor_fft=0.15, trigs='compute'):
+    """
+    Elige entre recorrer los lags ("lags") o usar FFT ("fft")
+
+    Se comparan los costos estimados: recorrer los lags es proporcional a la
+    cantidad de pulsos por la cantidad de pulsos en dtmax (tasa x dtmax),
+    mientras que la FFT es proporcional a M log M con M la cantidad de
+    intervalos de ancho dt. `factor_fft` es el costo relativo de cada
+    elemento de la FFT (medido con historias de 3e5 pulsos, el cruce entre
+    ambos tiempos de cálculo se da en un costo estimado ~0.15).
+
+    Con trigs="all" (cadenas de fisión, historias con pocos pulsos) siempre
+    se eligen los lags, que son exactos.
+
+    >>> data = np.arange(0, 10**6, 10, dtype='uint64')
+    >>> elige_metodo(data, 5.0, 20.0), elige_metodo(data, 5.0, 5000.0)
+    ('lags', 'fft')
+    >>> elige_metodo(data, 5.0, 5000.0, trigs='all')
+    'lags'
+    """
+
+    if trigs == 'all':
+        return 'lags'
+
+    _duracion = np.float64(data[-1]) - np.float64(data[0])
+    _pulsos_en_dtmax = data.size * dtmax / _duracion
+    _largo = 2**np.ceil(np.log2(2 * _duracion / dt))
+    if data.size * (1 + _pulsos_en_dtmax) > \
+       factor_fft * _largo * np.log2(_largo):
+        return 'fft'
+    return 'lags'
+
+
 def arossi_serial(data_bloques_undet, dt_s, dtmax_s, tb):
     """ Función en serie, sólo para debugg (sólo para un detector)"""
     a = []
@@ -173,13 +789,80 @@ def wrapper_arossi_una_historia_I(arg_tupla):
     return arossi_una_historia_I(data, dt_s, dtmax_s, tb, trigs, save_trigs)
 
 
+def wrapper_arossi_compartido(arg_tupla):
+    """
+    Wrapper de `arossi_una_historia_I` con la historia en memoria compartida
+
+    La historia se obtiene a partir de su descriptor y los resultados
+    [P_historia, R_promedio, R_desvío, N_triggers] se escriben en la fila
+    `fila` de la matriz compartida de salida (con save_trigs="acumulado"
+    también S1 y S2). Sólo P_trigger (o la muestra de triggers) se devuelve a
+    través del pool.
+
+    Si `descriptor` es un par de descriptores (trigger, cuentas) se usa
+    `arossi_cruzado_una_historia` y si se especifica `multi_tau` (bines por
+    nivel) se usa `arossi_multi_tau_una_historia`.
+    """
+    descriptor, dt_s, dtmax_s, tb, trigs, save_trigs, muestra_trigs, \
+        semilla, multi_tau, metodo, desc_salida, fila = arg_tupla
+    memorias = []
+    data = abre_compartido(descriptor, memorias)
+    if multi_tau is not None:
+        _res = arossi_multi_tau_una_historia(data, dt_s, dtmax_s, tb,
+                                             multi_tau)
+    elif isinstance(data, tuple):
+        _res = arossi_cruzado_una_historia(data[0], data[1], dt_s, dtmax_s,
+                                           tb, trigs, save_trigs)
+    else:
+        _res = arossi_una_historia_I(data, dt_s, dtmax_s, tb, trigs,
+                                     save_trigs, metodo=metodo,
+                                     muestra_trigs=muestra_trigs,
+                                     semilla=semilla)
+    salida = abre_salida(desc_salida, memorias)
+    if save_trigs == 'acumulado':
+        salida[fila] = np.concatenate((_res[0], _res[1], [_res[2]],
+                                       _res[3][0], _res[3][1]))
+    else:
+        salida[fila] = np.concatenate((_res[0], _res[1], [_res[2]]))
+    del data, salida
+    cierra_memoria(memorias)
+    if save_trigs == 'acumulado':
+        return _res[3][2]
+    return _res[3] if save_trigs else None
+
+
+def _arma_resultado(salida, P_trigger, N_bin, save_trigs):
+    """
+    Resultados de un detector con el formato de `wrapper_arossi_una_historia_I`
+
+    Se arman a partir de la matriz de salida compartida (ver
+    `wrapper_arossi_compartido`) y de lo que devolvió cada historia a través
+    del pool (P_trigger o la muestra de triggers).
+    """
+
+    _res = np.empty((len(salida), 4 if save_trigs else 3), dtype=object)
+    for j, fila in enumerate(salida):
+        _res[j, 0] = fila[0:N_bin]
+        _res[j, 1] = (fila[N_bin], fila[N_bin + 1])
+        _res[j, 2] = int(fila[N_bin + 2])
+        if save_trigs == 'acumulado':
+            _acum = fila[N_bin + 3:].reshape(2, N_bin).astype('int64')
+            _res[j, 3] = (_acum[0], _acum[1], P_trigger[j])
+        elif save_trigs:
+            _res[j, 3] = P_trigger[j]
+    return _res
+
+
 def alfa_rossi_procesamiento(data_bloques, dt_s, dtmax_s, tb, trigs='compute',
-        save_trigs=True):
+        save_trigs=True, executor=None, punto_control=None, muestra_trigs=0,
+        semilla=None, pares=None, multi_tau=None, metodo='lags'):
     """
     Procesamiento de alfa-Rossi para todos los detectores.
 
     Los cálculos por detector se hacen en serie. Los cálculos para las
-    historia están paralelizados con `multiprocessing`.
+    historia están paralelizados con `multiprocessing`. Las historias se
+    envían a los procesos a través de memoria compartida (ver
+    `memoria_compartida.py`).
 
     Parámetros
     ----------
@@ -199,42 +882,169 @@ def alfa_rossi_procesamiento(data_bloques, dt_s, dtmax_s, tb, trigs='compute',
             comportamiento original).
             "all" : usa todos los triggers. Se agregó para procesar los datos
             de coincidencias sin accidentales a través de la PTRAC.
-        save_trigs : bool
-            Indica si se guardan las cuentas de cada trigger
+        save_trigs : bool o "acumulado"
+            Indica si se guardan las cuentas de cada trigger. Con "acumulado"
+            sólo se guardan las sumas por bin (memoria O(N_bin) por historia,
+            ver `acumula_cuentas_por_lag`)
+        executor : Ejecutor, opcional
+            Pool de procesos (o hilos) que se reutiliza entre llamadas (ver
+            `ejecutor.py`). Si no se especifica se crea uno con todos los
+            procesadores disponibles y se cierra al terminar.
+        punto_control : string, opcional
+            Carpeta donde se guarda el resultado de cada detector apenas se
+            termina de procesar (ver `punto_control.py`). Si el procesamiento
+            se corta, al volver a correrlo con los mismos datos y parámetros
+            se leen los detectores ya procesados.
+        muestra_trigs : int
+            Con save_trigs="acumulado", cantidad de triggers por historia
+            elegidos al azar que se guardan completos
+        semilla : int o None
+            Semilla para elegir la muestra de triggers. Cada historia usa una
+            semilla derivada, por lo que el resultado no depende del ejecutor.
+        pares : list of tuples o "todos", opcional
+            Si se especifica se calcula alfa-Rossi cruzado: cada par
+            (i_trigger, i_cuentas) usa como triggers los pulsos del archivo
+            i_trigger y cuenta los del archivo i_cuentas (ver
+            `arossi_cruzado_una_historia`). Con "todos" se usan todos los
+            pares de archivos distintos. Las historias tienen que haber sido
+            separadas con `historias_comunes=True` en
+            `alfa_rossi_preprocesamiento`. No admite save_trigs="acumulado".
+        multi_tau : int (par), opcional
+            Si se especifica se usa el correlador multi-tau con esa cantidad
+            de bines en el primer nivel (ver `arossi_multi_tau_una_historia`).
+            dt_s es el ancho de los bines del primer nivel y la grilla de tau
+            no uniforme se obtiene con `lags_multi_tau`. No se calcula
+            P_trigger (se ignora save_trigs) ni admite `pares`.
+        metodo : str ("lags", "triggers", "fft", "auto")
+            Método de cálculo de cada historia (ver `arossi_una_historia_I`).
+            Para tasas de cuentas altas conviene "fft" o "auto" con
+            save_trigs=False.
 
     Resultados
     ----------
         results_detectores : lista de numpy ndarray
-            Cada elemento de la lista corresponde al resultado de un detector.
+            Cada elemento de la lista corresponde al resultado de un detector
+            (o de un par de detectores, en el orden de `pares`).
             Cada elemento contiene a las salidas de la función
             `wrapper_arossi_una_historia_I`:
                 - P_historia : numpy array
                 - R_historia : tupla (R_promedio, R_desvío)
                 - N_triggers : int
                 - P_trigger : list of list of numpy array (sólo si
-                              save_trigs=True)
+                              save_trigs=True). Con save_trigs="acumulado"
+                              es la tupla (S1, S2, muestra)
             Para más detalle, ver la función `arossi_una_historia_I`
 
     """
-    # Cantidad de procesadores disponibles
-    _num_proc = mp.cpu_count()
-    _pool = mp.Pool(processes=_num_proc)
-    print('Se utilizan {} procesos'.format(_num_proc))
-    print('-' * 50)
+    if multi_tau is not None:
+        if pares is not None:
+            print('El correlador multi-tau no está disponible para alfa-Rossi '
+                  'cruzado')
+            quit()
+        save_trigs = False
+    if pares is not None:
+        if save_trigs == 'acumulado':
+            print('save_trigs="acumulado" no está disponible para alfa-Rossi '
+                  'cruzado')
+            quit()
+        if pares == 'todos':
+            pares = list(itertools.permutations(range(len(data_bloques)), 2))
+        data_bloques = [(data_bloques[i], data_bloques[j]) for i, j in pares]
+    with usa_ejecutor(executor) as _pool:
+        print('-' * 50)
+        results_detectores = _procesa_detectores(_pool, data_bloques, dt_s,
+                                                 dtmax_s, tb, trigs,
+                                                 save_trigs, punto_control,
+                                                 muestra_trigs, semilla,
+                                                 multi_tau, metodo)
+    return results_detectores
+
+
+def _comparte_detector(data_un_detector):
+    """
+    Copia en memoria compartida las historias de un detector o de un par
+
+    Para un par (trigger, cuentas) cada descriptor es la tupla con los
+    descriptores de la misma historia en ambos detectores.
+    """
+    if isinstance(data_un_detector, tuple):
+        mem_trig, desc_trig = comparte_historias(list(data_un_detector[0]))
+        mem_cuentas, desc_cuentas = comparte_historias(
+            list(data_un_detector[1]))
+        return mem_trig + mem_cuentas, list(zip(desc_trig, desc_cuentas))
+    return comparte_historias(list(data_un_detector))
+
+
+def _procesa_detectores(_pool, data_bloques, dt_s, dtmax_s, tb, trigs,
+                        save_trigs, punto_control=None, muestra_trigs=0,
+                        semilla=None, multi_tau=None, metodo='lags'):
+    """
+    Procesa todos los detectores (o pares de detectores) con el ejecutor
+    `_pool`
+    """
+
+    acumulado = save_trigs == 'acumulado'
+    semillas = np.random.SeedSequence(semilla).spawn(len(data_bloques))
     results_detectores = []  # Lista para los resultados de cada detector
     # Itero sobre cada detector
     for i, data_un_detector in enumerate(data_bloques):
+        if punto_control is not None:
+            if isinstance(data_un_detector, tuple):
+                _historias = ('cruzado', list(data_un_detector[0]),
+                              list(data_un_detector[1]))
+            else:
+                _historias = list(data_un_detector)
+            clave = hash_argumentos(_historias, dt_s, dtmax_s, tb, trigs,
+                                    save_trigs, muestra_trigs, semilla,
+                                    multi_tau, metodo)
+        if multi_tau is not None:
+            _N_bin = lags_multi_tau(dt_s, dtmax_s, multi_tau)[2].size
+        else:
+            # Igual que en `arossi_una_historia_I` para evitar errores de
+            # redondeo
+            _N_bin = int(np.rint((dtmax_s / tb) / (dt_s / tb)))
+        if punto_control is not None:
+            guardado = carga_punto_control(punto_control, clave)
+            if guardado is not None:
+                print('Archivo [{}] leido del punto de control'.format(i))
+                _salida = guardado['salida']
+                _P_trigger = [guardado.get('P_trigger_{}'.format(j))
+                              for j in range(len(_salida))]
+                results_detectores.append(_arma_resultado(
+                    _salida, _P_trigger, _N_bin, save_trigs))
+                continue
         print('Procesando al archivo [{}]'.format(i))
-        # Construyo el argumento del wrapper en forma de tupla
-        argumentos_wrapper = zip(data_un_detector, itertools.repeat(dt_s),
-                                 itertools.repeat(dtmax_s),
-                                 itertools.repeat(tb),
-                                 itertools.repeat(trigs),
-                                 itertools.repeat(save_trigs),
-                                 )
-        _res = _pool.map(wrapper_arossi_una_historia_I, argumentos_wrapper)
-        _res = np.asarray(_res)
-        results_detectores.append(_res)
+        # Las historias se copian una vez en memoria compartida
+        memorias, descriptores = _comparte_detector(data_un_detector)
+        _columnas = 3 * _N_bin + 3 if acumulado else _N_bin + 3
+        mem_salida, desc_salida = crea_salida(len(descriptores), _columnas)
+        try:
+            # Construyo el argumento del wrapper en forma de tupla
+            argumentos_wrapper = zip(descriptores, itertools.repeat(dt_s),
+                                     itertools.repeat(dtmax_s),
+                                     itertools.repeat(tb),
+                                     itertools.repeat(trigs),
+                                     itertools.repeat(save_trigs),
+                                     itertools.repeat(muestra_trigs),
+                                     semillas[i].spawn(len(descriptores)),
+                                     itertools.repeat(multi_tau),
+                                     itertools.repeat(metodo),
+                                     itertools.repeat(desc_salida),
+                                     range(len(descriptores)),
+                                     )
+            _P_trigger = _pool.map(wrapper_arossi_compartido,
+                                   argumentos_wrapper)
+            _salida = copia_salida(desc_salida)
+        finally:
+            libera_memoria(memorias + [mem_salida])
+        if punto_control is not None:
+            # Sólo arrays numéricos, para leerlos sin pickle
+            _triggers = {'P_trigger_{}'.format(j): np.asarray(_P)
+                         for j, _P in enumerate(_P_trigger) if _P is not None}
+            guarda_punto_control(punto_control, clave, salida=_salida,
+                                 **_triggers)
+        results_detectores.append(_arma_resultado(_salida, _P_trigger, _N_bin,
+                                                  save_trigs))
         print('-' * 50)
     return results_detectores
 
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""
+Ejecutor reutilizable para los procesamientos en paralelo
+
+Antes cada función de procesamiento creaba su propio `mp.Pool` (a veces uno
+por detector) y nunca lo cerraba. Con `Ejecutor` el pool se crea una única vez
+y se puede pasar a `metodo_alfa_feynman(..., executor=ejecutor)` o a
+`alfa_rossi_procesamiento(..., executor=ejecutor)`, por ejemplo al hacer un
+barrido en dt_maximo:
+
+    with Ejecutor('procesos', procesos=8) as ejecutor:
+        for dt_maximo in dt_maximos:
+            metodo_alfa_feynman(..., executor=ejecutor)
+
+Si no se pasa un ejecutor, las funciones crean uno propio y lo cierran al
+terminar (ver `usa_ejecutor`).
+"""
+
+import multiprocessing as mp
+from multiprocessing.pool import ThreadPool
+from contextlib import contextmanager
+
+
+class Ejecutor:
+    """
+    Pool de procesos, de hilos o ejecución en serie con la misma interfaz
+
+    Parametros
+    ----------
+        tipo : string ('procesos', 'hilos', 'serie')
+            'procesos' : multiprocessing.Pool
+            'hilos' : multiprocessing.pool.ThreadPool. Conviene cuando el
+                cálculo libera el GIL (operaciones de numpy sobre arrays
+                grandes)
+            'serie' : sin paralelizar. Útil para debuggear.
+        procesos : entero, opcional
+            Cantidad de procesos (o hilos). Por defecto todos los disponibles.
+        chunksize : entero, opcional
+            Cantidad de tareas que se envían juntas a cada proceso. Por
+            defecto lo decide `multiprocessing`.
+    """
+
+    def __init__(self, tipo='procesos', procesos=None, chunksize=None):
+        if procesos is None:
+            procesos = mp.cpu_count()
+        self.tipo = tipo
+        self.procesos = procesos
+        self.chunksize = chunksize
+        if tipo == 'procesos':
+            self._pool = mp.Pool(processes=procesos)
+        elif tipo == 'hilos':
+            self._pool = ThreadPool(processes=procesos)
+        elif tipo == 'serie':
+            self._pool = None
+            self.procesos = 1
+        else:
+            print('El tipo de ejecutor "{}" no está implementado'.format(tipo))
+            print('Se sale del programa')
+            quit()
+        print('Se utilizan {} {}'.format(self.procesos,
+                                          'hilos' if tipo == 'hilos'
+                                          else 'procesos'))
+
+    def map(self, funcion, iterable):
+        """ Igual que `Pool.map` """
+        if self._pool is None:
+            return list(map(funcion, iterable))
+        return self._pool.map(funcion, iterable, self.chunksize)
+
+    def imap(self, funcion, iterable):
+        """ Igual que `Pool.imap` (los resultados se obtienen en orden) """
+        if self._pool is None:
+            return map(funcion, iterable)
+        return self._pool.imap(funcion, iterable, self.chunksize or 1)
+
+    def cerrar(self):
+        """ Espera que terminen las tareas y cierra el pool """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_exc, valor_exc, traza):
+        if tipo_exc is not None and self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        self.cerrar()
+        return False
+
+
+@contextmanager
+def usa_ejecutor(ejecutor=None):
+    """
+    Usa el ejecutor recibido o crea uno (de procesos) que se cierra al salir
+
+    >>> with usa_ejecutor(Ejecutor('serie')) as ejecutor:
+    ...     ejecutor.map(abs, [-1, 2])
+    Se utilizan 1 procesos
+    [1, 2]
+    """
+
+    if ejecutor is not None:
+        yield ejecutor
+    else:
+        with Ejecutor() as propio:
+            yield propio
@@ -261,6 +261,42 @@ def timestamp_to_timewindow(datos, dt, units_in, units_out, tb):
     return datos_binned, tiempos
 
 
+def autocorrelacion_fft(cuentas, N_lags):
+    """
+    Autocorrelación sin normalizar de una señal de cuentas mediante FFT
+
+    Calcula C(k) = sum_i n_i n_{i+k} para k = 0, ..., N_lags (sólo los i con
+    i+k dentro de la señal). Se completa con ceros hasta una potencia de 2
+    mayor al doble del largo para que la correlación no sea circular. El
+    costo es O(M log M) con M el largo de la señal.
+
+    Parámetros
+    ----------
+        cuentas : numpy array (int)
+            Pulsos en cada intervalo (por ejemplo de `timestamp_to_timewindow`)
+        N_lags : int
+            Máximo lag calculado
+
+    Resultados
+    ----------
+        C : numpy array (int64)
+            Autocorrelación para los lags 0, ..., N_lags
+
+    >>> autocorrelacion_fft(np.array([2, 1, 3, 0]), 3)
+    array([14,  5,  6,  0])
+    """
+
+    _M = cuentas.size
+    _largo = 2**int(np.ceil(np.log2(2 * _M)))
+    _F = np.fft.rfft(cuentas, n=_largo)
+    C = np.fft.irfft(_F * np.conj(_F), n=_largo)[:min(N_lags + 1, _M)]
+    # Las cuentas son enteras, sólo se corrigen errores de redondeo
+    C = np.rint(C).astype('int64')
+    if C.size < N_lags + 1:
+        C = np.concatenate((C, np.zeros(N_lags + 1 - C.size, dtype='int64')))
+    return C
+
+
 def promedio_por_bloques(x, metodo=None, *args, **kargs):
     """
     Función para obtener la incerteza del promedio de los datos
@@ -169,6 +169,39 @@ def arossi_1exp(tau, alfa, amplitud, uno):
     return amplitud * np.exp(-alfa*tau) + uno
 
 
+def arossi_1exp_multi_tau(tau, alfa, amplitud, uno, ancho):
+    """
+    Función de alfa-Rossi promediada como en el correlador multi-tau
+
+    Cada punto del correlador multi-tau (`arossi_multi_tau_una_historia`) es
+    el promedio de P(tau) pesado con un triángulo centrado en tau y de
+    semiancho `ancho` (el ancho de los bines de su nivel, dt * 2**nivel). El
+    triángulo es la convolución de dos rectángulos de ancho `ancho`, por lo
+    que para tau >= ancho:
+
+    P(tau) = amplitud * exp(-alfa*tau) * [sinh(x) / x]^2 + uno,
+        x = alfa * ancho / 2
+
+    El factor [sinh(x) / x]^2 ~ 1 + (alfa*ancho)^2 / 12 es el sesgo que se
+    comete al ajustar `arossi_1exp` a esos puntos.
+
+    >>> tau = np.array([1.0, 2.0])
+    >>> np.allclose(arossi_1exp_multi_tau(tau, 1e-6, 1.0, 1.0, 1.0),
+    ...             arossi_1exp(tau, 1e-6, 1.0, 1.0))
+    True
+    """
+    return amplitud * np.exp(-alfa*tau) * _factor_triangulo(alfa, ancho) + \
+        uno
+
+
+def _factor_triangulo(alfa, ancho):
+    """ [sinh(x) / x]^2 con x = alfa * ancho / 2 (vale 1 en x = 0) """
+    x = alfa * np.asarray(ancho, dtype=float) / 2
+    _cociente = np.ones_like(x)
+    np.divide(np.sinh(x), x, out=_cociente, where=x != 0)
+    return _cociente**2
+
+
 def arossi_2exp(tau, alfa_1, amplitud_1, alfa_2, amplitud_2, uno):
     """
     Función del método de alfa-Rossi teórica
@@ -191,6 +224,21 @@ def arossi_2exp(tau, alfa_1, amplitud_1, alfa_2, amplitud_2, uno):
     return P
 
 
+def arossi_2exp_multi_tau(tau, alfa_1, amplitud_1, alfa_2, amplitud_2, uno,
+                          ancho):
+    """
+    Función de alfa-Rossi con dos exponenciales promediada como en el
+    correlador multi-tau
+
+    Cada exponencial se multiplica por el factor del triángulo de semiancho
+    `ancho` (ver `arossi_1exp_multi_tau`).
+    """
+    P = amplitud_1 * np.exp(-alfa_1*tau) * _factor_triangulo(alfa_1, ancho) \
+        + amplitud_2 * np.exp(-alfa_2*tau) * _factor_triangulo(alfa_2, ancho) \
+        + uno
+    return P
+
+
 if __name__ == '__main__':
 
     import matplotlib.pyplot as plt
@@ -2,6 +2,7 @@
 
 import numpy as np
 import sys
+import os
 import re
 
 
@@ -80,6 +81,134 @@ def lee_dt_encabezado(encabezado):
     return dt
 
 
+def cantidad_datos_bin(filename):
+    '''
+    Cantidad de datos de un archivo de "intervaltime_MC" sin leerlos
+
+    Se lee sólo el encabezado y la cantidad de datos se obtiene a partir del
+    tamaño del archivo. Ya se descuenta el primer dato, que es descartado en
+    `read_bin_dt`.
+
+    Parameters
+    ----------
+
+    filename : string
+        Nombre del archivo que se quiere leer
+
+    Returns
+    -------
+
+    n_datos : int
+        Cantidad de datos que devolvería `read_bin_dt`
+    header: list of strings
+        Encabezado el archivo
+    offset : int
+        Posición (en bytes) del primer dato que devolvería `read_bin_dt`
+
+    '''
+
+    dt = np.dtype('>u4')
+    header = []
+    with open(filename, 'rb') as f:
+        # Se fija si tiene encabezado
+        header.append(f.readline().rstrip())
+        if header[0].startswith(b'Nombre'):
+            for i in range(6):
+                header.append(f.readline().rstrip())
+        else:
+            header = []
+            f.seek(0, 0)
+        # El primer dato se descarta
+        offset = f.tell() + dt.itemsize
+    n_datos = (os.path.getsize(filename) - offset) // dt.itemsize
+    return max(n_datos, 0), header, offset
+
+
+def read_bin_dt_mmap(filename, inicio=0, n_datos=None):
+    '''
+    Igual que `read_bin_dt` pero sin leer los datos (np.memmap)
+
+    Sólo se lee el encabezado. Los datos se devuelven como una vista de sólo
+    lectura del archivo ('>u4', el cambio de endianness lo hace numpy al
+    operar), por lo que abrir el archivo no depende de su tamaño y sólo se
+    leen de disco las partes que se usen.
+
+    Parameters
+    ----------
+
+    filename : string
+        Nombre del archivo que se quiere leer
+    inicio : int
+        Primer dato que se quiere leer (el mismo índice que en `read_bin_dt`)
+    n_datos : int, opcional
+        Cantidad de datos que se quieren leer. Por defecto hasta el final.
+
+    Returns
+    -------
+
+    a : np.memmap ('>u4')
+        Datos leidos (a[0] es el dato `inicio` de `read_bin_dt`)
+    header: list of strings
+        Encabezado el archivo
+
+    '''
+
+    dt = np.dtype('>u4')
+    _total, header, offset = cantidad_datos_bin(filename)
+    inicio = min(max(inicio, 0), _total)
+    if n_datos is None:
+        n_datos = _total - inicio
+    n_datos = min(n_datos, _total - inicio)
+    if n_datos <= 0:
+        # np.memmap no permite vistas vacías
+        return np.empty(0, dtype=dt), header
+    a = np.memmap(filename, dtype=dt, mode='r',
+                  offset=offset + inicio * dt.itemsize, shape=(n_datos,))
+    return a, header
+
+
+def lee_bin_dt_por_bloques(filename, datos_por_bloque, n_datos=None):
+    '''
+    Lee un archivo de "intervaltime_MC" de a bloques de datos consecutivos
+
+    Es un generador: nunca hay en memoria más de `datos_por_bloque` datos.
+    Se descarta el primer dato, igual que en `read_bin_dt`.
+
+    Parameters
+    ----------
+
+    filename : string
+        Nombre del archivo que se quiere leer
+    datos_por_bloque : int
+        Cantidad de datos de cada bloque (el último puede ser menor)
+    n_datos : int, opcional
+        Cantidad total de datos que se quieren leer. Por defecto todos.
+
+    Yields
+    ------
+
+    bloque : np.array ('>u4')
+        Datos leidos en cada bloque
+
+    '''
+
+    dt = np.dtype('>u4')
+    _total, _, offset = cantidad_datos_bin(filename)
+    if n_datos is None:
+        n_datos = _total
+    n_datos = min(n_datos, _total)
+    with open(filename, 'rb') as f:
+        f.seek(offset, 0)
+        leidos = 0
+        while leidos < n_datos:
+            _cuantos = min(datos_por_bloque, n_datos - leidos)
+            bloque = np.fromfile(f, dtype=dt, count=_cuantos)
+            if bloque.size == 0:
+                break
+            leidos += bloque.size
+            yield bloque
+
+
 def lee_bin_datos_dt(nombres):
     """
     Lee los datos del archivo binario y obteiene el dt del encabezado
@@ -114,19 +243,78 @@ def lee_bin_datos_dt(nombres):
     return result
 
 
-def lee_historias_completas(nombre):
+def importa_h5py():
+    """
+    Importa h5py sólo cuando se usa el formato hdf5 (dependencia opcional)
+    """
+
+    try:
+        import h5py
+    except ImportError:
+        print('Para usar el formato hdf5 es necesario instalar h5py')
+        print('Se sale del programa')
+        quit()
+    return h5py
+
+
+def lee_historias_hdf5(nombre, historias=None):
+    """
+    Lee las historias de alfa-Feynman de un archivo .h5
+
+    El archivo es el escrito por `escribe_archivos_hdf5`. Las historias están
+    guardadas por bloques (chunks) comprimidos, por lo que si se pide un
+    subconjunto de historias sólo se leen y descomprimen los bloques que las
+    contienen.
+
+    Parametros
+    ----------
+    nombre : string
+        Camino y nombre del archivo a leer (*.h5)
+    historias : slice, lista de enteros o None
+        Historias (columnas) que se quieren leer. Por defecto todas. Las
+        columnas se devuelven en el orden de la lista (con repeticiones, si
+        las hay), igual que al indexar el array completo.
+
+    Resultados
+    ----------
+    Igual que `lee_historias_completas`
+    """
+
+    h5py = importa_h5py()
+    with h5py.File(nombre, 'r') as f:
+        vec_temp = f['tau'][:]
+        if historias is None:
+            data = f['Y_historias'][:]
+        else:
+            if isinstance(historias, slice):
+                data = f['Y_historias'][:, historias]
+            else:
+                # h5py sólo lee índices crecientes y sin repetir: se leen
+                # ordenados y luego se devuelven en el orden pedido
+                _unicas, _inversa = np.unique(historias, return_inverse=True)
+                data = f['Y_historias'][:, _unicas][:, _inversa]
+        num_hist = np.uint32(f.attrs['numero_de_historias'])
+        tasas = f['tasas'][:]
+    return vec_temp, data, num_hist, tasas
+
+
+def lee_historias_completas(nombre, historias=None):
     """
     Lee el archivo que contiene todas las historias de alfa-Feynman
 
     Parametros
     ----------
     nombre: string
-        Camino y nombre del archivo a leer (*.dat)
+        Camino y nombre del archivo a leer (*.dat o *.h5). Los archivos .h5
+        se leen con `lee_historias_hdf5`.
+    historias : slice, lista de enteros o None
+        Sólo para archivos .h5: historias que se quieren leer
 
     Resultados
     ----------
     vec_tamp: array numpy
-        Vector temporal de los dt para alfa-Feynman
+        Vector temporal de los dt para alfa-Feynman. Si el archivo tiene los
+        T_i utilizados (grillas no equiespaciadas) se leen del encabezado.
     data: ndarray numpy
         Array en 2D donde cada columna es una de las historias calculadas
     tasas: ndarray numpy
@@ -134,28 +322,42 @@ def lee_historias_completas(nombre):
 
     """
 
+    if nombre.endswith('.h5'):
+        return lee_historias_hdf5(nombre, historias)
+
+    T_i = None
     try:
         with open(nombre, 'r') as f:
-            # Se lee el dt
+            # El encabezado termina en la línea siguiente a la que indica
+            # cómo están ordenados los datos
+            encabezado = []
             for line in f:
-                if line.startswith('# Valor de dt'):
-                    dt = np.double(next(f).rstrip())
-                elif line.startswith('# Número de historias'):
-                    num_hist = np.uint32(next(f).rstrip())
-                elif line.startswith('# Tasa de cuentas'):
-                    next(f)
-                    tasas = next(f).rstrip()
+                encabezado.append(line.rstrip('\n'))
+                if line.startswith('# Cada columna es una historia'):
+                    encabezado.append(next(f).rstrip('\n'))
                     break
-            # Se leen todas las historias
-            data = np.loadtxt(nombre, skiprows=15)
+        for j, line in enumerate(encabezado):
+            if line.startswith('# Valor de dt'):
+                dt = np.double(encabezado[j+1].rstrip())
+            elif line.startswith('# Número de historias'):
+                num_hist = np.uint32(encabezado[j+1].rstrip())
+            elif line.startswith('# Tasa de cuentas'):
+                tasas = encabezado[j+2].rstrip()
+            elif line.startswith('# Intervalos temporales T_i'):
+                T_i = np.asarray(encabezado[j+1].split(), dtype=float)
+        # Se leen todas las historias
+        data = np.loadtxt(nombre, skiprows=len(encabezado))
     except IOError as err:
         print('No se pudo leer el archivo: ' + nombre)
         raise err
         sys.exit()
 
     # Vector temporal
-    vec_temp = np.arange(0, dt * data.shape[0], dt)
-    vec_temp = vec_temp + dt
+    if T_i is not None:
+        vec_temp = T_i
+    else:
+        vec_temp = np.arange(0, dt * data.shape[0], dt)
+        vec_temp = vec_temp + dt
 
     # Convierto a numpy array
     tasas = np.asarray(tasas[1:-1].split(','), dtype=float)
@@ -173,7 +375,8 @@ def lee_fey(nombre):
     Parametros
     ----------
     nombre : string
-        Camino y nombre del archivo a leer (*.fey)
+        Camino y nombre del archivo a leer (*.fey o *.h5). De los archivos
+        .h5 sólo se lee el promedio y el desvío (no las historias).
 
     Resultados
     ----------
@@ -187,6 +390,12 @@ def lee_fey(nombre):
         Tasa de cuenta promedio y su desvío
 
     """
+    if nombre.endswith('.h5'):
+        h5py = importa_h5py()
+        with h5py.File(nombre, 'r') as f:
+            return f['tau'][:], f['Y_promedio'][:], f['Y_desvio'][:], \
+                   np.uint32(f.attrs['numero_de_historias']), f['tasas'][:]
+
     vec_temp, data, num_hist, tasas = lee_historias_completas(nombre)
     mean_Y = data[:, 0]
     std_Y = data[:, 1]
@@ -194,6 +403,63 @@ def lee_fey(nombre):
     return vec_temp, mean_Y, std_Y, num_hist, tasas
 
 
+def lee_fey_matriz(nombre):
+    """
+    Lee el archivo .npz generado con el cálculo 'cov_matrix' de alfa-Feynman
+
+    Parametros
+    ----------
+    nombre : string
+        Camino y nombre del archivo a leer (*_cov_matrix.npz)
+
+    Resultados
+    ----------
+    vec_temp : array numpy
+        Intervalos T_i
+    mean_Y : array numpy
+        Array de (T_i x (N+1) x (N+1)) con el valor medio de Y(T_i). En la
+        diagonal están las varianzas y fuera de ella las covarianzas. El
+        último índice corresponde a la suma de los detectores.
+    std_Y : array numpy
+        Desviación estandar del valor medio (misma forma que mean_Y)
+    detectores : array numpy de strings
+        Identificación de cada índice (el último es la suma)
+    tasas : array numpy
+        Tasa de cuenta promedio y su desvío de cada detector
+
+    """
+
+    with np.load(nombre) as datos:
+        return datos['tau'], datos['Y_promedio'], datos['Y_desvio'], \
+               datos['detectores'], datos['tasas']
+
+
+def lee_covarianza_Y(nombre):
+    """
+    Lee la covarianza entre los T_i del promedio de Y de alfa-Feynman
+
+    Parametros
+    ----------
+    nombre : string
+        Camino y nombre del archivo .fey (o .h5) de los resultados. Se lee el
+        archivo .covY.npy con el mismo nombre, grabado con
+        `metodo_alfa_feynman(..., covarianza_Y=True)`.
+
+    Resultados
+    ----------
+    cov_Y : array numpy
+        Matriz de (T_i x T_i)
+
+    """
+
+    _nombre = os.path.splitext(nombre)[0] + '.covY.npy'
+    try:
+        return np.load(_nombre)
+    except IOError as err:
+        print('No se pudo leer el archivo: ' + _nombre)
+        raise err
+
+
 def read_timestamp(filename, common_time=False):
     '''
     Función para leer los archivoss grabados por el programa "Timestamping_3C"
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+"""
+Funciones para compartir historias con los procesos de `multiprocessing`
+
+Las historias se copian una única vez en un bloque de memoria compartida
+(`multiprocessing.shared_memory`) y a cada proceso sólo se le envía un
+descriptor (nombre, offset, largo, dtype). Los resultados se devuelven de la
+misma forma, escribiendo en una matriz compartida donde cada fila corresponde
+a una historia. De esta forma se evita serializar (pickle) los datos a través
+de los pipes del pool.
+
+Uso típico:
+
+    memorias, descriptores = comparte_historias(historias)
+    mem_salida, desc_salida = crea_salida(len(historias), largo)
+    args = [(funcion, desc, extras, desc_salida, j) for ...]
+    pool.map(ejecuta_historia_compartida, args)
+    resultado = copia_salida(desc_salida)
+    libera_memoria(memorias + [mem_salida])
+
+O directamente `mapea_historias_compartidas`.
+"""
+
+import numpy as np
+import threading
+from multiprocessing import shared_memory, resource_tracker
+
+import sys
+sys.path.append('../')
+
+from modules.punto_control import hash_argumentos, historias_pendientes, \
+    guarda_historias
+
+# Protege el reemplazo temporal de `resource_tracker.register` cuando se usa
+# un pool de hilos (ver `_abre_memoria`)
+_candado_tracker = threading.Lock()
+
+
+def comparte_historias(historias):
+    """
+    Copia una lista de historias en un bloque de memoria compartida
+
+    Las historias pueden tener distinto largo (como en alfa-Rossi).
+
+    Parametros
+    ----------
+        historias : lista de numpy array (1D)
+            Historias que se quieren compartir. Todas del mismo dtype.
+
+    Resultados
+    ----------
+        memorias : lista de SharedMemory
+            Bloques de memoria creados. Hay que liberarlos con
+            `libera_memoria` al terminar.
+        descriptores : lista de tuplas
+            (nombre, offset, largo, dtype) de cada historia
+    """
+
+    dtype = np.dtype(np.asarray(historias[0]).dtype)
+    largos = [np.size(historia) for historia in historias]
+    _total = max(sum(largos) * dtype.itemsize, 1)
+    memoria = shared_memory.SharedMemory(create=True, size=_total)
+    descriptores = []
+    offset = 0
+    for historia, largo in zip(historias, largos):
+        _vista = np.ndarray(largo, dtype=dtype, buffer=memoria.buf,
+                            offset=offset)
+        _vista[:] = historia
+        descriptores.append((memoria.name, offset, largo, dtype.str))
+        offset += largo * dtype.itemsize
+    del _vista
+    return [memoria], descriptores
+
+
+def crea_salida(filas, columnas):
+    """
+    Crea una matriz compartida (float64) donde los procesos escriben
+
+    Resultados
+    ----------
+        memoria : SharedMemory
+        descriptor : tupla
+            (nombre, filas, columnas)
+    """
+
+    _nbytes = max(filas * columnas * np.dtype('float64').itemsize, 1)
+    memoria = shared_memory.SharedMemory(create=True, size=_nbytes)
+    return memoria, (memoria.name, filas, columnas)
+
+
+def _abre_memoria(nombre):
+    """
+    Abre un bloque de memoria compartida existente sin registrarlo
+
+    Sólo el proceso que crea la memoria debe liberarla. Si un proceso del pool
+    se creó antes que el `resource_tracker`, al abrir la memoria la registraría
+    en un tracker propio que la liberaría (con advertencias) al terminar.
+    """
+
+    try:
+        return shared_memory.SharedMemory(name=nombre, track=False)
+    except TypeError:
+        # Python < 3.13 no tiene el argumento `track`
+        with _candado_tracker:
+            _register = resource_tracker.register
+            resource_tracker.register = lambda *args, **kwargs: None
+            try:
+                return shared_memory.SharedMemory(name=nombre)
+            finally:
+                resource_tracker.register = _register
+
+
+def abre_compartido(descriptor, memorias):
+    """
+    Obtiene la vista de un descriptor (o tupla de descriptores)
+
+    Las memorias abiertas se agregan a la lista `memorias` para ser cerradas
+    luego con `cierra_memoria`.
+    """
+
+    if isinstance(descriptor[0], tuple):
+        return tuple(abre_compartido(_desc, memorias) for _desc in descriptor)
+    nombre, offset, largo, dtype = descriptor
+    memoria = _abre_memoria(nombre)
+    memorias.append(memoria)
+    return np.ndarray(largo, dtype=dtype, buffer=memoria.buf, offset=offset)
+
+
+def abre_salida(descriptor, memorias):
+    """ Vista (filas x columnas) de la matriz compartida de resultados """
+
+    nombre, filas, columnas = descriptor
+    memoria = _abre_memoria(nombre)
+    memorias.append(memoria)
+    return np.ndarray((filas, columnas), dtype='float64', buffer=memoria.buf)
+
+
+def cierra_memoria(memorias):
+    """ Cierra (sin liberar) las memorias abiertas por un proceso """
+
+    for memoria in memorias:
+        memoria.close()
+
+
+def libera_memoria(memorias):
+    """ Cierra y libera las memorias creadas por el proceso principal """
+
+    for memoria in memorias:
+        memoria.close()
+        memoria.unlink()
+
+
+def copia_salida(descriptor):
+    """ Copia la matriz compartida de resultados a un numpy array """
+
+    memorias = []
+    salida = abre_salida(descriptor, memorias)
+    resultado = salida.copy()
+    del salida
+    cierra_memoria(memorias)
+    return resultado
+
+
+def ejecuta_historia_compartida(arg_tupla):
+    """
+    Wrapper para ejecutar una función sobre una historia compartida
+
+    La función recibe la tupla (historia, *extras), igual que las funciones
+    de agrupamiento de alfa-Feynman, y su resultado se escribe aplanado en la
+    fila `fila` de la matriz de salida.
+
+    Parametros
+    ----------
+        arg_tupla : tupla
+            (funcion, descriptor, extras, descriptor_salida, fila)
+    """
+
+    funcion, descriptor, extras, desc_salida, fila = arg_tupla
+    memorias = []
+    historia = abre_compartido(descriptor, memorias)
+    resultado = np.ravel(funcion((historia,) + tuple(extras)))
+    salida = abre_salida(desc_salida, memorias)
+    salida[fila] = resultado
+    del historia, salida
+    cierra_memoria(memorias)
+    return None
+
+
+def mapea_historias_compartidas(pool, funcion, historias, extras,
+                                largo_salida, extras_por_historia=None,
+                                punto_control=None, historias_por_control=None):
+    """
+    Aplica `funcion` a cada historia en paralelo usando memoria compartida
+
+    Parametros
+    ----------
+        pool : multiprocessing.Pool
+            Pool de procesos
+        funcion : función
+            Debe recibir una tupla (historia, *extras) y devolver un resultado
+            de `largo_salida` elementos (puede ser una lista de listas)
+        historias : lista de numpy array o lista de tuplas de numpy array
+            Si son tuplas (por ejemplo para la covarianza), cada elemento de
+            la tupla se comparte por separado y la función recibe una tupla
+        extras : tupla
+            Resto de los argumentos de `funcion` (iguales para las historias)
+        largo_salida : entero
+            Cantidad de valores que devuelve `funcion` para cada historia
+        extras_por_historia : lista de tuplas, opcional
+            Argumentos distintos para cada historia (por ejemplo la semilla
+            de números aleatorios). Se agregan después de `extras`.
+        punto_control : string, opcional
+            Carpeta donde se guardan los resultados a medida que se procesan
+            las historias (ver `punto_control.py`). Si ya hay resultados
+            guardados para los mismos datos y parámetros, sólo se procesan
+            las historias que faltan.
+        historias_por_control : entero, opcional
+            Cantidad de historias que se procesan entre cada guardado. Por
+            defecto cuatro por cada proceso del ejecutor.
+
+    Resultados
+    ----------
+        resultado : numpy array
+            Array de (numero_de_historias x largo_salida)
+    """
+
+    historias = list(historias)
+    memorias = []
+    if isinstance(historias[0], tuple):
+        _por_detector = []
+        for _hist_det in zip(*historias):
+            _mem, _desc = comparte_historias(_hist_det)
+            memorias += _mem
+            _por_detector.append(_desc)
+        descriptores = list(zip(*_por_detector))
+    else:
+        memorias, descriptores = comparte_historias(historias)
+    mem_salida, desc_salida = crea_salida(len(historias), largo_salida)
+    try:
+        if extras_por_historia is None:
+            extras_por_historia = [()] * len(descriptores)
+        argumentos = [(funcion, desc, tuple(extras) + tuple(propios),
+                       desc_salida, j)
+                      for j, (desc, propios) in enumerate(
+                          zip(descriptores, extras_por_historia))]
+        if punto_control is None:
+            pool.map(ejecuta_historia_compartida, argumentos)
+            resultado = copia_salida(desc_salida)
+        else:
+            resultado = _mapea_con_control(pool, argumentos, desc_salida,
+                                           punto_control, historias_por_control,
+                                           hash_argumentos(
+                                               funcion, historias, extras,
+                                               extras_por_historia,
+                                               largo_salida))
+    finally:
+        libera_memoria(memorias + [mem_salida])
+    return resultado
+
+
+def _mapea_con_control(pool, argumentos, desc_salida, carpeta,
+                       historias_por_control, clave):
+    """
+    Procesa las historias de a grupos guardando un punto de control
+
+    Las historias ya procesadas en un punto de control con la misma clave no
+    se vuelven a procesar. De cada grupo sólo se guardan sus filas (ver
+    `guarda_historias`).
+    """
+
+    resultado, hechas = historias_pendientes(carpeta, clave, len(argumentos),
+                                             desc_salida[2])
+    if historias_por_control is None:
+        historias_por_control = 4 * getattr(pool, 'procesos', 1)
+    pendientes = np.flatnonzero(~hechas)
+    memorias = []
+    salida = abre_salida(desc_salida, memorias)
+    try:
+        for _inicio in range(0, len(pendientes), historias_por_control):
+            _grupo = pendientes[_inicio:_inicio + historias_por_control]
+            pool.map(ejecuta_historia_compartida,
+                     [argumentos[j] for j in _grupo])
+            resultado[_grupo] = salida[_grupo]
+            guarda_historias(carpeta, clave, _grupo, resultado[_grupo])
+    finally:
+        del salida
+        cierra_memoria(memorias)
+    return resultado
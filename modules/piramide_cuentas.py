@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+"""
+Pirámide de cuentas agrupadas de los archivos .bin
+
+Para cada archivo adquirido se guardan, en una carpeta junto al archivo
+(`<archivo>.piramide`), las cuentas agrupadas de a 2, 4, 8, ... intervalos
+base (un archivo .npy por nivel) y un índice en json con el hash de los
+datos. La pirámide se construye una única vez leyendo el archivo de a bloques.
+Luego cualquier agrupamiento de n intervalos se obtiene a partir del mayor
+nivel 2**k que divide a n, leyendo sólo ese nivel (con `np.load` en modo
+memmap):
+
+    datos, dt_agrupado = agrupa_datos_piramide('medicion.D1.bin', 5000)
+
+Si el archivo .bin cambia (distinto hash), la pirámide se reconstruye.
+"""
+
+import numpy as np
+import hashlib
+import json
+import os
+
+import sys
+sys.path.append('../')
+
+from modules.io_modules import cantidad_datos_bin, lee_bin_dt_por_bloques, \
+                               lee_dt_encabezado, read_bin_dt, read_bin_dt_mmap
+
+
+def carpeta_piramide(nombre):
+    """ Carpeta donde se guarda la pirámide del archivo `nombre` """
+    return nombre + '.piramide'
+
+
+def hash_datos_bin(nombre, datos_por_bloque=2**22):
+    """ Hash (sha1) de los datos de un archivo .bin, leyendo de a bloques """
+
+    _hash = hashlib.sha1()
+    for bloque in lee_bin_dt_por_bloques(nombre, datos_por_bloque):
+        _hash.update(bloque.tobytes())
+    return _hash.hexdigest()
+
+
+def construye_piramide(nombre, datos_por_bloque=2**22):
+    """
+    Construye y guarda la pirámide de cuentas de un archivo .bin
+
+    Se lee el archivo de a bloques (con una cantidad de datos múltiplo del
+    mayor factor), y en cada bloque cada nivel se obtiene sumando de a pares
+    los datos del nivel anterior. Los niveles se escriben directamente en
+    archivos .npy (uint64) abiertos como memmap, por lo que la memoria
+    utilizada no depende del tamaño del archivo. Los niveles llegan hasta
+    el mayor 2**k que no supera la cantidad de datos.
+
+    Parametros
+    ----------
+        nombre : string
+            Camino y nombre del archivo .bin
+        datos_por_bloque : entero
+            Cantidad aproximada de datos que se leen en cada bloque
+
+    Resultados
+    ----------
+        indice : dict
+            Contenido del archivo `indice.json` de la pirámide
+    """
+
+    n_datos, header, _ = cantidad_datos_bin(nombre)
+    dt = lee_dt_encabezado(header) if header else None
+    factores = []
+    while 2**(len(factores) + 1) <= n_datos:
+        factores.append(2**(len(factores) + 1))
+
+    carpeta = carpeta_piramide(nombre)
+    if not os.path.exists(carpeta): os.makedirs(carpeta)
+    print('Construyendo la pirámide de {} ({} niveles)'.format(nombre,
+                                                               len(factores)))
+    niveles = [np.lib.format.open_memmap(
+                   os.path.join(carpeta, 'nivel_{}.npy'.format(factor)),
+                   mode='w+', dtype='uint64', shape=(n_datos // factor,))
+               for factor in factores]
+    # Los bloques deben ser múltiplos del mayor factor
+    _maximo = factores[-1] if factores else 1
+    _bloque = int(np.ceil(datos_por_bloque / _maximo)) * _maximo
+    _hash = hashlib.sha1()
+    posicion = 0
+    for bloque in lee_bin_dt_por_bloques(nombre, _bloque, n_datos):
+        _hash.update(bloque.tobytes())
+        _nivel = bloque.astype('uint64')
+        for factor, nivel in zip(factores, niveles):
+            _n = len(_nivel) // 2
+            _nivel = _nivel[0:2*_n:2] + _nivel[1:2*_n:2]
+            _inicio = posicion // factor
+            nivel[_inicio:_inicio + _n] = _nivel
+        posicion += len(bloque)
+    for nivel in niveles:
+        nivel.flush()
+    del niveles
+
+    _estado = os.stat(nombre)
+    indice = {'archivo': os.path.basename(nombre),
+              'sha1': _hash.hexdigest(),
+              'tamano': _estado.st_size,
+              'mtime': _estado.st_mtime,
+              'n_datos': int(n_datos),
+              'dt': dt,
+              'factores': factores,
+              }
+    with open(os.path.join(carpeta, 'indice.json'), 'w') as f:
+        json.dump(indice, f, indent=2)
+    return indice
+
+
+def lee_indice_piramide(nombre):
+    """
+    Índice de la pirámide de `nombre` si existe y corresponde a sus datos
+
+    Si el tamaño y la fecha de modificación del archivo coinciden con los del
+    índice no se vuelve a calcular el hash. Si no, se recalcula y se compara.
+
+    Resultados
+    ----------
+        indice : dict o None
+            None si no hay pirámide o si no corresponde a los datos
+    """
+
+    _nombre_indice = os.path.join(carpeta_piramide(nombre), 'indice.json')
+    if not os.path.exists(_nombre_indice):
+        return None
+    with open(_nombre_indice, 'r') as f:
+        indice = json.load(f)
+    _estado = os.stat(nombre)
+    if _estado.st_size == indice['tamano'] and \
+       _estado.st_mtime == indice['mtime']:
+        return indice
+    if hash_datos_bin(nombre) != indice['sha1']:
+        print('El archivo {} cambió, se reconstruye la pirámide'.format(nombre))
+        return None
+    # Mismos datos: se actualiza la fecha para no volver a calcular el hash
+    indice['mtime'] = _estado.st_mtime
+    indice['tamano'] = _estado.st_size
+    with open(_nombre_indice, 'w') as f:
+        json.dump(indice, f, indent=2)
+    return indice
+
+
+def nivel_para_agrupar(factores, n_datos):
+    """
+    Mayor factor de la pirámide que divide a n_datos (1 si ninguno)
+
+    >>> nivel_para_agrupar([2, 4, 8, 16], 24)
+    8
+    >>> nivel_para_agrupar([2, 4, 8, 16], 5)
+    1
+    """
+
+    _divisores = [factor for factor in factores if n_datos % factor == 0]
+    return max(_divisores, default=1)
+
+
+def agrupa_datos_piramide(nombre, n_datos=1, tipo='cps'):
+    """
+    Igual que `agrupa_datos` pero leyendo la pirámide del archivo .bin
+
+    Si la pirámide no existe (o no corresponde a los datos del archivo) se
+    construye. Los datos agrupados se obtienen del mayor nivel 2**k que
+    divide a n_datos, agrupando de a n_datos / 2**k datos de ese nivel. Las
+    sumas se hacen con enteros de 64 bits.
+
+    Parametros
+    ----------
+        nombre : string
+            Camino y nombre del archivo .bin
+        n_datos : entero
+            Número de intervalos base que se agruparán
+        tipo : strings ('dt', 'cps', 'promedio')
+            Igual que en `agrupa_datos`
+
+    Resultados
+    ----------
+        datos_agrupados : numpy array
+        dt_agrupado : flotante
+            Sólo si tipo es 'cps' o 'promedio' (como en `agrupa_datos`)
+    """
+
+    indice = lee_indice_piramide(nombre)
+    if indice is None:
+        indice = construye_piramide(nombre)
+    dt = indice['dt']
+    if (tipo in ['cps', 'promedio']) and dt is None:
+        raise ValueError('Falta especificar el dt')
+
+    if n_datos == 1:
+        # Igual que `agrupa_datos`, los datos se devuelven sin normalizar
+        datos, _ = read_bin_dt(nombre)
+        return datos if dt is None else (datos, dt)
+
+    factor = nivel_para_agrupar(indice['factores'], n_datos)
+    if factor == 1:
+        # Sin copiar todo el archivo: sólo se leen los datos al agruparlos
+        nivel, _ = read_bin_dt_mmap(nombre)
+    else:
+        nivel = np.load(os.path.join(carpeta_piramide(nombre),
+                                     'nivel_{}.npy'.format(factor)),
+                        mmap_mode='r')
+    print('Se agrupan {} intervalos base (nivel {} de la pirámide)'.format(
+          n_datos, factor))
+    _resto = n_datos // factor
+    _partes = len(nivel) // _resto
+    datos_agrupados = np.asarray(nivel[0:_partes * _resto]).reshape(
+                          _partes, _resto).sum(axis=1, dtype='uint64')
+
+    if tipo == 'dt':
+        return datos_agrupados
+    dt_agrupado = dt * n_datos
+    if tipo == 'cps':
+        return datos_agrupados / dt_agrupado, dt_agrupado
+    elif tipo == 'promedio':
+        return datos_agrupados / n_datos, dt_agrupado
+
+
+if __name__ == '__main__':
+
+    nombre = '../datos/nucleo_01.D1.bin'
+    # La primera vez se construye la pirámide, luego se lee directamente
+    for n_datos in [1000, 5000, 2**16]:
+        datos, dt_agrupado = agrupa_datos_piramide(nombre, n_datos)
+        print(dt_agrupado, len(datos))
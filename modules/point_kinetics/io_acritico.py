@@ -1,6 +1,7 @@
 #! /usr/bin/env python3
 
 import numpy as np
+import os
 
 def read_acritico(filename):
     '''
@@ -61,3 +62,58 @@ def read_acritico(filename):
         print('Se produjo un error inseperado al abrir/leer el archivo'
               + filename)
         sys.exit()
+
+
+def read_acritico_mmap(filename, inicio=0, n_datos=None):
+    '''
+    Igual que `read_acritico` pero sin leer los datos (np.memmap)
+
+    Sólo se lee el encabezado. Los datos se devuelven como una vista de sólo
+    lectura del archivo ('>u4'), por lo que se puede abrir una adquisición
+    grande o leer sólo un tramo sin cargarla completa en memoria.
+
+    Parameters
+    ----------
+
+    filename : string
+        Nombre del archivo que se quiere leer
+    inicio : int
+        Primer dato que se quiere leer (el mismo índice que en `read_acritico`)
+    n_datos : int, opcional
+        Cantidad de datos que se quieren leer. Por defecto hasta el final.
+
+    Returns
+    -------
+
+    data: numpy memmap
+        Datos leidos
+    t: numpy array
+        Vector temporal asociado a 'data' (comienza en inicio * dt)
+    dt: float
+        dt utilizado en la adquisición
+    header: list of strings
+        Encabezado el archivo
+
+    '''
+
+    dt_dato = np.dtype('>u4')
+    header = []
+    with open(filename, 'rb') as f:
+        for i in range(10):
+            header.append(f.readline().rstrip().decode("latin1"))
+        # El primer dato se descarta
+        offset = f.tell() + dt_dato.itemsize
+    dt = float(header[5].rsplit(':')[-1])
+    _total = max((os.path.getsize(filename) - offset) // dt_dato.itemsize, 0)
+    inicio = min(max(inicio, 0), _total)
+    if n_datos is None:
+        n_datos = _total - inicio
+    n_datos = min(n_datos, _total - inicio)
+    if n_datos > 0:
+        data = np.memmap(filename, dtype=dt_dato, mode='r',
+                         offset=offset + inicio * dt_dato.itemsize,
+                         shape=(n_datos,))
+    else:
+        data = np.empty(0, dtype=dt_dato)
+    t = dt * np.arange(inicio, inicio + len(data))
+    return data, t, dt, header
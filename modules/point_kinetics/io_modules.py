@@ -28,11 +28,18 @@ def _lee_dt_encabezado(encabezado, _tipo_datos):
     return dt, _num_col
 
 
-def lee_reactimetro(nombre):
+def _lee_encabezado_reactimetro(f, nombre):
     """
-    Read data file generated by Multi-Reactimeter
+    Lee el encabezado de un archivo del Multi-Reactimeter
 
-    TODO
+    Deja al archivo `f` posicionado en el primer dato.
+
+    Resultados
+    ----------
+        encabezado : lista de bytes
+        dt : float
+        _num_col : int
+            Cantidad de columnas de datos
     """
 
     # Se fija el tipo de señal que se quiere leer (AI o CT)
@@ -47,14 +54,25 @@ def lee_reactimetro(nombre):
         print('Se sale')
         quit()
 
+    # Lectura del encabezado
+    encabezado = []
+    for _ in range(_lineas_encabezado):
+        encabezado.append(f.readline().rstrip())
+    # Obtención del dt
+    dt, _num_col = _lee_dt_encabezado(encabezado, _tipo_datos)
+    return encabezado, dt, _num_col
+
+
+def lee_reactimetro(nombre):
+    """
+    Read data file generated by Multi-Reactimeter
+
+    TODO
+    """
+
     # Se lee el archivo
     with open(nombre, 'rb') as f:
-        # Lectura del encabezado
-        encabezado = []
-        for _ in range(_lineas_encabezado):
-            encabezado.append(f.readline().rstrip())
-        # Obtención del dt
-        dt, _num_col = _lee_dt_encabezado(encabezado, _tipo_datos)
+        encabezado, dt, _num_col = _lee_encabezado_reactimetro(f, nombre)
         # Definición del tipo de dato que se leerá
         if _num_col == 3:
             df = np.dtype([('>f8', '>f8', '>f8')])
@@ -78,5 +96,51 @@ def lee_reactimetro(nombre):
     return n, rho, t, sdn, dt, encabezado
 
 
+def lee_reactimetro_mmap(nombre, inicio=0, n_datos=None):
+    """
+    Igual que `lee_reactimetro` pero sin leer los datos (np.memmap)
+
+    Sólo se lee el encabezado. Cada columna se devuelve como una vista de
+    sólo lectura del archivo ('>f8', sin copiar ni convertir los datos), por
+    lo que se puede abrir una adquisición grande o leer sólo un tramo.
+
+    Parametros
+    ----------
+        nombre : string
+            Archivo AI o CT del Multi-Reactimeter
+        inicio : int
+            Primer dato que se quiere leer
+        n_datos : int, opcional
+            Cantidad de datos que se quieren leer. Por defecto hasta el final.
+
+    Resultados
+    ----------
+        n, rho, t, sdn, dt, encabezado :
+            Igual que en `lee_reactimetro`. El vector temporal comienza en
+            inicio * dt.
+    """
+
+    with open(nombre, 'rb') as f:
+        encabezado, dt, _num_col = _lee_encabezado_reactimetro(f, nombre)
+        offset = f.tell()
+    _bytes_fila = _num_col * np.dtype('>f8').itemsize
+    _total = (os.path.getsize(nombre) - offset) // _bytes_fila
+    inicio = min(max(inicio, 0), _total)
+    if n_datos is None:
+        n_datos = _total - inicio
+    n_datos = min(n_datos, _total - inicio)
+    if n_datos > 0:
+        _data = np.memmap(nombre, dtype='>f8', mode='r',
+                          offset=offset + inicio * _bytes_fila,
+                          shape=(n_datos, _num_col))
+    else:
+        _data = np.empty((0, _num_col), dtype='>f8')
+    n = _data[:, 0]
+    rho = _data[:, 1]
+    sdn = _data[:, 2] if _num_col == 3 else None
+    t = dt * np.arange(inicio, inicio + n_datos)
+    return n, rho, t, sdn, dt, encabezado
+
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+"""
+Puntos de control para los procesamientos largos
+
+Los resultados de las historias (o de los detectores) ya procesados se van
+guardando en una carpeta temporal. Cada punto de control se identifica con el
+hash de los datos de entrada y de los parámetros del cálculo, por lo que al
+volver a correr el mismo procesamiento (por ejemplo luego de que se cortó por
+límite de tiempo) se leen los resultados guardados y sólo se procesa lo que
+falta. Si cambian los datos, algún parámetro o el código de la función que
+procesa cada historia el hash es distinto y se empieza de cero.
+
+Se usa pasando la carpeta a `metodo_alfa_feynman(..., punto_control=carpeta)`
+o a `alfa_rossi_procesamiento(..., punto_control=carpeta)`. Los archivos no
+se borran al terminar: la carpeta se puede eliminar cuando ya no se necesite.
+"""
+
+import numpy as np
+import hashlib
+import inspect
+import glob
+import os
+
+
+# Se incluye en todos los hash. Cambiarla invalida los puntos de control
+# existentes (por ejemplo si cambia el formato de lo que se guarda).
+VERSION_PUNTO_CONTROL = 2
+
+
+def huella_codigo(funcion):
+    """
+    Huella (bytes) del código de una función
+
+    Es el contenido del archivo donde está definida, por lo que cualquier
+    cambio en ese módulo (también en las funciones auxiliares que usa) cambia
+    la huella. Si no se encuentra el archivo se usa el bytecode.
+    """
+
+    try:
+        with open(inspect.getsourcefile(funcion), 'rb') as f:
+            return f.read()
+    except (TypeError, OSError):
+        _codigo = getattr(funcion, '__code__', None)
+        return _codigo.co_code if _codigo is not None else b''
+
+
+def hash_argumentos(*partes):
+    """
+    Hash (sha1) de los datos y parámetros de un cálculo
+
+    Los numpy array se incluyen con sus datos, dtype y forma (no con `repr`,
+    que los trunca). Las listas y tuplas se recorren elemento a elemento, las
+    funciones con su nombre y la huella de su código (`huella_codigo`) y el
+    resto de los objetos se incluye con `repr`.
+
+    >>> hash_argumentos(np.arange(3), (5, 'var')) == \\
+    ...     hash_argumentos(np.arange(3), (5, 'var'))
+    True
+    >>> hash_argumentos(np.arange(3)) == hash_argumentos(np.arange(4))
+    False
+    """
+
+    _hash = hashlib.sha1()
+    _hash.update('v{}'.format(VERSION_PUNTO_CONTROL).encode())
+
+    def _agrega(parte):
+        if isinstance(parte, np.ndarray):
+            _hash.update('{}{}'.format(parte.dtype.str, parte.shape).encode())
+            _hash.update(np.ascontiguousarray(parte).tobytes())
+        elif isinstance(parte, (list, tuple)):
+            _hash.update('{}{}['.format(type(parte).__name__,
+                                        len(parte)).encode())
+            for elemento in parte:
+                _agrega(elemento)
+            _hash.update(b']')
+        elif callable(parte):
+            _hash.update('{}.{}'.format(parte.__module__,
+                                        parte.__qualname__).encode())
+            _hash.update(huella_codigo(parte))
+        else:
+            _hash.update(repr(parte).encode())
+
+    for parte in partes:
+        _agrega(parte)
+    return _hash.hexdigest()
+
+
+def nombre_punto_control(carpeta, clave):
+    """ Archivo del punto de control `clave` """
+    return os.path.join(carpeta, clave + '.npz')
+
+
+def guarda_punto_control(carpeta, clave, **arrays):
+    """
+    Guarda los arrays de un punto de control
+
+    Primero se escribe un archivo temporal que luego se renombra, para que
+    un corte durante la escritura no deje un punto de control incompleto.
+    Los arrays tienen que ser numéricos: se leen sin pickle.
+    """
+
+    if not os.path.exists(carpeta): os.makedirs(carpeta)
+    nombre = nombre_punto_control(carpeta, clave)
+    _temporal = nombre + '.tmp.npz'
+    np.savez(_temporal, **arrays)
+    os.replace(_temporal, nombre)
+
+
+def carga_punto_control(carpeta, clave):
+    """
+    Lee un punto de control
+
+    Resultados
+    ----------
+        arrays : dict o None
+            Arrays guardados con `guarda_punto_control`. None si no existe.
+    """
+
+    nombre = nombre_punto_control(carpeta, clave)
+    if not os.path.exists(nombre):
+        return None
+    # Sin pickle: un archivo ajeno en la carpeta no puede ejecutar código
+    with np.load(nombre) as f:
+        return {clave_array: f[clave_array] for clave_array in f.files}
+
+
+def guarda_historias(carpeta, clave, indices, filas):
+    """
+    Guarda los resultados de un grupo de historias
+
+    Cada grupo va a un archivo distinto (`clave`_`primer índice`.npz), por lo
+    que sólo se escriben sus filas y no toda la matriz de resultados.
+
+    Parametros
+    ----------
+        carpeta, clave : string
+            Ver `guarda_punto_control`
+        indices : numpy array (int)
+            Historias del grupo
+        filas : numpy array
+            Matriz de (len(indices) x largo_salida) con sus resultados
+    """
+
+    guarda_punto_control(carpeta, '{}_{}'.format(clave, indices[0]),
+                         indices=np.asarray(indices), filas=filas)
+
+
+def historias_pendientes(carpeta, clave, numero_de_historias, largo_salida):
+    """
+    Resultados guardados de las historias ya procesadas
+
+    Parametros
+    ----------
+        carpeta, clave : string
+            Ver `guarda_punto_control`
+        numero_de_historias, largo_salida : entero
+            Forma de la matriz de resultados
+
+    Resultados
+    ----------
+        resultado : numpy array
+            Matriz de (numero_de_historias x largo_salida) con los resultados
+            guardados con `guarda_historias` (cero en las historias que
+            faltan)
+        hechas : numpy array (bool)
+            Historias ya procesadas
+    """
+
+    resultado = np.zeros((numero_de_historias, largo_salida))
+    hechas = np.zeros(numero_de_historias, dtype=bool)
+    for nombre in glob.glob(os.path.join(carpeta, clave + '_*.npz')):
+        if nombre.endswith('.tmp.npz'):
+            continue
+        guardado = carga_punto_control(
+            carpeta, os.path.basename(nombre)[:-len('.npz')])
+        _indices = guardado['indices']
+        if guardado['filas'].shape != (len(_indices), largo_salida) or \
+           np.any(_indices >= numero_de_historias):
+            continue
+        resultado[_indices] = guardado['filas']
+        hechas[_indices] = True
+    if np.any(hechas):
+        print('Se retoma el punto de control: {} de {} historias '
+              'procesadas'.format(np.count_nonzero(hechas),
+                                  numero_de_historias))
+    return resultado, hechas
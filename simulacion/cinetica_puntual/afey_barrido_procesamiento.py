@@ -8,7 +8,8 @@ sys.path.append('/home/pablo/CinePy')
 
 from modules.alfa_rossi_preprocesamiento import alfa_rossi_preprocesamiento
 from modules.estadistica import timestamp_to_timewindow
-from modules.alfa_feynman_procesamiento import metodo_alfa_feynman
+from modules.alfa_feynman_procesamiento import barrido_alfa_feynman
+from modules.ejecutor import Ejecutor
 
 
 if __name__ == '__main__':
@@ -49,17 +50,17 @@ if __name__ == '__main__':
                'var_paralelo_mca',
                 ]
 
-    # Cálculos para cada dt_maximo
-    for dt_maximo in dt_maximos:
-        # Parámetros extras para el cálculo mca y choice
-        extra = {'skip_mca': 0,
-                 'method_mca':'A_over_k',
-                 'fraction': 0.25,
-                 'corr_time': dt_maximo*2,
-                 'carpeta_resultados': "barrido/{:.2e}".format(dt_maximo),
-                }
+    # Parámetros extras para el cálculo mca, choice y skip
+    extra = {'skip_mca': 0,
+             'method_mca':'A_over_k',
+             'fraction': 0.25,
+             'corr_time': lambda dt_maximo: dt_maximo*2,
+             'carpeta_resultados': "barrido/{:.2e}",
+            }
+    # Cada cálculo se hace una sola vez para el mayor dt_maximo y el resto
+    # del barrido se obtiene seleccionando los T_i (se usa el mismo pool)
+    with Ejecutor('procesos') as ejecutor:
         for calculo in calculos:
-            Y_historias = metodo_alfa_feynman(leidos, numero_de_historias,
-                                              dt_maximo, calculo, nombres,
-                                              **extra)
-
+            Y_barrido = barrido_alfa_feynman(leidos, numero_de_historias,
+                                             dt_maximos, calculo, nombres,
+                                             executor=ejecutor, **extra)
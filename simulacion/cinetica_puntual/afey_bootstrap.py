@@ -7,15 +7,16 @@ import os
 import sys
 sys.path.append('/home/pablo/CinePy')
 
-from modules.io_modules import lee_fey
 from modules.alfa_feynman_analisis import teo_variance_berglof, grafica_afey, \
-                                          ajuste_afey_nldtime, ajuste_afey, \
-                                          grafica_historias_afey, lee_Nk, \
+                                          ajuste_afey_nldtime, \
+                                          grafica_historias_afey, \
                                           ajuste_afey_2exp, ajuste_afey_3exp, \
                                           ajuste_afey_delayed, \
                                           ajuste_afey_2exp_delayed, \
                                           teo_variance_berglof_exacta, \
-                                          teo_variance_pacilio
+                                          teo_variance_pacilio, \
+                                          bootstrap_afey
+from modules.ejecutor import Ejecutor
 
 
 if __name__ == '__main__':
@@ -37,30 +38,16 @@ if __name__ == '__main__':
     # Camino absoluto del archivo que se quiere leer
     abs_nombre = os.path.join(script_dir, nombre)
 
-    np.random.seed(1)
-    params = []
     if True:
-        for i in range(N_bs):
-            tau, Y, std_Y, num_hist, tasas = lee_fey(abs_nombre)
-
-            Nk = lee_Nk(nombre.rstrip('fey') + 'Nk')
-            data_size = np.size(tau)
-            ind_bs = np.random.randint(0, data_size, size=data_size)
-            tau_bs = tau[ind_bs]
-            Y_bs = Y[ind_bs]
-            std_Y_bs = std_Y[ind_bs]
-
-            _, val, teo = ajuste_afey(tau_bs, Y_bs, std_Y_bs, [500, 1, 0],
-                                      vary=[1, 1, 0], verbose=False,
-                                      plot=False, conf_int=False, Nk=Nk)
-            params.append(val)
-
-        alfas, efis = [], []
-        for param in params:
-            alfas.append(param[0].n)
-            efis.append(param[1].n)
-        alfas = np.asarray(alfas)
-        efis = np.asarray(efis)
+        # Se remuestrean las historias del archivo .dat (se lee una vez) y
+        # los ajustes se hacen en paralelo
+        nombre_dat = abs_nombre.rsplit('.', 1)[0] + '.dat'
+        with Ejecutor('procesos') as ejecutor:
+            alfas, efis, cov = bootstrap_afey(nombre_dat, N_bs, [500, 1, 0],
+                                              vary=[1, 1, 0], semilla=1,
+                                              executor=ejecutor)
+        print('Covarianza entre alfa y eficiencia:')
+        print(cov)
 
         np.save('alfas', alfas)
         np.save('efis', efis)
@@ -8,14 +8,16 @@ import sys
 sys.path.append('../')
 
 from modules.estadistica import agrupa_datos
-from modules.io_modules import lee_bin_datos_dt
+from modules.io_modules import lee_bin_datos_dt, cantidad_datos_bin, \
+                               lee_dt_encabezado
+from modules.piramide_cuentas import agrupa_datos_piramide
 
 import seaborn as sns
 sns.set()
 plt.style.use('paper')
 
 
-def grafica_datos_agrupados(nombres, int_agrupar=None):
+def grafica_datos_agrupados(nombres, int_agrupar=None, piramide=False):
     """
     Grafica los datos de los archivos adquiridos
 
@@ -31,10 +33,20 @@ def grafica_datos_agrupados(nombres, int_agrupar=None):
         se calcula de tal manera de obetner un dt_agrupado de 1 seg
         (y el gráfico será la tasa de cuentas en cps)
         Si se da una lista, se usan distintos intervalos para cada archivo
+    piramide : bool
+        Si es True se usa la pirámide de cuentas de cada archivo (ver
+        `piramide_cuentas.py`) en lugar de leer y agrupar todos los datos
 
 
     """
-    _results = lee_bin_datos_dt(nombres)
+    if piramide:
+        # Sólo se leen los encabezados
+        _results = []
+        for nombre in nombres:
+            _, header, _ = cantidad_datos_bin(nombre)
+            _results.append((None, lee_dt_encabezado(header)))
+    else:
+        _results = lee_bin_datos_dt(nombres)
 
     def _define_int_agrupar():
         """ Define los intervalos a agrupar en base al dado en el input """
@@ -64,7 +76,12 @@ def grafica_datos_agrupados(nombres, int_agrupar=None):
     for j, result in enumerate(_results):
         dato = result[0]
         dt_base = result[1]
-        _data, dt_agrupado = agrupa_datos(dato, int_agrupar_it[j], dt_base)
+        if piramide:
+            _data, dt_agrupado = agrupa_datos_piramide(nombres[j],
+                                                       int_agrupar_it[j])
+        else:
+            _data, dt_agrupado = agrupa_datos(dato, int_agrupar_it[j],
+                                              dt_base)
         datos_agrupados.append(_data)
         # Construyo vector temporal
         dt_max = dt_agrupado * len(_data)
@@ -114,5 +131,7 @@ if __name__ == '__main__':
     # ---------------------------------------------------------------------------------
 
     grafica_datos_agrupados(nombres)
+    # Con la pirámide de cuentas (la primera vez se construye)
+    # grafica_datos_agrupados(nombres, int_agrupar, piramide=True)
     # grafica_datos_agrupados(nombres, [1000, 2000])
     # grafica_datos_agrupados(nombres, int_agrupar)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+"""
+Script para verificar que alfa-Feynman leyendo los datos de a bloques
+(`metodo_alfa_feynman_bloques`) coincida con el cálculo con todos los datos
+en memoria.
+"""
+
+import numpy as np
+import tempfile
+import os
+import sys
+sys.path.append('../')
+
+from modules.alfa_feynman_bloques import metodo_alfa_feynman_bloques
+from modules.alfa_feynman_procesamiento import calcula_alfa_feynman
+
+
+def escribe_bin(nombre, datos, dt):
+    """ Escribe un archivo con el formato de "intervaltime_MC" """
+    encabezado = ['Nombre: prueba', '-', '-', '-', 'dt: {}'.format(dt), '-',
+                  '-']
+    with open(nombre, 'wb') as f:
+        for linea in encabezado:
+            f.write((linea + '\n').encode())
+        # El primer dato se descarta al leer
+        np.concatenate(([0], datos)).astype('>u4').tofile(f)
+
+
+rng = np.random.default_rng(3)
+dt = 1e-3
+numero_de_historias = 7
+dt_maximo = 40e-3
+datos = rng.poisson(3.0, size=50013)
+
+with tempfile.TemporaryDirectory() as carpeta:
+    nombre = os.path.join(carpeta, 'prueba.D1.bin')
+    escribe_bin(nombre, datos, dt)
+    Y_bloques = metodo_alfa_feynman_bloques([nombre], numero_de_historias,
+                                            dt_maximo, 'var_bloques',
+                                            datos_por_bloque=997,
+                                            carpeta_resultados=carpeta)
+
+Y_ref = calcula_alfa_feynman(datos.astype('>u4'), numero_de_historias, dt,
+                             dt_maximo)
+assert np.allclose(Y_bloques[0], Y_ref, rtol=1e-10, atol=1e-12), \
+    'El cálculo por bloques no coincide con la referencia'
+
+print('Todas las comparaciones resultaron correctas')
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+"""
+Script para verificar el bootstrap de alfa-Feynman: que
+`remuestrea_historias` promedie las historias elegidas con reposición y que
+con la misma semilla `remuestrea_historias` y `bootstrap_afey` den el mismo
+resultado. También que `bootstrap_afey` funcione sin el archivo de valores
+teóricos de la simulación.
+"""
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import tempfile
+import os
+import sys
+sys.path.append('../')
+
+from modules.ejecutor import Ejecutor
+from modules.funciones import alfa_feynman_lin_dead_time
+from modules.alfa_feynman_procesamiento import escribe_resultados_afey
+from modules.alfa_feynman_analisis import remuestrea_historias, bootstrap_afey
+
+
+rng = np.random.default_rng(13)
+dt = 1e-3
+tau = dt * np.arange(1, 51)
+Y = alfa_feynman_lin_dead_time(tau, 300, 2, 0) + \
+    rng.normal(scale=0.3, size=(200, tau.size))
+
+# Con la misma semilla se eligen las mismas historias
+Y_bs, std_Y_bs = remuestrea_historias(Y.T, 30, semilla=5)
+_Y_bs, _std_Y_bs = remuestrea_historias(Y.T, 30, semilla=5)
+assert np.array_equal(Y_bs, _Y_bs) and np.array_equal(std_Y_bs, _std_Y_bs), \
+    'remuestrea_historias no es reproducible'
+assert not np.array_equal(Y_bs, remuestrea_historias(Y.T, 30, semilla=6)[0]), \
+    'Con otra semilla se obtuvo el mismo remuestreo'
+# Coincide con copiar las historias elegidas
+_elegidas = np.random.default_rng(5).integers(0, 200, size=(30, 200))
+assert np.allclose(Y_bs, Y[_elegidas].mean(axis=1)), \
+    'No coincide el promedio de las historias elegidas'
+assert np.allclose(std_Y_bs,
+                   Y[_elegidas].std(axis=1, ddof=1) / np.sqrt(200)), \
+    'No coincide el desvío de las historias elegidas'
+
+val_teoricos = {'D_p': 0.8, 'Lambda': 5e-5, 'bet': 0.0075,
+                'ap_exacto': 300.0, 'efi': 1e-3, 'Rf': 1e3}
+with tempfile.TemporaryDirectory() as carpeta, Ejecutor('serie') as ejecutor:
+    escribe_resultados_afey([Y], dt, 1000 // np.arange(1, 51), 50,
+                            'var_paralelo', 200, [(2.0, 0.0)],
+                            ['prueba.D1.bin'], carpeta)
+    nombre = os.path.join(carpeta, 'prueba.D1_var.dat')
+    resultados = [bootstrap_afey(nombre, 20, [400, 1, 0], semilla=3,
+                                 val_teoricos=val_teoricos,
+                                 executor=ejecutor) for _ in range(2)]
+    # Sin el archivo de valores teóricos sólo se obtienen los alfa
+    alfas, eficiencias, covarianza = bootstrap_afey(
+        nombre, 20, [400, 1, 0], semilla=3,
+        val_teoricos=os.path.join(carpeta, 'no_existe.dat'),
+        executor=ejecutor)
+
+for _res, _res_2 in zip(*resultados):
+    assert np.array_equal(_res, _res_2), 'bootstrap_afey no es reproducible'
+assert np.all(np.isfinite(resultados[0][1])), 'No se calcularon eficiencias'
+assert np.array_equal(alfas, resultados[0][0]), \
+    'Los alfa dependen de los valores teóricos'
+assert np.all(np.isnan(eficiencias)) and np.ndim(covarianza) == 0, \
+    'Sin valores teóricos no debería haber eficiencias'
+
+print('Todas las comparaciones resultaron correctas')
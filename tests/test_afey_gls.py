@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+"""
+Script para verificar el ajuste de alfa-Feynman por cuadrados mínimos
+generalizados: `covarianza_Y` contra np.cov, la lectura y escritura del
+archivo .covY.npy y que con una covarianza diagonal se obtenga el mismo
+ajuste que con std_Y.
+"""
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import tempfile
+import os
+import sys
+sys.path.append('../')
+
+from scipy.linalg import LinAlgError
+from modules.io_modules import lee_covarianza_Y
+from modules.funciones import alfa_feynman_lin_dead_time
+from modules.alfa_feynman_procesamiento import covarianza_Y, \
+    escribe_covarianza_Y
+from modules.alfa_feynman_analisis import ajuste_afey_new, matriz_blanqueo
+
+
+rng = np.random.default_rng(20)
+Y_historias = rng.normal(size=(1000, 30)) + rng.normal(size=(1000, 1))
+cov_Y = covarianza_Y(Y_historias, historias_por_bloque=64)
+assert np.allclose(cov_Y, np.cov(Y_historias, rowvar=False) / 1000), \
+    'No coincide covarianza_Y con np.cov'
+
+with tempfile.TemporaryDirectory() as carpeta:
+    nombre = os.path.join(carpeta, 'prueba.D1.fey')
+    escribe_covarianza_Y([Y_historias], [nombre])
+    assert np.array_equal(lee_covarianza_Y(nombre),
+                          covarianza_Y(Y_historias)), \
+        'No coincide la covarianza leída con la grabada'
+
+# Con pocas historias no es definida positiva: se levanta una excepción
+try:
+    matriz_blanqueo(covarianza_Y(Y_historias[:10]))
+except LinAlgError:
+    pass
+else:
+    raise AssertionError('Se esperaba LinAlgError')
+matriz_blanqueo(covarianza_Y(Y_historias[:10]), contraccion=0.5)
+
+# Con cov_Y diagonal, GLS es el mismo ajuste que con std_Y
+tau = np.linspace(1e-3, 50e-3, 50)
+std_Y = 0.01 * (1 + tau / tau[-1])
+Y = alfa_feynman_lin_dead_time(tau, 400, 1.5, 0) + \
+    rng.normal(scale=std_Y)
+opciones = {'verbose': False, 'plot': False, 'conf_int': False}
+result = ajuste_afey_new(tau, Y, std_Y, Y_ini=[300, 1, 0], vary=[1, 1, 0],
+                         **opciones)
+result_gls = ajuste_afey_new(tau, Y, std_Y, Y_ini=[300, 1, 0],
+                             vary=[1, 1, 0], cov_Y=np.diag(std_Y**2),
+                             **opciones)
+for nombre in result.var_names:
+    assert np.isclose(result.params[nombre].value,
+                      result_gls.params[nombre].value, rtol=1e-8), \
+        'No coincide el ajuste con cov_Y diagonal'
+    assert np.isclose(result.params[nombre].stderr,
+                      result_gls.params[nombre].stderr, rtol=1e-6), \
+        'No coincide la incerteza con cov_Y diagonal'
+assert np.isclose(result.chisqr, result_gls.chisqr, rtol=1e-8), \
+    'No coincide chi cuadrado con cov_Y diagonal'
+
+print('Todas las comparaciones resultaron correctas')
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+"""
+Script para verificar que el archivo .h5 de alfa-Feynman tenga lo mismo que
+los archivos de texto y que `lee_historias_hdf5` devuelva las historias
+pedidas en el orden pedido (también desordenadas o repetidas).
+"""
+
+import numpy as np
+import tempfile
+import os
+import sys
+sys.path.append('../')
+
+from modules.io_modules import lee_historias_completas, lee_historias_hdf5
+from modules.alfa_feynman_procesamiento import escribe_resultados_afey
+
+
+rng = np.random.default_rng(11)
+Y = rng.normal(size=(300, 40))
+
+with tempfile.TemporaryDirectory() as carpeta:
+    escribe_resultados_afey([Y], 1e-3, 1000 // np.arange(1, 41), 40,
+                            'var_paralelo', 300, [(2.0, 0.1)],
+                            ['prueba.D1.bin'], carpeta, formato='ambos')
+    _base = os.path.join(carpeta, 'prueba.D1_var')
+    tau, datos, num_hist, tasas = lee_historias_completas(_base + '.dat')
+    tau_h5, datos_h5, num_hist_h5, tasas_h5 = \
+        lee_historias_completas(_base + '.h5')
+    pedidas = [250, 3, 17, 3, 0]
+    _, datos_pedidos, _, _ = lee_historias_hdf5(_base + '.h5', pedidas)
+    _, datos_slice, _, _ = lee_historias_hdf5(_base + '.h5', slice(10, 20))
+
+assert np.allclose(tau_h5, tau) and num_hist_h5 == num_hist, \
+    'No coincide el encabezado del .h5 con el del .dat'
+assert np.array_equal(datos_h5, Y.T) and np.allclose(datos, Y.T), \
+    'No coinciden las historias del .h5'
+assert np.array_equal(datos_pedidos, Y.T[:, pedidas]), \
+    'Las historias no se devuelven en el orden pedido'
+assert np.array_equal(datos_slice, Y.T[:, 10:20]), \
+    'No coinciden las historias leídas con un slice'
+
+print('Todas las comparaciones resultaron correctas')
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+"""
+Script para verificar que agregar nuevos datos con `agrega_alfa_feynman`
+coincida con procesar todas las historias juntas.
+"""
+
+import numpy as np
+import tempfile
+import os
+import sys
+sys.path.append('../')
+
+from modules.alfa_feynman_incremental import \
+    metodo_alfa_feynman_incremental, agrega_alfa_feynman
+from modules.alfa_feynman_procesamiento import calcula_alfa_feynman
+from modules.io_modules import lee_historias_completas
+
+
+rng = np.random.default_rng(5)
+dt = 1e-3
+dt_maximo = 40e-3
+datos_x_hist = 5000
+datos = rng.poisson(3.0, size=(2, 12 * datos_x_hist + 321)).astype('>u4')
+nombres = ['prueba.D1.bin', 'prueba.D2.bin']
+
+with tempfile.TemporaryDirectory() as carpeta:
+    # Primer segmento: 7 historias
+    leidos = [(dato[0:7 * datos_x_hist], dt) for dato in datos]
+    _, nombre_est = metodo_alfa_feynman_incremental(
+        leidos, 7, dt_maximo, 'var_paralelo', nombres,
+        carpeta_resultados=carpeta)
+    # Segundo segmento: 5 historias más (se descarta lo que sobra)
+    leidos_nuevos = [(dato[7 * datos_x_hist:], dt) for dato in datos]
+    Y_historias = agrega_alfa_feynman(leidos_nuevos, nombre_est)
+    _, _dat, _N, _ = lee_historias_completas(os.path.join(carpeta,
+                                                          'prueba.D1_var.dat'))
+
+for k in range(2):
+    Y_ref = calcula_alfa_feynman(datos[k][0:12 * datos_x_hist], 12, dt,
+                                 dt_maximo)
+    assert np.allclose(Y_historias[k], Y_ref, rtol=1e-10, atol=1e-12), \
+        'El cálculo incremental no coincide con la referencia'
+assert np.allclose(_dat, Y_historias[0].T), \
+    'El archivo .dat no coincide con el cálculo'
+assert _N == 12 and _dat.shape[1] == 12, \
+    'El archivo .dat no tiene todas las historias'
+
+print('Todas las comparaciones resultaron correctas')
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+"""
+Script para verificar que 'var_paralelo_solapado' sea insesgado con datos de
+Poisson (Y = 0) y que el archivo .Nk tenga la cantidad de intervalos
+contiguos de cada T_i (como 'var_paralelo'), mientras que la cantidad
+efectiva de muestras se graba en el archivo .Neff (y en el .h5).
+"""
+
+import numpy as np
+import tempfile
+import os
+import sys
+sys.path.append('../')
+
+from modules.ejecutor import Ejecutor
+from modules.io_modules import importa_h5py
+from modules.alfa_feynman_procesamiento import \
+    afey_varianza_paralelo_solapado, escribe_resultados_afey, \
+    muestras_efectivas_solapadas
+
+
+rng = np.random.default_rng(8)
+dt = 1e-3
+numero_de_historias = 400
+datos_x_hist = 1000
+leidos = [(rng.poisson(2.0, size=numero_de_historias * datos_x_hist)
+           .astype('>u4'), dt)]
+
+with Ejecutor('serie') as ejecutor:
+    Y_historias, dt_base, M_points, N_eff = afey_varianza_paralelo_solapado(
+        leidos, numero_de_historias, 50e-3, executor=ejecutor)
+
+indices = np.arange(1, 51)
+assert list(M_points) == list(datos_x_hist // indices), \
+    'M_points no es la cantidad de intervalos contiguos'
+assert np.array_equal(N_eff, muestras_efectivas_solapadas(datos_x_hist, 50)),\
+    'No se devolvió N_eff'
+assert N_eff[-1] > M_points[-1], \
+    'N_eff debería ser mayor que la cantidad de intervalos contiguos'
+
+# Para datos de Poisson Y = 0: el promedio entre historias tiene que ser
+# compatible con cero para todos los T_i
+Y = Y_historias[0]
+Y_media = np.mean(Y, axis=0)
+Y_std = np.std(Y, axis=0, ddof=1) / np.sqrt(numero_de_historias)
+assert np.all(np.abs(Y_media) < 4 * Y_std), 'El estimador está sesgado'
+# Sin la corrección (ddof=1) el sesgo en los T_i grandes es ~10 desvíos
+assert abs(np.mean(Y_media[-10:] / Y_std[-10:])) < 2, \
+    'El sesgo no está corregido en los T_i grandes'
+
+with tempfile.TemporaryDirectory() as carpeta:
+    escribe_resultados_afey(Y_historias, dt_base, M_points, 50,
+                            'var_paralelo_solapado', numero_de_historias,
+                            [(2.0, 0.0)], ['prueba.D1.bin'], carpeta,
+                            formato='ambos', N_eff=N_eff)
+    _base = os.path.join(carpeta, 'prueba.D1_var_solapado')
+    Nk = np.loadtxt(_base + '.Nk')
+    Neff = np.loadtxt(_base + '.Neff')
+    with importa_h5py().File(_base + '.h5', 'r') as f:
+        Nk_h5 = f['M_points'][:]
+        Neff_h5 = f['N_eff'][:]
+
+assert np.array_equal(Nk, datos_x_hist // indices), \
+    'El archivo .Nk no tiene la cantidad de intervalos contiguos'
+assert np.array_equal(Nk_h5, Nk), 'No coincide M_points en el .h5'
+assert np.allclose(Neff, N_eff, rtol=1e-6), 'El archivo .Neff no tiene N_eff'
+assert np.array_equal(Neff_h5, N_eff), 'No coincide N_eff en el .h5'
+
+print('Todas las comparaciones resultaron correctas')
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+"""
+Script para verificar alfa-Feynman con datos de timestamping: que
+`agrupamiento_historia_timestamp` coincida con agrupar las cuentas obtenidas
+con `timestamp_to_timewindow` (`agrupamiento_historia`), que no esté sesgado
+en los T_i con pocos intervalos y que los T_i sin dos intervalos completos se
+descarten en lugar de escribir NaN.
+"""
+
+import numpy as np
+import tempfile
+import sys
+sys.path.append('../')
+
+from modules.ejecutor import Ejecutor
+from modules.estadistica import timestamp_to_timewindow
+from modules.alfa_feynman_procesamiento import agrupamiento_historia
+from modules.alfa_feynman_timestamp import agrupamiento_historia_timestamp, \
+    metodo_alfa_feynman_timestamp
+
+
+rng = np.random.default_rng(9)
+dt = 1000
+historia = np.cumsum(rng.integers(0, 700, size=30000)).astype('int64')
+historia -= historia[0]
+
+# Con T_i múltiplos de dt tiene que dar lo mismo que agrupar las cuentas
+# en cada dt (el primer pulso es el origen y no se cuenta)
+cuentas, _ = timestamp_to_timewindow(historia[1:], dt, 'pulsos', 'pulsos', 1)
+Y_ref = agrupamiento_historia((cuentas, 60, len(cuentas)))
+Y_k = agrupamiento_historia_timestamp((historia, dt * np.arange(1, 61)))
+assert np.allclose(Y_k[0], Y_ref, rtol=1e-12, atol=1e-12), \
+    'No coincide con timestamp_to_timewindow + agrupamiento_historia'
+assert np.array_equal(Y_k[1], len(cuentas) // np.arange(1, 61)), \
+    'No coincide la cantidad de intervalos'
+
+# El primer pulso es el origen y no se cuenta: intervalos [0, 10) y
+# [10, 20) con 1 y 2 cuentas (contándolo serían 2 y 2, Y = -1)
+Y_k = agrupamiento_historia_timestamp((np.array([0, 1, 12, 13, 25]), [10]))
+assert np.isclose(Y_k[0, 0], 0.5 / 1.5 - 1) and Y_k[1, 0] == 2, \
+    'Se cuenta el pulso que define el origen'
+
+# Poisson con pocos intervalos por T_i: Y compatible con cero y sin NaN
+historias = [[np.cumsum(rng.exponential(1.0, size=200)) for _ in range(2000)]]
+for historia in historias[0]:
+    historia -= historia[0]
+T_i = np.array([10.0, 40.0, 60.0, 1e6])
+with tempfile.TemporaryDirectory() as carpeta, \
+        Ejecutor('serie') as ejecutor:
+    Y_historias = metodo_alfa_feynman_timestamp(historias, 1.0, T_i,
+                                                ['prueba.D1.txt'],
+                                                carpeta_resultados=carpeta,
+                                                executor=ejecutor)
+Y = Y_historias[0]
+assert Y.shape == (2000, 3), 'No se descartó el T_i sin intervalos'
+assert not np.any(np.isnan(Y)), 'Hay NaN en los resultados'
+_std = np.std(Y, axis=0, ddof=1) / np.sqrt(Y.shape[0])
+assert np.all(np.abs(np.mean(Y, axis=0)) < 4 * _std), \
+    'Y está sesgado en los T_i con pocos intervalos'
+
+print('Todas las comparaciones resultaron correctas')
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+"""
+Script para verificar que la técnica de agrupamiento basada en la suma
+acumulada (`agrupamiento_historia`) coincida con la implementación original,
+que hacía un reshape + sum de la historia completa para cada T_i.
+"""
+
+import numpy as np
+import sys
+sys.path.append('../')
+
+from modules.alfa_feynman_procesamiento import agrupamiento_historia, \
+                                               agrupamiento_historia_cov
+
+
+def agrupamiento_referencia(historia, maximos, datos_x_hist):
+    """ Implementación original con reshape + sum para cada T_i """
+    Y_k = []
+    for i in range(1, maximos+1):
+        _partes = datos_x_hist // i
+        _indice_exacto = _partes * i
+        _matriz = historia[0:_indice_exacto].reshape(_partes, i)
+        _intervalos = _matriz.sum(axis=1, dtype='uint32')
+        Y_k.append(np.var(_intervalos, ddof=1) / np.mean(_intervalos) - 1)
+    return Y_k
+
+
+rng = np.random.default_rng(1)
+datos_x_hist = 10007
+maximos = 97
+det1 = rng.poisson(3.0, size=datos_x_hist).astype('>u4')
+det2 = rng.poisson(5.0, size=datos_x_hist).astype('>u4')
+
+Y_ref = agrupamiento_referencia(det1, maximos, datos_x_hist)
+Y_acu = agrupamiento_historia((det1, maximos, datos_x_hist))
+assert np.allclose(Y_ref, Y_acu, rtol=1e-12, atol=1e-12), \
+    'La varianza no coincide con la referencia'
+
+Y1, Y2, _ = agrupamiento_historia_cov(((det1, det2), maximos, datos_x_hist))
+assert np.allclose(Y1, Y_ref, rtol=1e-12, atol=1e-12), \
+    'La covarianza (det1) no coincide con la referencia'
+assert np.allclose(Y2, agrupamiento_referencia(det2, maximos, datos_x_hist),
+                   rtol=1e-12, atol=1e-12), \
+    'La covarianza (det2) no coincide con la referencia'
+
+print('Todas las comparaciones resultaron correctas')
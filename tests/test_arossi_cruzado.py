@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+"""
+Script para verificar alfa-Rossi cruzado: que `arossi_cruzado_una_historia`
+dé lo mismo que recorrer cada trigger contando los pulsos del otro detector,
+y que `alfa_rossi_procesamiento(..., pares=...)` dé lo mismo que aplicarlo a
+cada historia separada con `separa_en_historias_comun`.
+"""
+
+import numpy as np
+import sys
+sys.path.append('../')
+
+from modules.ejecutor import Ejecutor
+from modules.alfa_rossi_preprocesamiento import separa_en_historias_comun
+from modules.alfa_rossi_procesamiento import arossi_cruzado_una_historia, \
+    alfa_rossi_procesamiento
+
+
+rng = np.random.default_rng(23)
+tb = 12.5e-9
+# Dos detectores con pulsos propios y algunos pulsos en común (correlación)
+_comunes = np.sort(rng.integers(0, 2**31, size=2000))
+datas = []
+for _ in range(2):
+    _propios = rng.integers(0, 2**31, size=8000)
+    _retardo = rng.integers(0, 4000, size=_comunes.size)
+    datas.append(np.sort(np.concatenate((_propios, _comunes + _retardo)))
+                 .astype('uint64'))
+datas[1] = datas[1].astype('uint32')
+
+historias = separa_en_historias_comun(datas, 10)
+for h1, h2 in zip(*historias):
+    assert h1.min() >= 0 and h2.min() >= 0, 'Historia con tiempos negativos'
+
+dt_s, dtmax_s = 1e-5, 4e-4
+dt, dtmax = dt_s / tb, dtmax_s / tb
+N_bin = int(np.rint(dtmax / dt))
+for trigs in ['compute', 'all']:
+    trig = historias[0][3].astype('int64')
+    cuentas = historias[1][3].astype('int64')
+    P, R, N, P_trigger = arossi_cruzado_una_historia(
+        historias[0][3], historias[1][3], dt_s, dtmax_s, tb, trigs)
+    # Recorriendo cada trigger
+    P_ref = []
+    for t in trig[:N]:
+        _dentro = cuentas[(cuentas >= t) & (cuentas < t + dtmax)]
+        P_ref.append(np.bincount(((_dentro - t) // dt).astype('int64'),
+                                 minlength=N_bin)[0:N_bin])
+    assert np.array_equal(P_trigger, np.asarray(P_ref)), \
+        'No coincide P_trigger'
+    assert np.allclose(P, np.mean(P_ref, axis=0) / dt_s / R[0]), \
+        'No coincide P_historia'
+    if trigs == 'compute':
+        assert trig[N - 1] + dtmax <= cuentas[-1] < trig[N] + dtmax, \
+            'No coincide la cantidad de triggers'
+
+with Ejecutor('serie') as ejecutor:
+    resultados = alfa_rossi_procesamiento(historias, dt_s, dtmax_s, tb,
+                                          executor=ejecutor, pares='todos')
+assert len(resultados) == 2, 'Se esperaban los pares D1D2 y D2D1'
+for resultado, (i, j) in zip(resultados, [(0, 1), (1, 0)]):
+    for k in range(10):
+        P, R, N, P_trigger = arossi_cruzado_una_historia(
+            historias[i][k], historias[j][k], dt_s, dtmax_s, tb)
+        assert np.allclose(resultado[k, 0], P) and resultado[k, 2] == N, \
+            'No coincide el procesamiento de los pares'
+        assert np.array_equal(resultado[k, 3], P_trigger), \
+            'No coincide P_trigger de los pares'
+
+print('Todas las comparaciones resultaron correctas')
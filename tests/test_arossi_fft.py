@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+"""
+Script para verificar alfa-Rossi mediante FFT: que `autocorrelacion_fft`
+coincida con la correlación directa, que metodo='fft' dé (dentro de la
+estadística) lo mismo que metodo='lags' y que metodo='auto' elija FFT a tasas
+de cuentas altas (salvo con trigs="all").
+"""
+
+import numpy as np
+import sys
+sys.path.append('../')
+
+from modules.ejecutor import Ejecutor
+from modules.estadistica import autocorrelacion_fft
+from modules.alfa_rossi_procesamiento import arossi_una_historia_I, \
+    elige_metodo, alfa_rossi_procesamiento
+
+
+rng = np.random.default_rng(25)
+tb = 12.5e-9
+
+cuentas = rng.poisson(3.0, size=5000)
+C = autocorrelacion_fft(cuentas, 40)
+C_ref = np.correlate(cuentas, cuentas, mode='full')[cuentas.size - 1:]
+assert np.array_equal(C, C_ref[:41]), 'No coincide la autocorrelación'
+
+# Pulsos de Poisson más pulsos correlacionados con retardo exponencial
+_t = np.cumsum(rng.exponential(1 / 5e4 / tb, size=200000))
+_sel = rng.random(_t.size) < 0.5
+data = np.sort(np.concatenate(
+    (_t, _t[_sel] + rng.exponential(2e-4 / tb, size=_sel.sum()))))
+data = data[data < _t[-1]].astype('uint64')
+
+dt_s, dtmax_s = 2e-5, 2e-3
+P_l, R_l, N_l = arossi_una_historia_I(data, dt_s, dtmax_s, tb,
+                                      save_trigs=False, metodo='lags')
+P_f, R_f, N_f = arossi_una_historia_I(data, dt_s, dtmax_s, tb,
+                                      save_trigs=False, metodo='fft')
+assert R_l == R_f and abs(N_l - N_f) < 10, 'No coinciden R o N_triggers'
+assert np.max(np.abs(P_f - P_l)) < 5e-3, 'No coincide P_historia'
+assert P_f[0] > 1.01 and abs(np.mean(P_f[-20:]) - 1) < 2e-3, \
+    'La normalización no es la esperada'
+
+# Con trigs="all" se usan todos los pulsos como triggers y no se normaliza
+P_l, R_l, N_l = arossi_una_historia_I(data, dt_s, dtmax_s, tb, trigs='all',
+                                      save_trigs=False, metodo='lags')
+P_f, R_f, N_f = arossi_una_historia_I(data, dt_s, dtmax_s, tb, trigs='all',
+                                      save_trigs=False, metodo='fft')
+assert R_f == (1, 0) and N_f == N_l == data.size - 1, \
+    'No se usaron todos los triggers con FFT'
+assert np.max(np.abs(P_f / P_l - 1)) < 5e-3, \
+    'No coincide P_historia con trigs="all"'
+P_a, _, _ = arossi_una_historia_I(data, dt_s, dtmax_s, tb, trigs='all',
+                                  save_trigs=False, metodo='auto')
+assert np.array_equal(P_a, P_l), 'Con trigs="all" se debe elegir "lags"'
+
+# A tasas altas se elige FFT, a tasas bajas se recorren los lags
+assert elige_metodo(data, dt_s / tb, dtmax_s / tb) == 'fft'
+assert elige_metodo(data[::200], dt_s / tb, dtmax_s / tb) == 'lags'
+
+historias = [[data[:150000] - data[0], data[150000:] - data[150000]]]
+with Ejecutor('serie') as ejecutor:
+    resultados = alfa_rossi_procesamiento(historias, dt_s, dtmax_s, tb,
+                                          save_trigs=False,
+                                          executor=ejecutor, metodo='auto')
+for k, historia in enumerate(historias[0]):
+    P, R, N = arossi_una_historia_I(historia, dt_s, dtmax_s, tb,
+                                    save_trigs=False, metodo='fft')
+    assert np.allclose(resultados[0][k, 0], P) and \
+        resultados[0][k, 2] == N, 'No coincide el procesamiento con FFT'
+
+print('Todas las comparaciones resultaron correctas')
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+"""
+Script para verificar que `arossi_una_historia_I` recorriendo los lags entre
+pulsos (metodo='lags') dé exactamente lo mismo que recorriendo cada trigger
+(metodo='triggers'), con trigs='compute' y trigs='all'. También que las sumas
+por bin de save_trigs='acumulado' coincidan con las de P_trigger.
+"""
+
+import numpy as np
+import sys
+sys.path.append('../')
+
+from modules.alfa_rossi_procesamiento import arossi_una_historia_I
+
+
+rng = np.random.default_rng(11)
+tb = 12.5e-9
+# Tiempos entre pulsos exponenciales, con algunos pulsos simultáneos
+_dif = rng.exponential(1 / 5e3 / tb, size=20000).astype('int64')
+_dif[::7] = 0
+data = np.cumsum(_dif).astype('uint64')
+
+for trigs in ['compute', 'all']:
+    for dt_s, dtmax_s in [(0.5e-3, 50e-3), (0.3e-3, 1e-3), (1e-5, 7.3e-4)]:
+        P_t, R_t, N_t, P_trig_t = arossi_una_historia_I(
+            data, dt_s, dtmax_s, tb, trigs, metodo='triggers')
+        P_l, R_l, N_l, P_trig_l = arossi_una_historia_I(
+            data, dt_s, dtmax_s, tb, trigs, metodo='lags')
+        assert np.array_equal(P_t, P_l), 'No coincide P_historia'
+        assert R_t == R_l and N_t == N_l, 'No coinciden R_historia o N'
+        assert np.array_equal(P_trig_t, P_trig_l), 'No coincide P_trigger'
+        P_s, _, _ = arossi_una_historia_I(data, dt_s, dtmax_s, tb, trigs,
+                                          save_trigs=False, metodo='lags')
+        assert np.array_equal(P_t, P_s), 'No coincide P_historia sin triggers'
+        # Sólo las sumas por bin y una muestra de triggers
+        P_a, _, _, (S1, S2, muestra) = arossi_una_historia_I(
+            data, dt_s, dtmax_s, tb, trigs, save_trigs='acumulado',
+            muestra_trigs=4, semilla=0)
+        assert np.array_equal(P_t, P_a), 'No coincide P_historia acumulado'
+        assert np.array_equal(S1, np.sum(P_trig_t, axis=0)) and \
+            np.array_equal(S2, np.sum(P_trig_t**2, axis=0)), \
+            'No coinciden las sumas por bin'
+        assert all(np.any(np.all(P_trig_t == fila, axis=1))
+                   for fila in muestra), 'La muestra no son triggers'
+
+print('Todas las comparaciones resultaron correctas')
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+"""
+Script para verificar el correlador multi-tau de alfa-Rossi: que
+`correlacion_multi_tau` cuente exactamente los pares de pulsos cuyos bines
+(de cada nivel) están separados k lugares, y que
+`alfa_rossi_procesamiento(..., multi_tau=...)` dé lo mismo que aplicar
+`arossi_multi_tau_una_historia` a cada historia. También que
+`arossi_1exp_multi_tau` (y `arossi_2exp_multi_tau`) sea el promedio pesado
+con el triángulo de cada punto y que los ajustes lo usen si se da `ancho`.
+"""
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import sys
+sys.path.append('../')
+
+from modules.ejecutor import Ejecutor
+from modules.alfa_rossi_procesamiento import lags_multi_tau, \
+    correlacion_multi_tau, arossi_multi_tau_una_historia, \
+    alfa_rossi_procesamiento
+from modules.funciones import arossi_1exp, arossi_1exp_multi_tau, \
+    arossi_2exp, arossi_2exp_multi_tau
+from modules.alfa_rossi_analisis import arossi_ajuste_1exp, \
+    arossi_ajuste_2exp
+
+
+rng = np.random.default_rng(24)
+tb = 12.5e-9
+dt_s, dtmax_s = 2e-6, 5e-4
+dt = dt_s / tb
+data = np.cumsum(rng.exponential(1 / 1e4 / tb, size=1500)).astype('uint64')
+
+# La grilla es continua y cubre hasta dtmax_s
+niveles, lags, tau = lags_multi_tau(dt_s, dtmax_s, 8)
+assert np.all(np.diff(tau) > 0) and tau[-1] <= dtmax_s < 2 * tau[-1], \
+    'La grilla de tau no es la esperada'
+
+G, N_triggers = correlacion_multi_tau(data, dt, niveles, lags)
+# Recorriendo todos los pares de pulsos
+for p, (nivel, k) in enumerate(zip(niveles, lags)):
+    bines = (data // dt).astype('int64') >> nivel
+    _dif = bines[None, :] - bines[:, None]
+    assert G[p] == np.count_nonzero(_dif == k), 'No coincide G'
+    assert N_triggers[p] == np.count_nonzero(bines <= bines[-1] - k), \
+        'No coincide N_triggers'
+
+# Procesos de Poisson: la parte no correlacionada vale uno
+P, R, N = arossi_multi_tau_una_historia(data, dt_s, dtmax_s, tb, 8)
+assert abs(np.mean(P) - 1) < 0.1, 'La normalización no es la esperada'
+
+# El modelo pesado con el triángulo coincide con promediar arossi_1exp
+alfa, amplitud = 2e4, 3.0
+for nivel, k in zip(niveles, lags):
+    w = dt_s * 2.0**nivel
+    u = np.linspace(-w, w, 20001)
+    _peso = (w - np.abs(u)) / w**2
+    _promedio = np.trapz(_peso * arossi_1exp(k * w + u, alfa, amplitud, 1),
+                         u)
+    assert np.isclose(arossi_1exp_multi_tau(k * w, alfa, amplitud, 1, w),
+                      _promedio, rtol=1e-6), \
+        'No coincide el modelo pesado con el triángulo'
+    _promedio = np.trapz(_peso * arossi_2exp(k * w + u, alfa, amplitud,
+                                             3 * alfa, 1.0, 1), u)
+    assert np.isclose(arossi_2exp_multi_tau(k * w, alfa, amplitud, 3 * alfa,
+                                            1.0, 1, w),
+                      _promedio, rtol=1e-6), \
+        'No coincide el modelo de dos exponenciales pesado con el triángulo'
+
+
+def curva_ajustada(fig):
+    """ Curva ajustada que grafican arossi_ajuste_1exp/2exp """
+    return [l for l in fig.axes[0].lines if l.get_label() == 'fit'][0] \
+        .get_ydata()
+
+
+# Con ancho los ajustes usan el modelo pesado y reproducen los puntos
+ancho = dt_s * 2.0**niveles
+P_mt = arossi_1exp_multi_tau(tau, alfa, amplitud, 1, ancho)
+P_std = 1e-3 * np.ones(tau.size)
+fig = arossi_ajuste_1exp(tau, P_mt, P_std, [1e4, 1, 1], ancho=ancho)
+assert np.allclose(curva_ajustada(fig), P_mt, atol=1e-6), \
+    'arossi_ajuste_1exp no usa el modelo pesado'
+fig = arossi_ajuste_1exp(tau, P_mt, P_std, [1e4, 1, 1])
+assert not np.allclose(curva_ajustada(fig), P_mt, atol=1e-3), \
+    'Sin ancho el ajuste no debería reproducir los puntos'
+P_mt = arossi_2exp_multi_tau(tau, alfa, amplitud, 4 * alfa, 2.0, 1, ancho)
+fig = arossi_ajuste_2exp(tau, P_mt, P_std, [1.5e4, 2, 7e4, 1, 1],
+                         ancho=ancho)
+assert np.allclose(curva_ajustada(fig), P_mt, atol=1e-6), \
+    'arossi_ajuste_2exp no usa el modelo pesado'
+
+historias = [[data[:700] - data[0], data[700:] - data[700]]]
+with Ejecutor('serie') as ejecutor:
+    resultados = alfa_rossi_procesamiento(historias, dt_s, dtmax_s, tb,
+                                          executor=ejecutor, multi_tau=8)
+for k, historia in enumerate(historias[0]):
+    P, R, N = arossi_multi_tau_una_historia(historia, dt_s, dtmax_s, tb, 8)
+    assert np.allclose(resultados[0][k, 0], P) and \
+        resultados[0][k, 2] == N, 'No coincide el procesamiento multi-tau'
+
+print('Todas las comparaciones resultaron correctas')
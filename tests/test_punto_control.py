@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""
+Script para verificar que al retomar un punto de control de
+`metodo_alfa_feynman` sólo se procesen las historias que faltan, que el
+resultado sea el mismo que sin punto de control y que un cambio en el código
+de la función que procesa cada historia invalide el punto de control. También
+que los puntos de control de `alfa_rossi_procesamiento` se lean (sin pickle)
+con el mismo resultado.
+"""
+
+import numpy as np
+import tempfile
+import glob
+import os
+import sys
+sys.path.append('../')
+
+from modules.ejecutor import Ejecutor
+from modules.alfa_feynman_procesamiento import afey_varianza_paralelo
+from modules.alfa_rossi_procesamiento import alfa_rossi_procesamiento
+from modules.punto_control import carga_punto_control, \
+    guarda_punto_control, hash_argumentos
+
+
+rng = np.random.default_rng(7)
+dt = 1e-3
+leidos = [(rng.poisson(3.0, size=40000).astype('>u4'), dt)]
+
+with tempfile.TemporaryDirectory() as carpeta, \
+        Ejecutor('serie') as ejecutor:
+    Y_ref, _, _ = afey_varianza_paralelo(leidos, 20, 20e-3, executor=ejecutor)
+    Y_control, _, _ = afey_varianza_paralelo(leidos, 20, 20e-3,
+                                             executor=ejecutor,
+                                             punto_control=carpeta)
+    # Un archivo por cada grupo de historias (4 historias en serie)
+    archivos = sorted(glob.glob(os.path.join(carpeta, '*.npz')))
+    claves = set(os.path.basename(a).split('_')[0] for a in archivos)
+    assert len(claves) == 1 and len(archivos) == 5, \
+        'Se esperaba un archivo por cada grupo de historias'
+    # Se simula un corte luego de procesar 8 historias. Las que ya estaban
+    # hechas se marcan con un valor que no se podría obtener procesándolas
+    marca = -12345.0
+    for archivo in archivos:
+        nombre = os.path.basename(archivo)[:-len('.npz')]
+        guardado = carga_punto_control(carpeta, nombre)
+        if guardado['indices'][0] < 8:
+            guardado['filas'][:] = marca
+            guarda_punto_control(carpeta, nombre, **guardado)
+        else:
+            os.remove(archivo)
+    Y_retomado, _, _ = afey_varianza_paralelo(leidos, 20, 20e-3,
+                                              executor=ejecutor,
+                                              punto_control=carpeta)
+    # Con otros parámetros no se usa el mismo punto de control
+    afey_varianza_paralelo(leidos, 10, 20e-3, executor=ejecutor,
+                           punto_control=carpeta)
+    claves = set(os.path.basename(a).split('_')[0]
+                 for a in glob.glob(os.path.join(carpeta, '*.npz')))
+    assert len(claves) == 2, \
+        'Se reutilizó un punto de control con otros parámetros'
+
+assert np.array_equal(Y_control[0], Y_ref[0]), \
+    'El resultado con punto de control no coincide con la referencia'
+assert np.all(Y_retomado[0][:8] == marca), \
+    'Se volvieron a procesar historias que ya estaban en el punto de control'
+assert np.array_equal(Y_retomado[0][8:], Y_ref[0][8:]), \
+    'El resultado retomado no coincide con la referencia'
+
+# alfa-Rossi: el resultado leído del punto de control es el mismo
+tb = 12.5e-9
+historias = [[np.cumsum(rng.exponential(1 / 1e4 / tb, size=300))
+              .astype('uint64') for _ in range(4)]]
+for historia in historias[0]:
+    historia -= historia[0]
+with tempfile.TemporaryDirectory() as carpeta, \
+        Ejecutor('serie') as ejecutor:
+    for save_trigs in [True, False]:
+        resultados = [alfa_rossi_procesamiento(historias, 2e-6, 1e-4, tb,
+                                               save_trigs=save_trigs,
+                                               executor=ejecutor,
+                                               punto_control=carpeta)[0]
+                      for _ in range(2)]
+        for fila, fila_leida in zip(*resultados):
+            assert np.array_equal(fila[0], fila_leida[0]) and \
+                fila[1] == fila_leida[1] and fila[2] == fila_leida[2], \
+                'No coincide el resultado leído del punto de control'
+            if save_trigs:
+                assert np.array_equal(fila[3], fila_leida[3]), \
+                    'No coincide P_trigger leído del punto de control'
+
+
+# Un cambio en el módulo de la función cambia el hash
+with tempfile.TemporaryDirectory() as carpeta:
+    modulo = os.path.join(carpeta, 'modulo_prueba_control.py')
+    with open(modulo, 'w') as f:
+        f.write('def procesa(x):\n    return x\n')
+    sys.path.insert(0, carpeta)
+    import modulo_prueba_control
+    clave = hash_argumentos(modulo_prueba_control.procesa, leidos[0][0])
+    assert clave == hash_argumentos(modulo_prueba_control.procesa,
+                                    leidos[0][0]), 'El hash no es estable'
+    with open(modulo, 'w') as f:
+        f.write('def procesa(x):\n    return 2 * x\n')
+    assert clave != hash_argumentos(modulo_prueba_control.procesa,
+                                    leidos[0][0]), \
+        'Un cambio en el código no cambia el hash'
+    sys.path.remove(carpeta)
+
+print('Todas las comparaciones resultaron correctas')